@@ -1,243 +1,882 @@
-import os
-import uuid
-from datetime import datetime
-from flask import Flask, request, jsonify, send_file, send_from_directory
-from flask_cors import CORS
-import json
-from werkzeug.utils import secure_filename
-import pdf_processor
-import ai_services
-
-app = Flask(__name__, static_folder='../frontend')
-CORS(app)
-
-# Configuration
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['PROCESSED_FOLDER'] = 'processed'
-app.config['ALLOWED_EXTENSIONS'] = {'pdf', 'doc', 'docx', 'jpg', 'jpeg', 'png'}
-
-# Create directories
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
-
-@app.route('/')
-def serve_frontend():
-    return send_from_directory('../frontend', 'index.html')
-
-@app.route('/<path:path>')
-def serve_static(path):
-    return send_from_directory('../frontend', path)
-
-@app.route('/api/upload', methods=['POST'])
-def upload_pdf():
-    """Handle PDF upload with drag & drop support"""
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
-    
-    if not allowed_file(file.filename):
-        return jsonify({'error': 'File type not allowed'}), 400
-    
-    # Generate unique filename
-    file_id = str(uuid.uuid4())
-    original_filename = secure_filename(file.filename)
-    file_extension = original_filename.rsplit('.', 1)[1].lower()
-    new_filename = f"{file_id}.{file_extension}"
-    
-    # Save file
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], new_filename)
-    file.save(file_path)
-    
-    # Extract basic metadata
-    page_count = pdf_processor.get_page_count(file_path) if file_extension == 'pdf' else 1
-    file_size = os.path.getsize(file_path)
-    
-    return jsonify({
-        'success': True,
-        'fileId': file_id,
-        'filename': original_filename,
-        'pageCount': page_count,
-        'fileSize': file_size,
-        'uploadedAt': datetime.now().isoformat()
-    })
-
-@app.route('/api/pdf/<file_id>/pages')
-def get_pdf_pages(file_id):
-    """Get PDF pages for display in browser"""
-    page_num = request.args.get('page', 1, type=int)
-    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}.pdf")
-    
-    if not os.path.exists(pdf_path):
-        return jsonify({'error': 'File not found'}), 404
-    
-    try:
-        page_data = pdf_processor.get_page_as_image(pdf_path, page_num)
-        return jsonify({
-            'success': True,
-            'page': page_num,
-            'data': page_data,
-            'totalPages': pdf_processor.get_page_count(pdf_path)
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/pdf/<file_id>/edit', methods=['POST'])
-def edit_pdf(file_id):
-    """Edit PDF content - text modification, annotations, etc."""
-    data = request.json
-    operation = data.get('operation')
-    
-    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}.pdf")
-    output_path = os.path.join(app.config['PROCESSED_FOLDER'], f"{file_id}_edited.pdf")
-    
-    try:
-        if operation == 'add_text':
-            pdf_processor.add_text_to_pdf(
-                pdf_path, 
-                output_path,
-                data['text'],
-                data.get('page'),
-                data.get('x'),
-                data.get('y')
-            )
-        elif operation == 'highlight':
-            pdf_processor.highlight_text(
-                pdf_path,
-                output_path,
-                data['page'],
-                data['text'],
-                data.get('color', '#ffff00')
-            )
-        elif operation == 'add_image':
-            pdf_processor.add_image_to_pdf(
-                pdf_path,
-                output_path,
-                data['imageData'],
-                data['page'],
-                data.get('x'),
-                data.get('y')
-            )
-        elif operation == 'merge':
-            pdf_processor.merge_pdfs(
-                [pdf_path] + data['otherFiles'],
-                output_path
-            )
-        elif operation == 'split':
-            result_files = pdf_processor.split_pdf(
-                pdf_path,
-                data['pages']
-            )
-            return jsonify({
-                'success': True,
-                'files': result_files
-            })
-        
-        return jsonify({
-            'success': True,
-            'downloadUrl': f'/api/download/{file_id}_edited.pdf'
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/pdf/<file_id>/ai/summarize', methods=['POST'])
-def summarize_pdf(file_id):
-    """AI-powered PDF summarization"""
-    try:
-        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}.pdf")
-        summary = ai_services.summarize_pdf(pdf_path)
-        
-        return jsonify({
-            'success': True,
-            'summary': summary
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/pdf/<file_id>/ai/chat', methods=['POST'])
-def chat_with_pdf(file_id):
-    """Chat with PDF using AI"""
-    data = request.json
-    question = data.get('question')
-    
-    if not question:
-        return jsonify({'error': 'Question is required'}), 400
-    
-    try:
-        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}.pdf")
-        response = ai_services.chat_with_pdf(pdf_path, question)
-        
-        return jsonify({
-            'success': True,
-            'answer': response
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/pdf/<file_id>/convert', methods=['POST'])
-def convert_pdf(file_id):
-    """Convert PDF to other formats"""
-    data = request.json
-    target_format = data.get('format')
-    
-    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}.pdf")
-    
-    try:
-        if target_format == 'docx':
-            output_path = pdf_processor.convert_to_docx(pdf_path)
-        elif target_format == 'excel':
-            output_path = pdf_processor.convert_to_excel(pdf_path)
-        elif target_format == 'images':
-            output_paths = pdf_processor.convert_to_images(pdf_path)
-            return jsonify({
-                'success': True,
-                'files': output_paths
-            })
-        else:
-            return jsonify({'error': 'Unsupported format'}), 400
-        
-        return jsonify({
-            'success': True,
-            'downloadUrl': f'/api/download/{os.path.basename(output_path)}'
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/pdf/<file_id>/compress', methods=['POST'])
-def compress_pdf(file_id):
-    """Compress PDF file size"""
-    try:
-        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}.pdf")
-        output_path = pdf_processor.compress_pdf(pdf_path)
-        
-        original_size = os.path.getsize(pdf_path)
-        compressed_size = os.path.getsize(output_path)
-        reduction = ((original_size - compressed_size) / original_size) * 100
-        
-        return jsonify({
-            'success': True,
-            'downloadUrl': f'/api/download/{os.path.basename(output_path)}',
-            'originalSize': original_size,
-            'compressedSize': compressed_size,
-            'reductionPercent': round(reduction, 2)
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/download/<filename>')
-def download_file(filename):
-    """Download processed files"""
-    return send_file(
-        os.path.join(app.config['PROCESSED_FOLDER'], filename),
-        as_attachment=True,
-        download_name=filename
-    )
-
-if __name__ == '__main__':
+import os
+import uuid
+import base64
+import queue
+import threading
+import time
+from datetime import datetime
+from flask import Flask, Response, g, request, jsonify, send_file, send_from_directory, stream_with_context
+from flask_cors import CORS
+import json
+from werkzeug.utils import secure_filename
+import pdf_processor
+import ai_services
+import jobs
+import metrics
+import image_convert
+from blob_store import BlobStore
+from downloads import DownloadManager
+from storage import StorageManager, file_id_of
+
+app = Flask(__name__, static_folder='../frontend')
+CORS(app)
+
+# Configuration
+app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['PROCESSED_FOLDER'] = 'processed'
+app.config['ALLOWED_EXTENSIONS'] = {'pdf', 'doc', 'docx', 'jpg', 'jpeg', 'png', 'webp', 'tif', 'tiff', 'bmp'}
+app.config['MAX_IMAGES_PER_PDF'] = 500
+app.config['MAX_RENDER_DPI'] = 300
+app.config['PAGE_CACHE_MAX_AGE'] = 3600  # seconds browsers may reuse a rendered page
+app.config['JOB_DATABASE'] = os.path.join('jobs', 'jobs.db')
+app.config['JOB_SYNC_TIMEOUT'] = 10  # seconds before a request hands off to the job queue
+app.config['BLOB_FOLDER'] = 'blobs'
+# Set to an internal nginx location (e.g. '/protected/') to offload downloads with X-Accel-Redirect;
+# USE_X_SENDFILE = True does the same for servers that understand X-Sendfile
+app.config['DOWNLOAD_ACCEL_PREFIX'] = os.getenv('DOWNLOAD_ACCEL_PREFIX')
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+# Requests carrying this header are run under the sampling profiler, when profiling is enabled
+app.config['PROFILE_HEADER'] = 'X-Profile'
+app.config['PROFILING_ENABLED'] = os.getenv('ENABLE_REQUEST_PROFILING', '').lower() in ('1', 'true', 'yes')
+app.config['PROFILE_FOLDER'] = 'profiles'
+# Storage lifecycle: idle uploads, processed files and scratch files are deleted after their TTL,
+# and least recently used file ids are evicted while usage is above the quota
+app.config['STORAGE_DATABASE'] = os.path.join('storage', 'storage.db')
+app.config['STORAGE_QUOTA_BYTES'] = int(os.getenv('STORAGE_QUOTA_BYTES', 20 * 1024 ** 3))
+app.config['UPLOAD_TTL'] = int(os.getenv('UPLOAD_TTL', 24 * 3600))  # seconds since last access
+app.config['PROCESSED_TTL'] = int(os.getenv('PROCESSED_TTL', 3600))
+app.config['TEMP_TTL'] = int(os.getenv('TEMP_TTL', 6 * 3600))
+app.config['CACHE_TTL'] = int(os.getenv('CACHE_TTL', 7 * 24 * 3600))  # OCR results unused this long are dropped
+app.config['STORAGE_CLEANUP_INTERVAL'] = 300  # seconds between cleanup passes
+
+# Create directories
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
+
+# Request bodies with these types are treated as the file itself rather than a multipart form
+RAW_UPLOAD_MIMETYPES = {'application/pdf', 'application/octet-stream', 'image/jpeg', 'image/png'}
+
+# Files derived from a PDF (text and retrieval indexes) that can be shared between references
+INDEX_SIDECARS = ('.pages.jsonl', '.words.jsonl', '.pages.idx.json', '.bm25.npz', '.chunks.json', '.search.npz')
+
+blob_store = BlobStore(app.config['BLOB_FOLDER'])
+downloads = DownloadManager(app.config['PROCESSED_FOLDER'], app.config['DOWNLOAD_ACCEL_PREFIX'], sharded=True)
+
+storage = StorageManager(
+    app.config['STORAGE_DATABASE'],
+    app.config['STORAGE_QUOTA_BYTES'],
+    app.config['STORAGE_CLEANUP_INTERVAL'],
+    active_file_ids=lambda: job_manager.active_file_ids()
+)
+storage.add_folder('uploads', app.config['UPLOAD_FOLDER'], app.config['UPLOAD_TTL'], sharded=True, primary=True)
+storage.add_folder('processed', app.config['PROCESSED_FOLDER'], app.config['PROCESSED_TTL'], sharded=True)
+storage.add_folder('temp', pdf_processor.pdf_processor.temp_dir, app.config['TEMP_TTL'])
+storage.add_folder('profiles', app.config['PROFILE_FOLDER'], app.config['TEMP_TTL'])
+# OCR results expire when idle; the AI response cache database evicts its own entries
+storage.add_folder('cache', pdf_processor.pdf_processor.cache_dir, app.config['CACHE_TTL'],
+                   keep=(os.path.basename(ai_services.ai_services.response_cache.db_path),))
+# Files written before sharding was introduced sit in the top level of their folder
+storage.migrate('uploads')
+storage.migrate('processed')
+
+def _forget_file(file_id):
+    """Drop what outlives an evicted file id's files: its blob reference and cached renderings"""
+    blob_store.release(file_id, INDEX_SIDECARS)
+    pdf_processor.pdf_processor.page_cache.invalidate(file_id)
+
+storage.on_evict(_forget_file)
+
+@app.before_request
+def touch_storage():
+    args = request.view_args or {}
+    storage.touch(args.get('file_id') or file_id_of(args.get('filename', '')))
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    profiler = None
+    if app.config['PROFILING_ENABLED'] and request.headers.get(app.config['PROFILE_HEADER']):
+        profiler = g.profiler = metrics.SamplingProfiler().start()
+    metrics.begin_request(profiler)
+
+@app.after_request
+def finish_request_metrics(response):
+    elapsed = time.perf_counter() - g.pop('request_started', time.perf_counter())
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.request_seconds.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+    
+    # Server-Timing shows the per-stage breakdown in the browser's network panel
+    timings = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in metrics.end_request()]
+    timings.append(f"total;dur={elapsed * 1000:.1f}")
+    response.headers['Server-Timing'] = ', '.join(timings)
+    
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profile_id = uuid.uuid4().hex
+        os.makedirs(app.config['PROFILE_FOLDER'], exist_ok=True)
+        with open(os.path.join(app.config['PROFILE_FOLDER'], f"{profile_id}.folded"), 'w') as f:
+            f.write(profiler.stop().folded())
+        response.headers['X-Profile-Id'] = profile_id
+        response.headers['X-Profile-Url'] = f'/api/profiles/{profile_id}'
+    return response
+
+@app.teardown_request
+def stop_request_profiler(error=None):
+    # after_request is skipped when a view raises; never leave a sampler running
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+
+@app.route('/')
+def serve_frontend():
+    return send_from_directory('../frontend', 'index.html')
+
+@app.route('/<path:path>')
+def serve_static(path):
+    return send_from_directory('../frontend', path)
+
+@app.route('/api/upload', methods=['POST'])
+def upload_pdf():
+    """Handle PDF upload with drag & drop support"""
+    if request.mimetype in RAW_UPLOAD_MIMETYPES:
+        # Raw request bodies are streamed straight to disk without multipart parsing
+        filename = request.headers.get('X-Filename') or request.args.get('filename', '')
+        stream = request.stream
+        if not filename:
+            return jsonify({'error': 'No file selected'}), 400
+    else:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        filename = file.filename
+        stream = file.stream
+        if filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+    
+    if not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    
+    # Generate unique filename
+    file_id = str(uuid.uuid4())
+    original_filename = secure_filename(filename)
+    file_extension = original_filename.rsplit('.', 1)[1].lower()
+    new_filename = f"{file_id}.{file_extension}"
+    
+    # Copy in chunks while hashing; identical content is stored once and linked
+    file_path = storage.shard_path('uploads', new_filename, create=True)
+    try:
+        with metrics.timed('upload', 'save'):
+            digest, file_size, is_new = blob_store.ingest(stream, file_extension, app.config['MAX_CONTENT_LENGTH'])
+    except ValueError as e:
+        metrics.record_error('upload', e)
+        return jsonify({'error': str(e)}), 413
+    metrics.record_bytes('upload', 'in', file_size)
+    blob_store.add_ref(file_id, digest, file_path)
+    blob = blob_store.get_blob(digest)
+    
+    # Extract basic metadata once per distinct content
+    page_count = blob['page_count']
+    if page_count is None:
+        page_count = pdf_processor.get_page_count(file_path) if file_extension == 'pdf' else 1
+        blob_store.update_blob(digest, page_count=page_count)
+    
+    # Build the text index once, off the request thread, for search and AI features
+    index_job_id = None
+    text_index = None
+    if file_extension == 'pdf':
+        text_index = blob['text_index']
+        if text_index == 'ready':
+            blob_store.link_sidecars(digest, file_path, INDEX_SIDECARS)
+        else:
+            index_job_id = job_manager.submit('index', {'fileId': file_id})
+    
+    return jsonify({
+        'success': True,
+        'fileId': file_id,
+        'filename': original_filename,
+        'pageCount': page_count,
+        'fileSize': file_size,
+        'sha256': digest,
+        'deduplicated': not is_new,
+        'textIndex': text_index,
+        'textIndexJobId': index_job_id,
+        'uploadedAt': datetime.now().isoformat()
+    })
+
+@app.route('/api/pdf/<file_id>/pages')
+def get_pdf_pages(file_id):
+    """Get PDF pages for display in browser"""
+    page_num = request.args.get('page', 1, type=int)
+    dpi = _clamp_dpi(request.args.get('dpi', 150, type=int))
+    image_format = request.args.get('format', 'png').lower().replace('jpg', 'jpeg')
+    colorspace = request.args.get('colorspace', 'rgb').lower()
+    clip = request.args.get('clip')
+    raw = _query_flag('raw')
+    pdf_path = _upload_path(file_id)
+    
+    if not os.path.exists(pdf_path):
+        return jsonify({'error': 'File not found'}), 404
+    
+    if image_format not in pdf_processor.IMAGE_MIMETYPES:
+        return jsonify({'error': 'Unsupported image format'}), 400
+    
+    if clip:
+        # Partial renders take a rectangle in PDF points: x0,y0,x1,y1
+        try:
+            clip = [float(v) for v in clip.split(',')]
+        except ValueError:
+            clip = None
+        if not clip or len(clip) != 4:
+            return jsonify({'error': 'clip must be x0,y0,x1,y1'}), 400
+    
+    try:
+        total_pages = pdf_processor.get_page_count(pdf_path)
+        if page_num < 1 or page_num > total_pages:
+            return jsonify({'error': 'Page out of range'}), 400
+        
+        options = {
+            'colorspace': colorspace,
+            'alpha': _query_flag('alpha'),
+            'clip': clip,
+            'quality': min(max(request.args.get('quality', 85, type=int), 10), 100)
+        }
+        cache_control = f"private, max-age={app.config['PAGE_CACHE_MAX_AGE']}"
+        
+        # A revalidation of the current version is answered before rendering anything
+        etag = pdf_processor.page_etag(pdf_path, page_num, dpi, image_format, **options)
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        
+        data, etag = pdf_processor.render_page(pdf_path, page_num, dpi, image_format, **options)
+        
+        if raw:
+            # Raw bytes skip the ~33% base64 overhead and can be cached by the browser
+            response = app.response_class(data, mimetype=pdf_processor.IMAGE_MIMETYPES[image_format])
+            response.headers['X-Total-Pages'] = str(total_pages)
+        else:
+            response = jsonify({
+                'success': True,
+                'page': page_num,
+                'data': f"data:{pdf_processor.IMAGE_MIMETYPES[image_format]};base64,{_base64(data)}",
+                'totalPages': total_pages
+            })
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/pdf/<file_id>/search')
+def search_pdf(file_id):
+    """Find a phrase or regex across every page, with the rects of each hit"""
+    pdf_path = _upload_path(file_id)
+    if not os.path.exists(pdf_path):
+        return jsonify({'error': 'File not found'}), 404
+    
+    limit = min(max(request.args.get('limit', 1000, type=int), 1), 10000)
+    try:
+        hits = pdf_processor.search(
+            pdf_path,
+            request.args.get('q', ''),
+            regex=_query_flag('regex'),
+            case_sensitive=_query_flag('caseSensitive'),
+            whole_words=_query_flag('wholeWords'),
+            limit=limit,
+            start_page=request.args.get('startPage', 1, type=int),
+            end_page=request.args.get('endPage', type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'count': len(hits),
+        'truncated': len(hits) >= limit,
+        'hits': hits
+    })
+
+@app.route('/api/pdf/<file_id>/edit', methods=['POST'])
+def edit_pdf(file_id):
+    """Edit PDF content - text modification, annotations, etc."""
+    data = request.json
+    operation = data.get('operation')
+    
+    if operation in ('merge', 'split'):
+        return _respond_with_job(operation, dict(data, fileId=file_id))
+    
+    return _apply_edits(file_id, [data])
+
+@app.route('/api/pdf/<file_id>/edit/batch', methods=['POST'])
+def edit_pdf_batch(file_id):
+    """Apply many edits to the document with a single save"""
+    edits = (request.json or {}).get('operations')
+    
+    if not isinstance(edits, list) or not edits:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    
+    return _apply_edits(file_id, edits)
+
+@app.route('/api/pdf/<file_id>/edit/versions')
+def get_edit_versions(file_id):
+    """List the versions in a document's edit chain"""
+    return jsonify({
+        'success': True,
+        'versions': pdf_processor.get_edit_history(_edited_path(file_id))
+    })
+
+@app.route('/api/pdf/<file_id>/edit/versions/<int:version>', methods=['POST'])
+def export_edit_version(file_id, version):
+    """Materialize an earlier version of the edit chain for download"""
+    filename = f"{secure_filename(file_id)}_edited_v{version}.pdf"
+    try:
+        pdf_processor.export_edit_version(
+            _edited_path(file_id),
+            version,
+            storage.shard_path('processed', filename, create=True)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'downloadUrl': f'/api/download/{filename}'
+    })
+
+def _edited_path(file_id):
+    return storage.shard_path('processed', f"{secure_filename(file_id)}_edited.pdf", create=True)
+
+def _apply_edits(file_id, edits):
+    pdf_path = _upload_path(file_id)
+    if not os.path.exists(pdf_path):
+        return jsonify({'error': 'File not found'}), 404
+    
+    try:
+        version = pdf_processor.apply_edits(pdf_path, _edited_path(file_id), edits)
+        return jsonify({
+            'success': True,
+            'version': version['version'],
+            'incremental': version['incremental'],
+            'downloadUrl': f'/api/download/{os.path.basename(_edited_path(file_id))}'
+        })
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid edit: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/pdf/<file_id>/ai/summarize', methods=['POST'])
+def summarize_pdf(file_id):
+    """AI-powered PDF summarization"""
+    return _respond_with_job('summarize', {'fileId': file_id})
+
+@app.route('/api/pdf/<file_id>/ai/chat', methods=['POST'])
+def chat_with_pdf(file_id):
+    """Chat with PDF using AI"""
+    data = request.json
+    question = data.get('question')
+    
+    if not question:
+        return jsonify({'error': 'Question is required'}), 400
+    
+    return _respond_with_job('chat', {'fileId': file_id, 'question': question})
+
+@app.route('/api/ai/cache/stats')
+def ai_cache_stats():
+    """Hit/miss counters and size of the AI response cache"""
+    return jsonify({
+        'success': True,
+        'cache': ai_services.cache_stats()
+    })
+
+@app.route('/api/pdf/<file_id>/convert', methods=['POST'])
+def convert_pdf(file_id):
+    """Convert PDF to other formats"""
+    data = request.json
+    target_format = data.get('format')
+    
+    if target_format not in ('docx', 'excel', 'csv', 'parquet', 'images'):
+        return jsonify({'error': 'Unsupported format'}), 400
+    
+    if target_format == 'images':
+        image_format = data.get('imageFormat', 'png').lower().replace('jpg', 'jpeg')
+        if image_format not in pdf_processor.IMAGE_MIMETYPES:
+            return jsonify({'error': 'Unsupported image format'}), 400
+        if data.get('stream'):
+            pdf_path = _upload_path(file_id)
+            if not os.path.exists(pdf_path):
+                return jsonify({'error': 'File not found'}), 404
+            return Response(
+                stream_with_context(_stream_image_conversion(
+                    pdf_path, _clamp_dpi(data.get('dpi', 150)), image_format, bool(data.get('zip')),
+                    _processed_dir(file_id)
+                )),
+                mimetype='application/x-ndjson'
+            )
+    
+    return _respond_with_job('convert', dict(data, fileId=file_id))
+
+@app.route('/api/pdf/<file_id>/compress', methods=['POST'])
+def compress_pdf(file_id):
+    """Compress PDF file size"""
+    data = request.get_json(silent=True) or {}
+    return _respond_with_job('compress', dict(data, fileId=file_id))
+
+@app.route('/api/pdf/<file_id>/ocr', methods=['POST'])
+def ocr_pdf(file_id):
+    """Add a searchable text layer to scanned pages"""
+    data = request.get_json(silent=True) or {}
+    return _respond_with_job('ocr', dict(data, fileId=file_id))
+
+@app.route('/api/images/to-pdf', methods=['POST'])
+def images_to_pdf():
+    """Combine uploaded images, in the given order, into a new PDF upload"""
+    data = request.get_json(silent=True) or {}
+    error = _images_to_pdf_error(data)
+    if error:
+        return error
+    
+    return _job_response('images_to_pdf', {'fileIds': data['fileIds'], 'pageSize': data.get('pageSize')})
+
+def _images_to_pdf_error(data):
+    """Error response for an images_to_pdf request whose images are missing or invalid, else None"""
+    file_ids = data.get('fileIds') or []
+    if not file_ids:
+        return jsonify({'error': 'No images provided'}), 400
+    if len(file_ids) > app.config['MAX_IMAGES_PER_PDF']:
+        return jsonify({'error': f"At most {app.config['MAX_IMAGES_PER_PDF']} images per PDF"}), 400
+    if data.get('pageSize') and data['pageSize'] not in image_convert.PAGE_SIZES:
+        return jsonify({'error': 'Unsupported page size'}), 400
+    missing = [file_id for file_id in file_ids if _image_upload_path(file_id) is None]
+    if missing:
+        return jsonify({'error': 'Image not found', 'fileIds': missing}), 404
+    return None
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue a heavy operation and return immediately with a job id"""
+    data = request.json or {}
+    operation = data.get('operation')
+    
+    if operation not in JOB_OPERATIONS:
+        return jsonify({'error': 'Unknown operation'}), 400
+    if operation == 'images_to_pdf':
+        # Image jobs take uploaded images, not a PDF
+        error = _images_to_pdf_error(data)
+        if error:
+            return error
+    elif not os.path.exists(_upload_path(data.get('fileId', ''))):
+        return jsonify({'error': 'File not found'}), 404
+    
+    params = {key: value for key, value in data.items() if key not in ('operation', 'priority')}
+    job_id = job_manager.submit(operation, params, data.get('priority'))
+    return jsonify(_job_payload(job_manager.get(job_id))), 202
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Get the status, progress and result of a job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_job_payload(job))
+
+def _upload_path(file_id, create=False):
+    return storage.shard_path('uploads', f"{secure_filename(file_id)}.pdf", create)
+
+def _processed_dir(file_id):
+    """Shard of the processed folder that holds a file id's artifacts"""
+    return storage.shard_dir('processed', secure_filename(file_id), create=True)
+
+def _image_upload_path(file_id):
+    for extension in image_convert.IMAGE_EXTENSIONS:
+        path = storage.shard_path('uploads', f"{secure_filename(file_id)}.{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def _base64(data):
+    with metrics.timed('render_page', 'base64'):
+        return base64.b64encode(data).decode()
+
+def _query_flag(name):
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+def _clamp_dpi(dpi):
+    return min(max(int(dpi), 36), app.config['MAX_RENDER_DPI'])
+
+def _job_payload(job):
+    return dict(job, success=job['status'] != 'failed', statusUrl=f"/api/jobs/{job['jobId']}")
+
+def _respond_with_job(operation, params):
+    """Run an operation as a job, answering inline when it finishes within JOB_SYNC_TIMEOUT"""
+    if not os.path.exists(_upload_path(params['fileId'])):
+        return jsonify({'error': 'File not found'}), 404
+    return _job_response(operation, params)
+
+def _job_response(operation, params):
+    # The job thread reports its stages and profiler samples into this request
+    job, finished = job_manager.run_or_defer(operation, params, app.config['JOB_SYNC_TIMEOUT'],
+                                             context=metrics.carry())
+    if not finished:
+        return jsonify(_job_payload(job)), 202
+    if job['status'] == 'failed':
+        # Job functions raise ValueError for bad parameters, e.g. pages outside the document
+        return jsonify({'error': job['error']}), 400 if job['errorType'] == 'ValueError' else 500
+    return jsonify(job['result'])
+
+def _run_convert(params, progress):
+    pdf_path = _upload_path(params['fileId'])
+    target_format = params.get('format')
+    
+    if target_format == 'docx':
+        output_path = pdf_processor.convert_to_docx(pdf_path, _processed_dir(params['fileId']), progress=progress)
+    elif target_format == 'excel':
+        output_path = pdf_processor.convert_to_excel(
+            pdf_path, _processed_dir(params['fileId']), params.get('layout', 'table'), progress
+        )
+    elif target_format in ('csv', 'parquet'):
+        paths = pdf_processor.export_tables(
+            pdf_path, target_format, params.get('layout', 'table'), _processed_dir(params['fileId']),
+            progress=progress
+        )
+        if not paths:
+            raise RuntimeError('No tables found')
+        return dict(downloads.describe(paths, 'tables'), success=True)
+    elif target_format == 'images':
+        as_zip = bool(params.get('zip'))
+        result = pdf_processor.convert_to_images(
+            pdf_path,
+            _clamp_dpi(params.get('dpi', 150)),
+            params.get('imageFormat', 'png').lower().replace('jpg', 'jpeg'),
+            as_zip=as_zip,
+            output_dir=_processed_dir(params['fileId']),
+            progress=progress
+        )
+        return _image_conversion_result(result, as_zip)
+    else:
+        raise ValueError('Unsupported format')
+    
+    if not output_path:
+        raise RuntimeError(f'Conversion to {target_format} failed')
+    return {
+        'success': True,
+        'downloadUrl': f'/api/download/{os.path.basename(output_path)}'
+    }
+
+def _image_conversion_result(result, as_zip):
+    if as_zip:
+        if not result:
+            return {'success': False, 'error': 'Conversion failed'}
+        return {'success': True, 'downloadUrl': f'/api/download/{os.path.basename(result)}'}
+    return dict(downloads.describe(result, 'pages'), success=bool(result))
+
+def _stream_image_conversion(pdf_path, dpi, image_format, as_zip, output_dir):
+    """Yield NDJSON progress lines while pages are rendered, then the final result"""
+    events = queue.Queue()
+    
+    def run():
+        try:
+            result = pdf_processor.convert_to_images(
+                pdf_path, dpi, image_format,
+                as_zip=as_zip,
+                output_dir=output_dir,
+                progress=lambda done, total: events.put({'done': done, 'total': total})
+            )
+            events.put(_image_conversion_result(result, as_zip))
+        except Exception as e:
+            events.put({'success': False, 'error': str(e)})
+        finally:
+            events.put(None)
+    
+    threading.Thread(target=run, daemon=True).start()
+    while True:
+        event = events.get()
+        if event is None:
+            break
+        yield json.dumps(event) + '\n'
+
+def _run_compress(params, progress):
+    pdf_path = _upload_path(params['fileId'])
+    output_path, report = pdf_processor.compress_pdf(
+        pdf_path, params.get('quality', 'medium'), _processed_dir(params['fileId']), with_report=True
+    )
+    if report is None:
+        raise RuntimeError('Compression failed')
+    
+    original_size = report['originalSize']
+    compressed_size = report['compressedSize']
+    reduction = ((original_size - compressed_size) / original_size) * 100
+    
+    return {
+        'success': True,
+        'downloadUrl': f'/api/download/{os.path.basename(output_path)}',
+        'originalSize': original_size,
+        'compressedSize': compressed_size,
+        'reductionPercent': round(reduction, 2),
+        'report': report
+    }
+
+def _run_merge(params, progress):
+    file_id = params['fileId']
+    # Merges get their own artifact so they never clobber the edit chain
+    output_path = storage.shard_path('processed', f"{secure_filename(file_id)}_merged.pdf", create=True)
+    pdf_paths = [_upload_path(file_id)]
+    for other_id in params.get('otherFiles', []):
+        path = _upload_path(other_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'File not found: {other_id}')
+        pdf_paths.append(path)
+    
+    if not pdf_processor.merge_pdfs(pdf_paths, output_path, progress=progress):
+        raise RuntimeError('Merge failed')
+    return {
+        'success': True,
+        'downloadUrl': f'/api/download/{file_id}_merged.pdf'
+    }
+
+def _run_split(params, progress):
+    return {
+        'success': True,
+        **downloads.describe(
+            pdf_processor.split_pdf(
+                _upload_path(params['fileId']),
+                params.get('pages'),
+                _processed_dir(params['fileId']),
+                mode=params.get('mode', 'ranges'),
+                every=params.get('every'),
+                max_bytes=params.get('maxBytes'),
+                bookmark_level=params.get('bookmarkLevel', 1),
+                progress=progress
+            ),
+            'parts'
+        )
+    }
+
+def _run_index(params, progress):
+    pdf_path = _upload_path(params['fileId'])
+    blob = blob_store.lookup(secure_filename(params['fileId']))
+    if blob is None:
+        index = pdf_processor.get_text_index(pdf_path)
+        pdf_processor.get_search_index(pdf_path)
+        ai_services.get_chunk_index(pdf_path)
+    else:
+        # Index the shared blob once and link the results next to this reference
+        blob_path = blob_store.blob_path(blob['digest'], blob['extension'])
+        index = pdf_processor.get_text_index(blob_path)
+        pdf_processor.get_search_index(blob_path)
+        ai_services.get_chunk_index(blob_path)
+        blob_store.link_sidecars(blob['digest'], pdf_path, INDEX_SIDECARS)
+        blob_store.update_blob(blob['digest'], text_index='ready')
+    return {
+        'success': True,
+        'pageCount': index.page_count,
+        'blankPages': len(index.empty_pages())
+    }
+
+def _store_pdf(path):
+    """Move a generated PDF into the blob store, returning (digest, size)"""
+    with open(path, 'rb') as f:
+        digest, size, _ = blob_store.ingest(f, 'pdf')
+    os.remove(path)
+    return digest, size
+
+def _replace_upload(file_id, new_path):
+    """Point a file id at new content without touching the blob other references share"""
+    pdf_path = _upload_path(file_id)
+    digest, _ = _store_pdf(new_path)
+    
+    # Sidecars are hard links to the old blob's indexes, so unlink them instead of rebuilding in place
+    for suffix in INDEX_SIDECARS:
+        if os.path.exists(pdf_path + suffix):
+            os.remove(pdf_path + suffix)
+    blob_store.release(file_id, INDEX_SIDECARS)
+    blob_store.add_ref(file_id, digest, pdf_path + '.tmp')
+    os.replace(pdf_path + '.tmp', pdf_path)
+    
+    pdf_processor.pdf_processor.doc_cache.invalidate(pdf_path)
+    pdf_processor.pdf_processor.page_cache.invalidate(file_id)
+    blob_store.update_blob(digest, page_count=pdf_processor.get_page_count(pdf_path))
+
+def _run_ocr(params, progress):
+    file_id = secure_filename(params['fileId'])
+    ocr_path, report = pdf_processor.ocr_pdf(
+        _upload_path(file_id),
+        storage.shard_path('processed', f"{file_id}_ocr.pdf", create=True),
+        pages=params.get('pages'),
+        language=params.get('language'),
+        force=bool(params.get('force')),
+        progress=progress
+    )
+    if report is None:
+        raise RuntimeError('OCR failed')
+    if report['failedPages'] and not report['ocrPages'] and not report['cachedPages']:
+        # Nothing was read, e.g. Tesseract is not installed; an empty result would look like a text-free scan
+        raise RuntimeError(f"OCR failed on every page: {report['failedPages'][0]['error']}")
+    
+    result = {'success': True, 'textLayerAdded': ocr_path is not None, 'report': report}
+    if ocr_path is not None:
+        # Search, highlight and AI features read the upload and its indexes, so swap both
+        _replace_upload(file_id, ocr_path)
+        result.update(_run_index({'fileId': file_id}, progress))
+    return result
+
+def _run_images_to_pdf(params, progress):
+    image_paths = []
+    for image_id in params['fileIds']:
+        path = _image_upload_path(image_id)
+        if path is None:
+            raise FileNotFoundError(f'Image not found: {image_id}')
+        image_paths.append(path)
+    
+    file_id = str(uuid.uuid4())
+    output_path, report = pdf_processor.images_to_pdf(
+        image_paths,
+        storage.shard_path('processed', f"{file_id}.pdf", create=True),
+        page_size=params.get('pageSize'),
+        progress=progress
+    )
+    if report is None:
+        raise RuntimeError('Image conversion failed')
+    
+    # The result becomes an upload of its own, so every PDF operation (OCR included) can use it
+    digest, file_size = _store_pdf(output_path)
+    blob_store.add_ref(file_id, digest, _upload_path(file_id, create=True))
+    blob_store.update_blob(digest, page_count=report['images'])
+    return {
+        'success': True,
+        'fileId': file_id,
+        'pageCount': report['images'],
+        'fileSize': file_size,
+        'sha256': digest,
+        'textIndexJobId': job_manager.submit('index', {'fileId': file_id}),
+        'report': report
+    }
+
+def _run_summarize(params, progress):
+    return {
+        'success': True,
+        'summary': ai_services.summarize_pdf(_upload_path(params['fileId']))
+    }
+
+def _run_chat(params, progress):
+    answer, sources = ai_services.chat_with_pdf(
+        _upload_path(params['fileId']),
+        params['question'],
+        with_sources=True
+    )
+    return {
+        'success': True,
+        'answer': answer,
+        'sources': sources
+    }
+
+# Operation name -> (function, lane, max concurrent jobs of that operation)
+JOB_OPERATIONS = {
+    'convert': (_run_convert, 'bulk', 2),
+    'compress': (_run_compress, 'bulk', 2),
+    'merge': (_run_merge, 'bulk', 1),
+    'split': (_run_split, 'bulk', 2),
+    'index': (_run_index, 'bulk', 2),
+    'ocr': (_run_ocr, 'bulk', 1),
+    'images_to_pdf': (_run_images_to_pdf, 'bulk', 1),
+    'summarize': (_run_summarize, 'interactive', 2),
+    'chat': (_run_chat, 'interactive', 4)
+}
+
+job_seconds = metrics.registry.histogram('job_seconds', 'Job run time by operation and outcome', ('operation', 'status'))
+
+def _instrumented(operation, func):
+    """Wrap a job function so its run time and failures are recorded"""
+    def run(params, progress):
+        start = time.perf_counter()
+        status = 'failed'
+        try:
+            result = func(params, progress)
+            status = 'succeeded'
+            return result
+        except Exception as e:
+            metrics.record_error(operation, e)
+            raise
+        finally:
+            job_seconds.observe(time.perf_counter() - start, operation=operation, status=status)
+    return run
+
+job_manager = jobs.JobManager(app.config['JOB_DATABASE'])
+for _operation, (_func, _lane, _limit) in JOB_OPERATIONS.items():
+    job_manager.register(_operation, _instrumented(_operation, _func), _lane, _limit)
+# Worker processes re-import the launch script as __mp_main__; only the server owns the jobs and the sweep
+if __name__ != '__mp_main__':
+    job_manager.resume()
+    storage.start()
+
+def _cache_counts():
+    counts = {}
+    caches = {
+        'document': pdf_processor.pdf_processor.doc_cache.stats(),
+        'page': pdf_processor.pdf_processor.page_cache.stats(),
+        'ai_response': ai_services.cache_stats()
+    }
+    for cache, stats in caches.items():
+        counts[(cache, 'hit')] = stats['hits'] + stats.get('diskHits', 0)
+        counts[(cache, 'miss')] = stats['misses']
+    return counts
+
+def _cache_hit_rates():
+    rates = {}
+    counts = _cache_counts()
+    for cache in {cache for cache, _ in counts}:
+        lookups = counts[(cache, 'hit')] + counts[(cache, 'miss')]
+        rates[(cache,)] = round(counts[(cache, 'hit')] / lookups, 4) if lookups else 0.0
+    return rates
+
+metrics.registry.counter('cache_lookups_total', 'Cache lookups by cache and result', ('cache', 'result')) \
+    .set_function(_cache_counts)
+metrics.registry.gauge('cache_hit_ratio', 'Share of cache lookups that hit', ('cache',)) \
+    .set_function(_cache_hit_rates)
+metrics.registry.gauge('job_queue_depth', 'Jobs waiting or running per lane', ('lane',)) \
+    .set_function(lambda: {(lane,): depth for lane, depth in job_manager.queue_depth().items()})
+
+metrics.registry.gauge('storage_bytes', 'Bytes on disk per storage folder, as of the last cleanup pass', ('folder',)) \
+    .set_function(lambda: {(kind,): usage['bytes'] for kind, usage in storage.usage().items()})
+
+@app.route('/api/storage/stats')
+def storage_stats():
+    """Disk usage per folder, quota and the outcome of the last cleanup pass"""
+    return jsonify({
+        'success': True,
+        'storage': storage.stats(),
+        'blobs': blob_store.stats()
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profiles/<profile_id>')
+def get_profile(profile_id):
+    """Folded stacks recorded by the sampling profiler for one request"""
+    profile_path = os.path.join(app.config['PROFILE_FOLDER'], f"{secure_filename(profile_id)}.folded")
+    if not os.path.exists(profile_path):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(os.path.abspath(profile_path), mimetype='text/plain')
+
+@app.route('/api/download/<filename>')
+def download_file(filename):
+    """Download processed files"""
+    return downloads.send(filename)
+
+@app.route('/api/download/bundle/<bundle_id>.zip')
+def download_bundle(bundle_id):
+    """Stream several processed files as one ZIP built on the fly"""
+    return downloads.send_bundle(bundle_id)
+
+if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -1,99 +1,220 @@
-import os
-from openai import OpenAI
-import google.generativeai as genai
-from dotenv import load_dotenv
-import pdf_processor
-
-load_dotenv()
-
-class AIServices:
-    def __init__(self):
-        # Initialize AI clients
-        self.openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.gemini_model = genai.GenerativeModel('gemini-pro')
-    
-    def summarize_pdf(self, pdf_path, max_length=500):
-        """Summarize PDF content using AI"""
-        try:
-            # Extract text from PDF
-            text = pdf_processor.extract_text(pdf_path)
-            
-            if len(text) > 100000:  # Truncate very long documents
-                text = text[:100000]
-            
-            # Use OpenAI for summarization
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that summarizes documents concisely."},
-                    {"role": "user", "content": f"Please summarize the following document in about {max_length} characters:\n\n{text}"}
-                ],
-                max_tokens=300
-            )
-            
-            summary = response.choices[0].message.content
-            return summary
-            
-        except Exception as e:
-            # Fallback to Gemini
-            try:
-                prompt = f"Summarize this document concisely: {text[:50000]}"
-                response = self.gemini_model.generate_content(prompt)
-                return response.text
-            except Exception as e2:
-                return f"Error generating summary: {str(e2)}"
-    
-    def chat_with_pdf(self, pdf_path, question):
-        """Answer questions based on PDF content"""
-        try:
-            # Extract text from PDF
-            text = pdf_processor.extract_text(pdf_path)
-            
-            if len(text) > 50000:  # Truncate for context limits
-                text = text[:50000]
-            
-            # Use Gemini for Q&A
-            prompt = f"Based on the following document, answer this question: {question}\n\nDocument:\n{text}"
-            
-            response = self.gemini_model.generate_content(prompt)
-            return response.text
-            
-        except Exception as e:
-            return f"Error processing your question: {str(e)}"
-    
-    def extract_key_points(self, pdf_path, num_points=10):
-        """Extract key points from PDF"""
-        try:
-            text = pdf_processor.extract_text(pdf_path)
-            
-            if len(text) > 50000:
-                text = text[:50000]
-            
-            prompt = f"Extract {num_points} key points from this document:\n\n{text}"
-            
-            response = self.gemini_model.generate_content(prompt)
-            return response.text
-            
-        except Exception as e:
-            return f"Error extracting key points: {str(e)}"
-    
-    def grammar_check(self, text):
-        """Check and correct grammar"""
-        try:
-            prompt = f"Please check and correct the grammar of this text:\n\n{text}\n\nProvide only the corrected version:"
-            
-            response = self.gemini_model.generate_content(prompt)
-            return response.text
-            
-        except Exception as e:
-            return text  # Return original text if error
-
-# Singleton instance
-ai_services = AIServices()
-
-# Convenience functions
-summarize_pdf = ai_services.summarize_pdf
-chat_with_pdf = ai_services.chat_with_pdf
-extract_key_points = ai_services.extract_key_points
-grammar_check = ai_services.grammar_check
\ No newline at end of file
+import os
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from lazy_imports import lazy_import
+import metrics
+import pdf_processor
+from retrieval import ChunkIndex
+from summarizer import MapReduceSummarizer
+from response_cache import ResponseCache
+
+openai = lazy_import('openai')
+genai = lazy_import('google.generativeai')
+httpx = lazy_import('httpx')
+
+load_dotenv()
+
+class AIServices:
+    def __init__(self):
+        # AI clients are created on first use, so workers start fast and without API keys
+        self._openai_client = None
+        self._gemini_model = None
+        self._http_client = None
+        self._clients_lock = threading.Lock()
+        self._chunk_indexes = OrderedDict()
+        self._chunk_indexes_lock = threading.Lock()
+        self.response_cache = ResponseCache(
+            os.path.join('cache', 'ai_cache.db'),
+            ttl=int(os.getenv('AI_CACHE_TTL', 7 * 24 * 3600)),
+            max_bytes=int(os.getenv('AI_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        )
+        # Chunk summaries are persisted through the response cache, keyed by prompt content
+        # and the model that answered, so the summarizer keeps no copies of its own
+        self.summarizer = MapReduceSummarizer(
+            self._cached_summary,
+            chunk_tokens=3000,
+            max_workers=4,
+            namespace='gpt-3.5-turbo',
+            max_memory_entries=0
+        )
+    
+    @property
+    def http_client(self):
+        """HTTP client whose keep-alive connection pool is shared by every request to the model APIs"""
+        with self._clients_lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                    timeout=httpx.Timeout(60.0, connect=10.0)
+                )
+            return self._http_client
+    
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            http_client = self.http_client
+            with self._clients_lock:
+                if self._openai_client is None:
+                    self._openai_client = openai.OpenAI(
+                        api_key=os.getenv('OPENAI_API_KEY'),
+                        http_client=http_client,
+                        max_retries=2
+                    )
+        return self._openai_client
+    
+    @openai_client.setter
+    def openai_client(self, client):
+        self._openai_client = client
+    
+    @property
+    def gemini_model(self):
+        # The model keeps its gRPC channel open, so reusing it reuses the connection
+        if self._gemini_model is None:
+            with self._clients_lock:
+                if self._gemini_model is None:
+                    genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+                    self._gemini_model = genai.GenerativeModel('gemini-pro')
+        return self._gemini_model
+    
+    @gemini_model.setter
+    def gemini_model(self, model):
+        self._gemini_model = model
+    
+    def _generate(self, operation, prompt):
+        """Run a Gemini prompt through the response cache"""
+        return self.response_cache.get_or_compute(
+            operation, 'gemini-pro', prompt,
+            lambda: self._call_gemini(operation, prompt)
+        )
+    
+    def _call_gemini(self, operation, prompt):
+        with metrics.timed(operation, 'model'):
+            text = self.gemini_model.generate_content(prompt).text
+        metrics.record_bytes(operation, 'in', len(prompt.encode('utf-8')))
+        metrics.record_bytes(operation, 'out', len(text.encode('utf-8')))
+        return text
+    
+    def _cached_summary(self, prompt):
+        """Summarize with OpenAI, falling back to Gemini; each answer is cached under the model that gave it"""
+        try:
+            return self.response_cache.get_or_compute(
+                'summarize', 'gpt-3.5-turbo', prompt,
+                lambda: self._complete_summary(prompt)
+            )
+        except Exception as e:
+            print(f"OpenAI summarization failed, falling back to Gemini: {e}")
+            metrics.record_error('summarize', e)
+            return self._generate('summarize', prompt)
+    
+    def get_chunk_index(self, pdf_path):
+        """Get the persisted retrieval index of a PDF, building it from the text index if needed"""
+        key = os.path.abspath(pdf_path)
+        with self._chunk_indexes_lock:
+            index = self._chunk_indexes.get(key)
+            if index is not None and index.is_current():
+                self._chunk_indexes.move_to_end(key)
+                return index
+        
+        # Concurrent first questions about a PDF build its index once; the others load what it saved
+        with pdf_processor.path_lock(pdf_path, 'chunk-index'):
+            index = ChunkIndex.load(pdf_path)
+            if index is None:
+                index = ChunkIndex.build(pdf_path, pdf_processor.iter_page_text(pdf_path))
+        
+        with self._chunk_indexes_lock:
+            self._chunk_indexes[key] = index
+            while len(self._chunk_indexes) > 32:
+                self._chunk_indexes.popitem(last=False)
+        return index
+    
+    def retrieve(self, pdf_path, question, top_k=6):
+        """Find the chunks of a PDF most relevant to question"""
+        index = self.get_chunk_index(pdf_path)
+        return index.search(question, top_k) or index.leading_chunks(top_k)
+    
+    def _complete_summary(self, prompt):
+        """Run one summarization prompt on OpenAI"""
+        with metrics.timed('summarize', 'model'):
+            response = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant that summarizes documents concisely."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=300
+            )
+        text = response.choices[0].message.content
+        metrics.record_bytes('summarize', 'in', len(prompt.encode('utf-8')))
+        metrics.record_bytes('summarize', 'out', len(text.encode('utf-8')))
+        return text
+    
+    def summarize_pdf(self, pdf_path, max_length=500):
+        """Summarize PDF content using AI"""
+        try:
+            # Long documents are summarized chunk by chunk instead of being truncated
+            return self.summarizer.summarize(pdf_processor.iter_page_text(pdf_path), max_length)
+        except Exception as e:
+            metrics.record_error('summarize', e)
+            return f"Error generating summary: {str(e)}"
+    
+    def chat_with_pdf(self, pdf_path, question, top_k=6, with_sources=False):
+        """Answer questions based on PDF content"""
+        sources = []
+        try:
+            # Send only the most relevant excerpts instead of the whole document
+            chunks = self.retrieve(pdf_path, question, top_k)
+            excerpts = "\n\n".join(f"[Page {chunk['page']}]\n{chunk['text']}" for chunk in chunks)
+            sources = [{'page': chunk['page'], 'score': chunk['score']} for chunk in chunks]
+            
+            # Use Gemini for Q&A
+            prompt = (
+                f"Answer this question using only the document excerpts below, "
+                f"and cite the pages you used as (p. N): {question}\n\nExcerpts:\n{excerpts}"
+            )
+            
+            answer = self._generate('chat', prompt)
+            
+        except Exception as e:
+            metrics.record_error('chat', e)
+            answer = f"Error processing your question: {str(e)}"
+        
+        return (answer, sources) if with_sources else answer
+    
+    def extract_key_points(self, pdf_path, num_points=10):
+        """Extract key points from PDF"""
+        try:
+            text = pdf_processor.extract_text(pdf_path)
+            
+            if len(text) > 50000:
+                text = text[:50000]
+            
+            prompt = f"Extract {num_points} key points from this document:\n\n{text}"
+            
+            return self._generate('key_points', prompt)
+            
+        except Exception as e:
+            metrics.record_error('key_points', e)
+            return f"Error extracting key points: {str(e)}"
+    
+    def grammar_check(self, text):
+        """Check and correct grammar"""
+        try:
+            prompt = f"Please check and correct the grammar of this text:\n\n{text}\n\nProvide only the corrected version:"
+            
+            return self._generate('grammar', prompt)
+            
+        except Exception as e:
+            metrics.record_error('grammar', e)
+            return text  # Return original text if error
+
+# Singleton instance
+ai_services = AIServices()
+
+# Convenience functions
+summarize_pdf = ai_services.summarize_pdf
+chat_with_pdf = ai_services.chat_with_pdf
+extract_key_points = ai_services.extract_key_points
+grammar_check = ai_services.grammar_check
+get_chunk_index = ai_services.get_chunk_index
+cache_stats = ai_services.response_cache.stats
\ No newline at end of file
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class _Flight:
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """SQLite-backed cache of model responses keyed by a hash of (operation, model, prompt).
+
+    Entries expire after ttl seconds and the least recently used ones are evicted
+    once the cache exceeds max_bytes or max_entries. Concurrent requests for the
+    same key share a single model call.
+    """
+
+    def __init__(self, db_path, ttl=7 * 24 * 3600, max_bytes=64 * 1024 * 1024, max_entries=10000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    operation TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+
+    @staticmethod
+    def make_key(operation, model, prompt):
+        return hashlib.sha256(f"{operation}\0{model}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, key, record=True):
+        """Get a fresh cached value, or None"""
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT value FROM responses WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            if record:
+                if row is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        return row[0] if row is not None else None
+
+    def set(self, key, value, operation, model):
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, operation, model, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, operation, model, value, size, now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        expired = self._db.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,)).rowcount
+        self.evictions += max(expired, 0)
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+                "SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            self.evictions += 1
+
+    def get_or_compute(self, operation, model, prompt, compute):
+        """Return the cached response for this prompt, calling compute() at most once per key at a time"""
+        key = self.make_key(operation, model, prompt)
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            # Another leader may have finished between our miss and taking the flight
+            value = self.get(key, record=False)
+            if value is None:
+                value = compute()
+                self.set(key, value, operation, model)
+            flight.value = value
+            return value
+        except Exception as e:
+            # Failures are shared with waiters but never cached
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'entries': count,
+                'bytes': total,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'inFlight': len(self._inflight)
+            }
@@ -0,0 +1,172 @@
+import json
+import os
+import re
+from collections import Counter
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+INDEX_VERSION = 1
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could did do does for from had has have how i if in into is it its
+me my no not of on or our so than that the their them then there these they this to was we were what when
+where which who why will with would you your
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords or single characters"""
+    return [token for token in TOKEN_RE.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def chunk_pages(pages, chunk_chars=1500, overlap=200):
+    """Split (page_number, text) pairs into overlapping chunks that never span pages"""
+    for page_number, text in pages:
+        text = ' '.join(text.split())
+        start = 0
+        while start < len(text):
+            end = min(start + chunk_chars, len(text))
+            if end < len(text):
+                # Break on whitespace so words are not cut in half
+                space = text.rfind(' ', start + chunk_chars // 2, end)
+                end = space if space > 0 else end
+            yield page_number, text[start:end]
+            if end >= len(text):
+                break
+            start = max(end - overlap, start + 1)
+
+
+def _index_paths(pdf_path):
+    return f"{pdf_path}.bm25.npz", f"{pdf_path}.chunks.json"
+
+
+def _signature(pdf_path):
+    stat = os.stat(pdf_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class ChunkIndex:
+    """Okapi BM25 over page chunks, stored as term-major sparse postings in NumPy arrays"""
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, pdf_path, signature, vocab, chunks, chunk_pages, term_ptr, doc_ids, tfs, doc_lens):
+        self.pdf_path = pdf_path
+        self.signature = signature
+        self.vocab = vocab
+        self.chunks = chunks
+        self.chunk_pages = chunk_pages
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+
+        n_docs = len(chunks)
+        doc_freq = np.diff(term_ptr).astype(np.float64)
+        self.idf = np.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        self.avg_doc_len = float(doc_lens.mean()) if n_docs else 0.0
+
+    @classmethod
+    def build(cls, pdf_path, pages, chunk_chars=1500, overlap=200):
+        """Chunk (page_number, text) pairs, index them and persist the index next to the PDF"""
+        signature = _signature(pdf_path)
+        vocab = {}
+        chunks = []
+        page_numbers = []
+        term_ids = []
+        doc_ids = []
+        tfs = []
+        doc_lens = []
+
+        for doc_id, (page_number, text) in enumerate(chunk_pages(pages, chunk_chars, overlap)):
+            counts = Counter(tokenize(text))
+            chunks.append(text)
+            page_numbers.append(page_number)
+            doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        tfs = np.asarray(tfs, dtype=np.float32)
+        # Group postings by term (CSC layout) so a query only touches its own terms
+        order = np.lexsort((doc_ids, term_ids))
+        term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=term_ptr[1:])
+
+        index = cls(pdf_path, signature, vocab, chunks, np.asarray(page_numbers, dtype=np.int32),
+                    term_ptr, doc_ids[order], tfs[order], np.asarray(doc_lens, dtype=np.float32))
+        index.save()
+        return index
+
+    def save(self):
+        arrays_path, chunks_path = _index_paths(self.pdf_path)
+        with open(f"{arrays_path}.tmp", 'wb') as f:
+            np.savez_compressed(f, chunk_pages=self.chunk_pages, term_ptr=self.term_ptr,
+                                doc_ids=self.doc_ids, tfs=self.tfs, doc_lens=self.doc_lens)
+        with open(f"{chunks_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'signature': self.signature,
+                'vocab': self.vocab,
+                'chunks': self.chunks
+            }, f, ensure_ascii=False)
+        os.replace(f"{arrays_path}.tmp", arrays_path)
+        os.replace(f"{chunks_path}.tmp", chunks_path)
+
+    @classmethod
+    def load(cls, pdf_path):
+        """Load a persisted index, or return None if it is missing or stale"""
+        arrays_path, chunks_path = _index_paths(pdf_path)
+        try:
+            with open(chunks_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != INDEX_VERSION or meta.get('signature') != _signature(pdf_path):
+                return None
+            with np.load(arrays_path) as arrays:
+                return cls(pdf_path, meta['signature'], meta['vocab'], meta['chunks'], arrays['chunk_pages'],
+                           arrays['term_ptr'], arrays['doc_ids'], arrays['tfs'], arrays['doc_lens'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def is_current(self):
+        try:
+            return self.signature == _signature(self.pdf_path)
+        except OSError:
+            return False
+
+    def search(self, query, top_k=6):
+        """Return the top_k chunks for query as dicts with page, text and score"""
+        scores = np.zeros(len(self.chunks), dtype=np.float64)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            ids = self.doc_ids[start:end]
+            tf = self.tfs[start:end]
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lens[ids] / self.avg_doc_len)
+            scores[ids] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + norm)
+
+        top_k = min(top_k, int(np.count_nonzero(scores)))
+        if top_k <= 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            {'page': int(self.chunk_pages[i]), 'text': self.chunks[i], 'score': round(float(scores[i]), 4)}
+            for i in best
+        ]
+
+    def leading_chunks(self, count):
+        """The first chunks of the document, for questions with no matching terms"""
+        return [
+            {'page': int(self.chunk_pages[i]), 'text': self.chunks[i], 'score': 0.0}
+            for i in range(min(count, len(self.chunks)))
+        ]
@@ -0,0 +1,150 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_PROMPT = (
+    "Summarize this excerpt from pages {first}-{last} of a longer document. "
+    "Keep names, figures, dates and conclusions:\n\n{text}"
+)
+COMBINE_PROMPT = (
+    "These are summaries of consecutive parts of one document. "
+    "Merge them into a single summary without repeating points:\n\n{text}"
+)
+FINAL_PROMPT = "Please summarize the following document in about {max_length} characters:\n\n{text}"
+
+
+# Rough conversion for English text, good enough to size prompts
+CHARS_PER_TOKEN = 4
+
+
+def _is_boundary(text, target_chars):
+    """Whether a chunk ends after this page, decided from the page's own content.
+
+    The odds grow with the page's length, so chunks average about target_chars.
+    """
+    draw = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:4], 'big') / 2 ** 32
+    return draw < len(text) / target_chars
+
+
+class MapReduceSummarizer:
+    """Summarize long documents by summarizing token-budgeted chunks concurrently and reducing the results.
+
+    complete is any callable taking a prompt and returning the model's text, so
+    a local fake client can stand in for the remote model. Results are kept
+    in memory only; a persistent cache belongs in complete, as AIServices
+    does with its response cache.
+    """
+
+    def __init__(self, complete, chunk_tokens=3000, max_workers=4, namespace='default', max_memory_entries=1024):
+        self.complete = complete
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
+        self.namespace = namespace
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.max_memory_entries = max_memory_entries
+        self._memory_cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def split(self, pages):
+        """Pack (page_number, text) pairs into chunks of at most about chunk_tokens tokens.
+
+        Chunks end at page boundaries picked by the pages' content rather than
+        by a running character count, so editing one page changes only the
+        chunks around it and the rest keep their cached summaries.
+        """
+        budget_chars = self.chunk_tokens * CHARS_PER_TOKEN
+        # Half the budget on average leaves room before a chunk is cut for size
+        target_chars = budget_chars // 2
+        chunks = []
+        current, first, last = [], None, None
+        size = 0
+
+        def flush():
+            if current:
+                chunks.append({'first': first, 'last': last, 'text': '\n'.join(current)})
+
+        for page_number, text in pages:
+            text = text.strip()
+            if not text:
+                continue
+            # A single oversized page is cut into several chunks of its own
+            pieces = [text[i:i + budget_chars] for i in range(0, len(text), budget_chars)]
+            for piece in pieces:
+                if current and size + len(piece) > budget_chars:
+                    flush()
+                    current, size = [], 0
+                if not current:
+                    first = page_number
+                current.append(piece)
+                last = page_number
+                size += len(piece) + 1
+            if _is_boundary(text, target_chars):
+                flush()
+                current, size = [], 0
+        flush()
+        return chunks
+
+    def _cache_key(self, prompt):
+        return hashlib.sha256(f"{self.namespace}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _cached_complete(self, prompt):
+        """Call the model, reusing earlier results for byte-identical prompts"""
+        key = self._cache_key(prompt)
+        with self._lock:
+            if key in self._memory_cache:
+                self.cache_hits += 1
+                self._memory_cache.move_to_end(key)
+                return self._memory_cache[key]
+
+        with self._lock:
+            self.cache_misses += 1
+        result = self.complete(prompt)
+
+        self._remember(key, result)
+        return result
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._memory_cache[key] = result
+            while len(self._memory_cache) > self.max_memory_entries:
+                self._memory_cache.popitem(last=False)
+
+    def _map(self, prompts):
+        # Bounded concurrency keeps us inside the provider's rate limits
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self._cached_complete, prompts))
+
+    def summarize(self, pages, max_length=500):
+        """Summarize (page_number, text) pairs into about max_length characters"""
+        chunks = self.split(pages)
+        if not chunks:
+            return ""
+        if len(chunks) == 1:
+            return self._cached_complete(FINAL_PROMPT.format(max_length=max_length, text=chunks[0]['text']))
+
+        partials = self._map([
+            CHUNK_PROMPT.format(first=chunk['first'], last=chunk['last'], text=chunk['text'])
+            for chunk in chunks
+        ])
+        return self.reduce(partials, max_length)
+
+    def reduce(self, partials, max_length=500):
+        """Combine partial summaries level by level until they fit one prompt"""
+        budget_chars = self.chunk_tokens * CHARS_PER_TOKEN
+        while len(partials) > 1 and sum(len(p) + 2 for p in partials) > budget_chars:
+            groups, group, size = [], [], 0
+            for partial in partials:
+                if group and size + len(partial) > budget_chars:
+                    groups.append(group)
+                    group, size = [], 0
+                group.append(partial)
+                size += len(partial) + 2
+            groups.append(group)
+            if len(groups) == len(partials):
+                # Every partial is already as large as the budget; merge pairwise to make progress
+                groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+            partials = self._map([COMBINE_PROMPT.format(text='\n\n'.join(group)) for group in groups])
+
+        return self._cached_complete(FINAL_PROMPT.format(max_length=max_length, text='\n\n'.join(partials)))
@@ -0,0 +1,230 @@
+import hashlib
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from io import BytesIO
+import metrics
+from lazy_imports import lazy_import
+from worker_pool import WorkerPool
+
+fitz = lazy_import('fitz')  # PyMuPDF
+Image = lazy_import('PIL.Image')
+
+# quality name -> (target image DPI, JPEG quality)
+COMPRESSION_PRESETS = {
+    'low': {'target_dpi': 200, 'jpeg_quality': 85},
+    'medium': {'target_dpi': 150, 'jpeg_quality': 75},
+    'high': {'target_dpi': 96, 'jpeg_quality': 60}
+}
+
+# Images smaller than this are not worth a decode/encode round trip
+MIN_IMAGE_BYTES = 16 * 1024
+
+
+def recompress_images(pdf_path, tasks, jpeg_quality):
+    """Process-pool worker: downsample and JPEG-encode images of a PDF.
+
+    tasks are (xref, target_width, target_height) tuples. Each worker opens its
+    own document, and only images that got smaller travel back to the parent.
+    """
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for xref, target_width, target_height in tasks:
+            try:
+                before = len(doc.xref_stream_raw(xref))
+                pix = fitz.Pixmap(doc, xref)
+                if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+                    pix = fitz.Pixmap(fitz.csRGB, pix)
+                if pix.alpha:
+                    pix = fitz.Pixmap(pix, 0)
+                mode = 'L' if pix.n == 1 else 'RGB'
+                image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+                pix = None
+
+                if target_width < image.width:
+                    image = image.resize((target_width, target_height), Image.LANCZOS)
+                buffered = BytesIO()
+                image.save(buffered, format='JPEG', quality=jpeg_quality, optimize=True)
+                data = buffered.getvalue()
+                results.append((xref, before, data if len(data) < before else None, image.width, image.height, None))
+            except Exception as e:
+                results.append((xref, None, None, None, None, str(e)))
+    return results
+
+
+class CompressionEngine:
+    """Shrinks PDFs by downsampling and re-encoding images, subsetting fonts and merging duplicate objects"""
+
+    def __init__(self, max_workers=None, memory_cap=256 * 1024 * 1024, batch_size=8):
+        self.max_workers = max_workers or min(os.cpu_count() or 1, 4)
+        # Upper bound on decoded pixels held by all workers at once
+        self.memory_cap = memory_cap
+        self.batch_size = batch_size
+
+    @staticmethod
+    def plan(doc, target_dpi):
+        """Find each distinct image, the largest size it is shown at and the pixels that size needs"""
+        images = {}
+        for page in doc:
+            for item in page.get_images(full=True):
+                xref, smask, width, height = item[0], item[1], item[2], item[3]
+                if xref in images:
+                    entry = images[xref]
+                else:
+                    entry = images[xref] = {
+                        'xref': xref,
+                        'page': page.number + 1,
+                        'width': width,
+                        'height': height,
+                        'smask': smask,
+                        'displayWidth': 0.0,
+                        'displayHeight': 0.0
+                    }
+                for rect in page.get_image_rects(xref):
+                    entry['displayWidth'] = max(entry['displayWidth'], rect.width)
+                    entry['displayHeight'] = max(entry['displayHeight'], rect.height)
+
+        for entry in images.values():
+            if entry['displayWidth'] <= 0:
+                entry['dpi'] = None
+                continue
+            inches = entry['displayWidth'] / 72
+            entry['dpi'] = round(entry['width'] / inches)
+            scale = min(1.0, target_dpi * inches / entry['width'])
+            entry['targetWidth'] = max(1, math.ceil(entry['width'] * scale))
+            entry['targetHeight'] = max(1, math.ceil(entry['height'] * scale))
+        return list(images.values())
+
+    def _select(self, doc, images):
+        """Pick images to recompress, sharing work between byte-identical image streams"""
+        selected = []
+        duplicates = {}
+        seen = {}
+        skipped = []
+        for entry in images:
+            reason = None
+            if entry['smask']:
+                reason = 'transparency'
+            elif entry['dpi'] is None:
+                reason = 'not displayed'
+            else:
+                raw = doc.xref_stream_raw(entry['xref'])
+                entry['before'] = len(raw)
+                if entry['before'] < MIN_IMAGE_BYTES:
+                    reason = 'small'
+                else:
+                    digest = hashlib.sha256(raw).digest()
+                    if digest in seen:
+                        duplicates[entry['xref']] = seen[digest]
+                        continue
+                    seen[digest] = entry['xref']
+            if reason:
+                skipped.append((entry, reason))
+            else:
+                selected.append(entry)
+        return selected, duplicates, skipped
+
+    def _recompress(self, pdf_path, selected, jpeg_quality):
+        """Run recompress_images over batches, keeping decoded pixels under memory_cap"""
+        batches = [selected[i:i + self.batch_size] for i in range(0, len(selected), self.batch_size)]
+
+        def weight(batch):
+            return sum(entry['width'] * entry['height'] * 3 for entry in batch)
+
+        if self.max_workers <= 1 or len(batches) <= 1:
+            for batch in batches:
+                yield from recompress_images(pdf_path, [(e['xref'], e['targetWidth'], e['targetHeight']) for e in batch],
+                                         jpeg_quality)
+            return
+
+        with WorkerPool(max_workers=self.max_workers) as pool:
+            pending = {}
+            in_flight = 0
+            next_batch = 0
+            while next_batch < len(batches) or pending:
+                while next_batch < len(batches) and len(pending) < self.max_workers * 2 and (
+                        not pending or in_flight + weight(batches[next_batch]) <= self.memory_cap):
+                    batch = batches[next_batch]
+                    future = pool.submit(recompress_images, pdf_path,
+                                         [(e['xref'], e['targetWidth'], e['targetHeight']) for e in batch],
+                                         jpeg_quality)
+                    pending[future] = weight(batch)
+                    in_flight += pending[future]
+                    next_batch += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight -= pending.pop(future)
+                    yield from pool.result(future)
+
+    def compress(self, input_path, output_path, quality='medium', subset_fonts=True):
+        """Write a compressed copy of input_path and return a report of what was saved"""
+        preset = COMPRESSION_PRESETS.get(quality, COMPRESSION_PRESETS['medium'])
+        report = {
+            'quality': quality,
+            'targetDpi': preset['target_dpi'],
+            'jpegQuality': preset['jpeg_quality'],
+            'originalSize': os.path.getsize(input_path),
+            'images': [],
+            'duplicateImages': 0,
+            'fontsSubset': False
+        }
+
+        doc = fitz.open(input_path)
+        try:
+            images = self.plan(doc, preset['target_dpi'])
+            selected, duplicates, skipped = self._select(doc, images)
+            by_xref = {entry['xref']: entry for entry in images}
+
+            for entry, reason in skipped:
+                report['images'].append(_image_report(entry, 'skipped', reason=reason))
+
+            replacements = {}
+            recompressed = self._recompress(input_path, selected, preset['jpeg_quality'])
+            for xref, before, data, width, height, error in recompressed:
+                entry = by_xref[xref]
+                if error:
+                    report['images'].append(_image_report(entry, 'failed', reason=error))
+                elif data is None:
+                    report['images'].append(_image_report(entry, 'kept', reason='no gain'))
+                else:
+                    replacements[xref] = data
+                    doc[entry['page'] - 1].replace_image(xref, stream=data)
+                    report['images'].append(_image_report(entry, 'recompressed', after=len(data),
+                                                          width=width, height=height))
+
+            # Identical image streams get the result computed for their first occurrence
+            for xref, original in duplicates.items():
+                report['duplicateImages'] += 1
+                if original in replacements:
+                    doc[by_xref[xref]['page'] - 1].replace_image(xref, stream=replacements[original])
+
+            if subset_fonts:
+                try:
+                    doc.subset_fonts()
+                    report['fontsSubset'] = True
+                except Exception as e:
+                    print(f"Font subsetting skipped: {e}")
+
+            # garbage=4 also merges byte-identical objects, e.g. fonts embedded once per page
+            with metrics.timed('compress', 'save'):
+                doc.save(output_path, garbage=4, deflate=True, deflate_images=True, deflate_fonts=True)
+        finally:
+            doc.close()
+
+        report['compressedSize'] = os.path.getsize(output_path)
+        report['savedBytes'] = report['originalSize'] - report['compressedSize']
+        return report
+
+
+def _image_report(entry, action, reason=None, after=None, width=None, height=None):
+    return {
+        'xref': entry['xref'],
+        'page': entry['page'],
+        'action': action,
+        'reason': reason,
+        'before': entry.get('before'),
+        'after': after,
+        'dpi': entry.get('dpi'),
+        'size': [entry['width'], entry['height']],
+        'newSize': [width, height] if width else None
+    }
@@ -0,0 +1,184 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from lazy_imports import lazy_import
+from worker_pool import WorkerPool
+
+fitz = lazy_import('fitz')  # PyMuPDF
+docx = lazy_import('docx')
+docx_text = lazy_import('docx.enum.text')
+docx_shared = lazy_import('docx.shared')
+
+# Formats python-docx can embed directly; anything else is re-encoded as PNG
+DOCX_IMAGE_EXTENSIONS = ('png', 'jpeg', 'jpg', 'gif', 'bmp', 'tiff')
+
+# PyMuPDF span flags
+_SUPERSCRIPT, _ITALIC, _BOLD = 1, 2, 16
+
+
+def extract_page_layouts(pdf_path, page_numbers, image_dir):
+    """Process-pool worker: turn pages into lists of paragraph, image and table elements in reading order.
+
+    Images are written to image_dir so only their paths travel back to the parent.
+    """
+    layouts = []
+    with fitz.open(pdf_path) as doc:
+        for page_number in page_numbers:
+            page = doc[page_number - 1]
+            elements = []
+
+            table_boxes = []
+            try:
+                for table in page.find_tables().tables:
+                    rows = [[' '.join((cell or '').split()) for cell in row] for row in table.extract()]
+                    if rows:
+                        table_boxes.append(fitz.Rect(table.bbox))
+                        elements.append({'type': 'table', 'top': table.bbox[1], 'rows': rows})
+            except Exception as e:
+                print(f"Table detection failed on page {page_number}: {e}")
+
+            for index, block in enumerate(page.get_text('dict', sort=True)['blocks']):
+                bbox = fitz.Rect(block['bbox'])
+                if any(bbox.intersects(box) for box in table_boxes):
+                    continue
+                if block['type'] == 1:
+                    path = _write_image(block, os.path.join(image_dir, f"p{page_number}_{index}"))
+                    if path:
+                        elements.append({'type': 'image', 'top': bbox.y0, 'path': path, 'width': bbox.width})
+                    continue
+
+                runs = _block_runs(block)
+                if runs:
+                    elements.append({'type': 'paragraph', 'top': bbox.y0, 'runs': runs})
+
+            # sort=True already orders text; tables and images are slotted in by position
+            elements.sort(key=lambda element: element['top'])
+            layouts.append((page_number, elements))
+    return layouts
+
+
+def _block_runs(block):
+    """Flatten a text block's lines into runs, joining wrapped lines and merging same-styled spans"""
+    runs = []
+    for line in block['lines']:
+        for span in line['spans']:
+            text = span['text']
+            if not text:
+                continue
+            style = (
+                span['font'],
+                round(span['size'] * 2) / 2,
+                bool(span['flags'] & _BOLD) or 'bold' in span['font'].lower(),
+                bool(span['flags'] & _ITALIC) or 'italic' in span['font'].lower(),
+                bool(span['flags'] & _SUPERSCRIPT),
+                span['color']
+            )
+            if runs and runs[-1]['style'] == style:
+                runs[-1]['text'] += text
+            else:
+                runs.append({'style': style, 'text': text})
+        if runs:
+            # Lines wrapped by the PDF layout become one flowing paragraph
+            if runs[-1]['text'].endswith('-'):
+                runs[-1]['text'] = runs[-1]['text'][:-1]
+            elif not runs[-1]['text'].endswith(' '):
+                runs[-1]['text'] += ' '
+    if runs:
+        runs[-1]['text'] = runs[-1]['text'].rstrip()
+    return [run for run in runs if run['text']]
+
+
+def _write_image(block, path_stem):
+    ext = block.get('ext', 'png').lower()
+    data = block['image']
+    try:
+        if ext not in DOCX_IMAGE_EXTENSIONS:
+            pix = fitz.Pixmap(data)
+            if pix.colorspace and pix.colorspace.n > 3:
+                pix = fitz.Pixmap(fitz.csRGB, pix)
+            data, ext = pix.tobytes('png'), 'png'
+        path = f"{path_stem}.{ext}"
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+    except Exception as e:
+        print(f"Skipping image that could not be converted: {e}")
+        return None
+
+
+def iter_page_layouts(pdf_path, page_count, image_dir, max_workers=1, batch_size=8):
+    """Yield (page_number, elements) in page order while batches are extracted in parallel"""
+    batches = [list(range(start, min(start + batch_size, page_count + 1)))
+               for start in range(1, page_count + 1, batch_size)]
+    if max_workers <= 1 or len(batches) <= 1:
+        for batch in batches:
+            yield from extract_page_layouts(pdf_path, batch, image_dir)
+        return
+
+    with WorkerPool(max_workers=max_workers) as pool:
+        pending = {}
+        finished = {}
+        next_batch = next_yield = 0
+        while next_yield < len(batches):
+            while next_batch < len(batches) and len(pending) < max_workers * 2:
+                pending[pool.submit(extract_page_layouts, pdf_path, batches[next_batch], image_dir)] = next_batch
+                next_batch += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished[pending.pop(future)] = pool.result(future)
+            # Pages must be appended to the document in order
+            while next_yield in finished:
+                yield from finished.pop(next_yield)
+                next_yield += 1
+
+
+def write_docx(page_layouts, output_path, progress=None, page_count=None):
+    """Append page layouts to a new Word document, one page break between PDF pages"""
+    document = docx.Document()
+    section = document.sections[0]
+    max_width = section.page_width - section.left_margin - section.right_margin
+
+    for index, (page_number, elements) in enumerate(page_layouts):
+        if index:
+            document.add_paragraph().add_run().add_break(docx_text.WD_BREAK.PAGE)
+        for element in elements:
+            if element['type'] == 'paragraph':
+                _add_paragraph(document, element['runs'])
+            elif element['type'] == 'image':
+                try:
+                    width = min(docx_shared.Pt(element['width']), max_width)
+                    document.add_picture(element['path'], width=width)
+                except Exception as e:
+                    print(f"Skipping image on page {page_number}: {e}")
+            else:
+                _add_table(document, element['rows'])
+        if progress:
+            progress(page_number, page_count)
+
+    document.save(output_path)
+    return output_path
+
+
+def _add_paragraph(document, runs):
+    paragraph = document.add_paragraph()
+    paragraph.paragraph_format.space_after = docx_shared.Pt(4)
+    for run in runs:
+        font_name, size, bold, italic, superscript, color = run['style']
+        docx_run = paragraph.add_run(run['text'])
+        font = docx_run.font
+        # Embedded PDF fonts carry a subset prefix such as "ABCDEF+Arial"
+        font.name = font_name.split('+')[-1].split('-')[0]
+        font.size = docx_shared.Pt(size)
+        font.bold = bold
+        font.italic = italic
+        font.superscript = superscript
+        if color:
+            font.color.rgb = docx_shared.RGBColor((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+
+
+def _add_table(document, rows):
+    width = max(len(row) for row in rows)
+    table = document.add_table(rows=len(rows), cols=width)
+    table.style = 'Table Grid'
+    for row, values in zip(table.rows, rows):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
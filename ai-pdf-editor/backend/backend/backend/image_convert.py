@@ -0,0 +1,116 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from lazy_imports import lazy_import
+from worker_pool import WorkerPool
+
+img2pdf = lazy_import('img2pdf')
+Image = lazy_import('PIL.Image')
+ImageOps = lazy_import('PIL.ImageOps')
+
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'webp', 'tif', 'tiff', 'bmp')
+
+# Page size name -> (width, height) in millimetres; None keeps each image's own size
+PAGE_SIZES = {
+    'a4': (210, 297),
+    'letter': (215.9, 279.4),
+    'legal': (215.9, 355.6)
+}
+
+
+def is_passthrough(image_path):
+    """Whether img2pdf can embed the file as is: JPEGs are copied byte for byte, plain PNGs losslessly"""
+    with Image.open(image_path) as image:
+        if image.format == 'JPEG':
+            return image.mode in ('L', 'RGB', 'CMYK')
+        return image.format == 'PNG' and image.mode in ('1', 'L', 'RGB') and not image.info.get('interlace')
+
+
+def normalize_image(source_path, output_path):
+    """Rewrite an image img2pdf cannot take (alpha, palette, WebP, TIFF...) as an upright PNG"""
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P', 'PA'):
+            # PDF pages have no alpha here, so flatten transparency onto white
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode not in ('1', 'L', 'RGB'):
+            image = image.convert('RGB')
+        image.save(output_path, format='PNG')
+    return output_path
+
+
+def _layout(page_size):
+    if page_size is None:
+        return img2pdf.default_layout_fun
+    width, height = PAGE_SIZES[page_size]
+    return img2pdf.get_layout_fun((img2pdf.mm_to_pt(width), img2pdf.mm_to_pt(height)), fit=img2pdf.FitMode.into)
+
+
+def build_part(image_paths, part_path, scratch_dir, page_size=None):
+    """Process-pool worker: write one PDF from a batch of images, one page each.
+
+    Only this batch's images are ever held by img2pdf, and the part goes
+    straight to disk. Returns (embedded, normalized) image counts.
+    """
+    inputs = []
+    normalized = []
+    stem = os.path.splitext(os.path.basename(part_path))[0]
+    try:
+        for i, image_path in enumerate(image_paths):
+            if is_passthrough(image_path):
+                inputs.append(image_path)
+            else:
+                path = normalize_image(image_path, os.path.join(scratch_dir, f"{stem}_{i}.png"))
+                normalized.append(path)
+                inputs.append(path)
+
+        with open(part_path, 'wb') as f:
+            # ifvalid honours EXIF orientation of passed-through JPEGs without re-encoding them
+            img2pdf.convert(*inputs, layout_fun=_layout(page_size), rotation=img2pdf.Rotation.ifvalid,
+                            outputstream=f)
+    finally:
+        for path in normalized:
+            if os.path.exists(path):
+                os.remove(path)
+    return len(inputs) - len(normalized), len(normalized)
+
+
+def write_parts(image_paths, scratch_dir, max_workers, page_size=None, batch_size=25, progress=None):
+    """Build PDF parts of batch_size images in a process pool, returning (part paths in order, report)"""
+    if page_size is not None and page_size not in PAGE_SIZES:
+        raise ValueError(f"Unsupported page size: {page_size}")
+
+    batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+    part_paths = [os.path.join(scratch_dir, f"part_{i:05d}.pdf") for i in range(len(batches))]
+    report = {'images': len(image_paths), 'embedded': 0, 'normalized': 0, 'parts': len(batches)}
+    done = 0
+
+    def finish(counts, batch_length):
+        nonlocal done
+        report['embedded'] += counts[0]
+        report['normalized'] += counts[1]
+        done += batch_length
+        if progress:
+            progress(done, len(image_paths))
+
+    if max_workers <= 1 or len(batches) <= 1:
+        for batch, part_path in zip(batches, part_paths):
+            finish(build_part(batch, part_path, scratch_dir, page_size), len(batch))
+        return part_paths, report
+
+    # Part paths are fixed up front, so batches may finish in any order
+    with WorkerPool(max_workers=max_workers) as pool:
+        pending = {}
+        next_batch = 0
+        while next_batch < len(batches) or pending:
+            while next_batch < len(batches) and len(pending) < max_workers * 2:
+                future = pool.submit(build_part, batches[next_batch], part_paths[next_batch], scratch_dir,
+                                     page_size)
+                pending[future] = len(batches[next_batch])
+                next_batch += 1
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                finish(pool.result(future), pending.pop(future))
+    return part_paths, report
@@ -0,0 +1,43 @@
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is imported on first attribute access.
+
+    Heavy backends (PyMuPDF, PIL, NumPy, the AI SDKs) cost seconds of worker
+    startup, while most requests only ever touch a few of them.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    # Later lookups hit the copied attributes and skip __getattr__
+                    self.__dict__.update(module.__dict__)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __reduce__(self):
+        # Pickled references (e.g. in process pool arguments) resolve to the real module
+        return importlib.import_module, (self.__name__,)
+
+
+def lazy_import(name):
+    """Return a module proxy for name; the import happens when it is first used"""
+    return LazyModule(name)
@@ -0,0 +1,309 @@
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+# Seconds; wide enough for a cached page hit and for a long model call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def set_function(self, func):
+        """Read values at scrape time; func returns {label values tuple: value}"""
+        self._callbacks.append(func)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, labelnames, label values, value) for the exposition format"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '', self.labelnames, key, value
+        for func in self._callbacks:
+            try:
+                values = func()
+            except Exception as e:
+                print(f"Metric callback for {self.name} failed: {e}")
+                continue
+            for key, value in values.items():
+                yield '', self.labelnames, key, value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        labelnames = self.labelnames + ('le',)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield '_bucket', labelnames, key + (_format_value(bound),), cumulative
+            yield '_sum', self.labelnames, key, total
+            yield '_count', self.labelnames, key, count
+
+
+class Registry:
+    """Process-local metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labelnames, values, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    'pdf_stage_seconds', 'Time spent per pipeline stage (parse, render, encode, save, extract, model)',
+    ('operation', 'stage')
+)
+bytes_total = registry.counter('pdf_bytes_total', 'Bytes read and written by operations', ('operation', 'direction'))
+pages_total = registry.counter('pdf_pages_total', 'Pages processed by operations', ('operation',))
+errors_total = registry.counter('pdf_errors_total', 'Errors raised or swallowed by operations', ('operation', 'error'))
+request_seconds = registry.histogram(
+    'http_request_seconds', 'HTTP request latency by route', ('endpoint', 'method', 'status')
+)
+
+_request = threading.local()
+
+
+class _Trace:
+    """Stage timings (and the optional profiler) of one request, shared with the threads doing its work"""
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def add(self, operation, stage, elapsed):
+        with self._lock:
+            self.stages.append((operation, stage, elapsed))
+
+    def totals(self):
+        totals = {}
+        with self._lock:
+            for _operation, stage, elapsed in self.stages:
+                totals[stage] = totals.get(stage, 0.0) + elapsed
+        return list(totals.items())
+
+
+def record_stage(operation, stage, elapsed):
+    """Record a stage timed elsewhere, e.g. in a worker process"""
+    stage_seconds.observe(elapsed, operation=operation, stage=stage)
+    trace = getattr(_request, 'trace', None)
+    if trace is not None:
+        trace.add(operation, stage, elapsed)
+
+
+@contextmanager
+def timed(operation, stage):
+    """Time a block into pdf_stage_seconds and into the current request's stage breakdown"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(operation, stage, time.perf_counter() - start)
+
+
+def record_error(operation, error):
+    errors_total.inc(operation=operation, error=type(error).__name__)
+
+
+def record_bytes(operation, direction, amount):
+    if amount:
+        bytes_total.inc(amount, operation=operation, direction=direction)
+
+
+def record_pages(operation, count=1):
+    if count:
+        pages_total.inc(count, operation=operation)
+
+
+def begin_request(profiler=None):
+    _request.trace = _Trace(profiler)
+    return _request.trace
+
+
+def end_request():
+    """Stop collecting stages for this thread and return (stage, seconds) totals in first-seen order"""
+    trace = getattr(_request, 'trace', None)
+    _request.trace = None
+    return trace.totals() if trace is not None else []
+
+
+def carry():
+    """Capture the current request for work handed to another thread.
+
+    Returns None outside a request, otherwise a factory of context managers
+    that make the thread they run in record its stages into the request and
+    be sampled by the request's profiler.
+    """
+    trace = getattr(_request, 'trace', None)
+    if trace is None:
+        return None
+
+    @contextmanager
+    def attached():
+        previous = getattr(_request, 'trace', None)
+        _request.trace = trace
+        if trace.profiler is not None:
+            trace.profiler.add_thread()
+        try:
+            yield
+        finally:
+            if trace.profiler is not None:
+                trace.profiler.remove_thread()
+            _request.trace = previous
+    return attached
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of a set of threads at a fixed interval and aggregates folded stacks.
+
+    The output is the "folded" format read by flamegraph tools: one
+    semicolon-separated stack per line, rooted at the thread's name, followed
+    by its sample count. The creating thread is sampled from the start;
+    threads doing work for it (job workers) join with add_thread().
+    """
+
+    def __init__(self, thread_id=None, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = _Tally()
+        self._threads = {thread_id or threading.get_ident(): threading.current_thread().name}
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_thread(self, thread_id=None, name=None):
+        with self._threads_lock:
+            self._threads[thread_id or threading.get_ident()] = name or threading.current_thread().name
+
+    def remove_thread(self, thread_id=None):
+        with self._threads_lock:
+            self._threads.pop(thread_id or threading.get_ident(), None)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._threads_lock:
+                threads = list(self._threads.items())
+            for thread_id, name in threads:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    stack.append(name)
+                    self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
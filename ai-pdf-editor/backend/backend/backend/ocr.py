@@ -0,0 +1,248 @@
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+import metrics
+from lazy_imports import lazy_import
+from worker_pool import WorkerPool
+
+fitz = lazy_import('fitz')  # PyMuPDF
+Image = lazy_import('PIL.Image')
+pytesseract = lazy_import('pytesseract')
+
+# Bumped when the word format or the rasterization changes, so cached pages are redone
+OCR_VERSION = 1
+
+OCR_DPI = 300
+# Rasterizing below this loses small print; above the scan's own resolution only adds pixels
+MIN_OCR_DPI = 150
+# Cap on pixels per page so oversized pages do not exhaust a worker's memory
+MAX_OCR_PIXELS = 40 * 1024 * 1024
+OCR_LANGUAGE = 'eng'
+
+# Words Tesseract is less sure of than this are left out of the text layer
+MIN_CONFIDENCE = 30
+
+
+def ocr_dpi(page, target_dpi=OCR_DPI):
+    """Pick a rasterization DPI: the target, capped by the page's scan resolution and MAX_OCR_PIXELS"""
+    dpi = target_dpi
+    native = 0
+    for item in page.get_images(full=True):
+        xref, width = item[0], item[2]
+        for rect in page.get_image_rects(xref):
+            if rect.width > 0:
+                native = max(native, width / (rect.width / 72))
+    if native:
+        dpi = min(dpi, math.ceil(native))
+
+    area = (page.rect.width / 72) * (page.rect.height / 72)
+    if area > 0:
+        dpi = min(dpi, int(math.sqrt(MAX_OCR_PIXELS / area)))
+    return max(dpi, MIN_OCR_DPI)
+
+
+def page_hash(doc, page, dpi, language):
+    """Hash everything that decides a page's OCR result, without rasterizing it"""
+    digest = hashlib.sha256()
+    digest.update(f"{OCR_VERSION}:{dpi}:{language}:{page.rotation}:{tuple(page.rect)}".encode())
+    for xref in page.get_contents():
+        digest.update(doc.xref_stream_raw(xref) or b'')
+    for item in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(item[0]) or b'')
+    return digest.hexdigest()
+
+
+def ocr_pages(pdf_path, tasks, language):
+    """Process-pool worker: rasterize pages and read their words with Tesseract.
+
+    tasks are (page_number, dpi) tuples. Each worker opens its own document and
+    returns (page_number, words, error), with words as [x0, y0, x1, y1, text]
+    in unrotated PDF points.
+    """
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for page_number, dpi in tasks:
+            try:
+                page = doc[page_number - 1]
+                pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+                image = Image.frombytes('L', (pix.width, pix.height), pix.samples)
+                pix = None
+
+                data = pytesseract.image_to_data(image, lang=language, output_type=pytesseract.Output.DICT)
+                # Pixmap pixels map to the rotated page; text is written in unrotated coordinates
+                to_page = fitz.Matrix(72 / dpi, 72 / dpi) * page.derotation_matrix
+                words = []
+                for i, text in enumerate(data['text']):
+                    text = text.strip()
+                    if not text or float(data['conf'][i]) < MIN_CONFIDENCE:
+                        continue
+                    rect = fitz.Rect(
+                        data['left'][i],
+                        data['top'][i],
+                        data['left'][i] + data['width'][i],
+                        data['top'][i] + data['height'][i]
+                    ) * to_page
+                    words.append([round(rect.x0, 2), round(rect.y0, 2), round(rect.x1, 2), round(rect.y1, 2), text])
+                results.append((page_number, words, None))
+            except Exception as e:
+                results.append((page_number, None, str(e)))
+    return results
+
+
+def add_text_layer(page, words):
+    """Write OCR words onto a page as invisible text (render mode 3) over their boxes"""
+    for x0, y0, x1, y1, text in words:
+        if page.rotation in (90, 270):
+            height, width = x1 - x0, y1 - y0
+        else:
+            height, width = y1 - y0, x1 - x0
+        if height <= 0 or width <= 0:
+            continue
+        fontsize = height
+        if page.rotation == 0:
+            point = fitz.Point(x0, y1 - height * 0.2)
+        elif page.rotation == 90:
+            point = fitz.Point(x0 + height * 0.2, y0)
+        elif page.rotation == 180:
+            point = fitz.Point(x1, y0 + height * 0.2)
+        else:
+            point = fitz.Point(x1 - height * 0.2, y1)
+
+        # Stretch each word to its box so search hits and highlights line up with the scan
+        natural = fitz.get_text_length(text, fontname='helv', fontsize=fontsize)
+        morph = None
+        if natural > 0 and page.rotation == 0:
+            morph = (point, fitz.Matrix(width / natural, 1))
+        page.insert_text(point, text, fontsize=fontsize, fontname='helv', render_mode=3,
+                         rotate=page.rotation, morph=morph)
+
+
+class OCRCache:
+    """OCR words per page hash, one small JSON file each, so unchanged pages are never re-read.
+
+    A hit refreshes the entry's mtime, so the storage manager's TTL on the
+    cache folder expires entries by idle time rather than by age.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                words = json.load(f)
+            os.utime(path)
+            return words
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, words):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(words, f)
+        os.replace(f"{path}.tmp", path)
+
+
+class OCREngine:
+    """Adds a searchable text layer to pages that have none, OCRing them in a process pool"""
+
+    def __init__(self, cache_dir, max_workers=None, dpi=OCR_DPI, language=OCR_LANGUAGE, batch_size=2):
+        self.cache = OCRCache(cache_dir)
+        self.max_workers = max_workers or min(os.cpu_count() or 1, 4)
+        self.dpi = dpi
+        self.language = language
+        self.batch_size = batch_size
+
+    def _run(self, pdf_path, tasks, language):
+        """Yield ocr_pages results for (page_number, dpi) tasks, with a bounded number of batches in flight"""
+        batches = [tasks[i:i + self.batch_size] for i in range(0, len(tasks), self.batch_size)]
+        if self.max_workers <= 1 or len(batches) <= 1:
+            for batch in batches:
+                yield from ocr_pages(pdf_path, batch, language)
+            return
+
+        with WorkerPool(max_workers=self.max_workers) as pool:
+            pending = set()
+            next_batch = 0
+            while next_batch < len(batches) or pending:
+                while next_batch < len(batches) and len(pending) < self.max_workers * 2:
+                    pending.add(pool.submit(ocr_pages, pdf_path, batches[next_batch], language))
+                    next_batch += 1
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from pool.result(future)
+
+    def ocr(self, input_path, output_path, pages=None, language=None, force=False, progress=None):
+        """OCR pages without a text layer and save the result to output_path.
+
+        pages limits the candidates (1-based); by default every page without
+        extractable text is OCRed. With force, pages are OCRed even if they
+        already have text. Returns a report; 'written' is False when no words
+        were found and nothing was saved.
+        """
+        language = language or self.language
+        report = {
+            'language': language,
+            'ocrPages': [],
+            'cachedPages': [],
+            'failedPages': [],
+            'skippedPages': 0,
+            'words': 0,
+            'written': False
+        }
+
+        doc = fitz.open(input_path)
+        try:
+            candidates = pages or range(1, doc.page_count + 1)
+            layers = {}
+            tasks = []
+            keys = {}
+            for page_number in candidates:
+                page = doc[page_number - 1]
+                if not force and page.get_text().strip():
+                    report['skippedPages'] += 1
+                    continue
+                dpi = ocr_dpi(page, self.dpi)
+                key = keys[page_number] = page_hash(doc, page, dpi, language)
+                words = self.cache.get(key)
+                if words is not None:
+                    layers[page_number] = words
+                    report['cachedPages'].append(page_number)
+                else:
+                    tasks.append((page_number, dpi))
+
+            total = len(tasks)
+            with metrics.timed('ocr', 'recognize'):
+                for done, (page_number, words, error) in enumerate(self._run(input_path, tasks, language), 1):
+                    if error:
+                        print(f"OCR of page {page_number} failed: {error}")
+                        report['failedPages'].append({'page': page_number, 'error': error})
+                    else:
+                        self.cache.put(keys[page_number], words)
+                        layers[page_number] = words
+                        report['ocrPages'].append(page_number)
+                    if progress:
+                        progress(done, total)
+            metrics.record_pages('ocr', len(report['ocrPages']))
+
+            for page_number in sorted(layers):
+                add_text_layer(doc[page_number - 1], layers[page_number])
+                report['words'] += len(layers[page_number])
+
+            if report['words']:
+                with metrics.timed('ocr', 'save'):
+                    doc.save(output_path, garbage=3, deflate=True)
+                report['written'] = True
+        finally:
+            doc.close()
+
+        report['ocrPages'].sort()
+        return report
@@ -1,261 +1,1027 @@
-import os
-import PyPDF2
-import pdfplumber
-from pdf2image import convert_from_path
-import base64
-from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
-import fitz  # PyMuPDF
-import img2pdf
-from docx import Document
-import pandas as pd
-
-class PDFProcessor:
-    def __init__(self):
-        self.temp_dir = "temp"
-        os.makedirs(self.temp_dir, exist_ok=True)
-    
-    def get_page_count(self, pdf_path):
-        """Get total number of pages in PDF"""
-        with open(pdf_path, 'rb') as file:
-            pdf = PyPDF2.PdfReader(file)
-            return len(pdf.pages)
-    
-    def get_page_as_image(self, pdf_path, page_number, dpi=150):
-        """Convert PDF page to base64 image for display"""
-        try:
-            # Convert PDF page to image
-            images = convert_from_path(pdf_path, first_page=page_number, last_page=page_number, dpi=dpi)
-            
-            if images:
-                # Convert to base64
-                buffered = BytesIO()
-                images[0].save(buffered, format="PNG", optimize=True)
-                img_str = base64.b64encode(buffered.getvalue()).decode()
-                
-                return f"data:image/png;base64,{img_str}"
-        except Exception as e:
-            print(f"Error converting page to image: {e}")
-            return None
-    
-    def add_text_to_pdf(self, input_path, output_path, text, page_num=1, x=50, y=50):
-        """Add text to PDF at specified position"""
-        try:
-            # Open PDF
-            doc = fitz.open(input_path)
-            page = doc[page_num - 1]
-            
-            # Add text
-            page.insert_text((x, y), text, fontsize=11, color=(0, 0, 0))
-            
-            # Save
-            doc.save(output_path)
-            doc.close()
-            return True
-        except Exception as e:
-            print(f"Error adding text: {e}")
-            return False
-    
-    def highlight_text(self, input_path, output_path, page_num, text, color="#ffff00"):
-        """Highlight text in PDF"""
-        try:
-            doc = fitz.open(input_path)
-            page = doc[page_num - 1]
-            
-            # Search for text
-            text_instances = page.search_for(text)
-            
-            # Highlight each occurrence
-            for inst in text_instances:
-                highlight = page.add_highlight_annot(inst)
-                highlight.set_colors(stroke=fitz.utils.getColor(color))
-                highlight.update()
-            
-            doc.save(output_path)
-            doc.close()
-            return True
-        except Exception as e:
-            print(f"Error highlighting text: {e}")
-            return False
-    
-    def add_image_to_pdf(self, input_path, output_path, image_data, page_num, x=50, y=50):
-        """Add image to PDF"""
-        try:
-            doc = fitz.open(input_path)
-            page = doc[page_num - 1]
-            
-            # Decode base64 image
-            if image_data.startswith('data:image'):
-                image_data = image_data.split(',')[1]
-            
-            img_bytes = base64.b64decode(image_data)
-            
-            # Add image
-            rect = fitz.Rect(x, y, x + 100, y + 100)  # Adjust size as needed
-            page.insert_image(rect, stream=img_bytes)
-            
-            doc.save(output_path)
-            doc.close()
-            return True
-        except Exception as e:
-            print(f"Error adding image: {e}")
-            return False
-    
-    def merge_pdfs(self, pdf_paths, output_path):
-        """Merge multiple PDFs"""
-        try:
-            merger = PyPDF2.PdfMerger()
-            
-            for pdf_path in pdf_paths:
-                merger.append(pdf_path)
-            
-            merger.write(output_path)
-            merger.close()
-            return True
-        except Exception as e:
-            print(f"Error merging PDFs: {e}")
-            return False
-    
-    def split_pdf(self, input_path, pages):
-        """Split PDF into multiple files"""
-        try:
-            output_files = []
-            with open(input_path, 'rb') as file:
-                pdf = PyPDF2.PdfReader(file)
-                
-                for i, page_range in enumerate(pages):
-                    writer = PyPDF2.PdfWriter()
-                    
-                    # Handle page ranges like "1-3" or single pages "2"
-                    if '-' in str(page_range):
-                        start, end = map(int, page_range.split('-'))
-                        for page_num in range(start-1, end):
-                            writer.add_page(pdf.pages[page_num])
-                    else:
-                        writer.add_page(pdf.pages[int(page_range)-1])
-                    
-                    output_filename = f"{os.path.splitext(input_path)[0]}_part_{i+1}.pdf"
-                    with open(output_filename, 'wb') as output_file:
-                        writer.write(output_file)
-                    
-                    output_files.append(output_filename)
-            
-            return output_files
-        except Exception as e:
-            print(f"Error splitting PDF: {e}")
-            return []
-    
-    def compress_pdf(self, input_path, quality='medium'):
-        """Compress PDF file size"""
-        try:
-            # Simple compression by optimizing images
-            doc = fitz.open(input_path)
-            
-            output_path = input_path.replace('.pdf', '_compressed.pdf')
-            
-            # Set compression parameters
-            compress_level = {
-                'low': 1,
-                'medium': 2,
-                'high': 3
-            }.get(quality, 2)
-            
-            doc.save(output_path, 
-                    garbage=4,  # Remove unused objects
-                    deflate=True,  # Compress streams
-                    deflate_images=True,
-                    deflate_fonts=True,
-                    compression_level=compress_level)
-            
-            doc.close()
-            return output_path
-        except Exception as e:
-            print(f"Error compressing PDF: {e}")
-            return input_path
-    
-    def extract_text(self, pdf_path):
-        """Extract all text from PDF"""
-        try:
-            text = ""
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text += page.extract_text() + "\n"
-            return text
-        except Exception as e:
-            print(f"Error extracting text: {e}")
-            return ""
-    
-    def convert_to_docx(self, pdf_path):
-        """Convert PDF to Word document"""
-        try:
-            text = self.extract_text(pdf_path)
-            
-            doc = Document()
-            doc.add_heading('Converted PDF Document', 0)
-            
-            for paragraph in text.split('\n'):
-                if paragraph.strip():
-                    doc.add_paragraph(paragraph)
-            
-            output_path = pdf_path.replace('.pdf', '.docx')
-            doc.save(output_path)
-            return output_path
-        except Exception as e:
-            print(f"Error converting to DOCX: {e}")
-            return None
-    
-    def convert_to_excel(self, pdf_path):
-        """Convert PDF tables to Excel"""
-        try:
-            tables = []
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    page_tables = page.extract_tables()
-                    for table in page_tables:
-                        if table:
-                            tables.append(table)
-            
-            if tables:
-                # Combine all tables or save separately
-                df = pd.DataFrame(tables[0])
-                output_path = pdf_path.replace('.pdf', '.xlsx')
-                df.to_excel(output_path, index=False)
-                return output_path
-            else:
-                return None
-        except Exception as e:
-            print(f"Error converting to Excel: {e}")
-            return None
-    
-    def convert_to_images(self, pdf_path, dpi=150):
-        """Convert PDF pages to images"""
-        try:
-            images = convert_from_path(pdf_path, dpi=dpi)
-            output_paths = []
-            
-            for i, image in enumerate(images):
-                output_path = f"{pdf_path.replace('.pdf', '')}_page_{i+1}.png"
-                image.save(output_path, 'PNG')
-                output_paths.append(output_path)
-            
-            return output_paths
-        except Exception as e:
-            print(f"Error converting to images: {e}")
-            return []
-
-# Singleton instance
-pdf_processor = PDFProcessor()
-
-# Convenience functions
-get_page_count = pdf_processor.get_page_count
-get_page_as_image = pdf_processor.get_page_as_image
-add_text_to_pdf = pdf_processor.add_text_to_pdf
-highlight_text = pdf_processor.highlight_text
-add_image_to_pdf = pdf_processor.add_image_to_pdf
-merge_pdfs = pdf_processor.merge_pdfs
-split_pdf = pdf_processor.split_pdf
-compress_pdf = pdf_processor.compress_pdf
-extract_text = pdf_processor.extract_text
-convert_to_docx = pdf_processor.convert_to_docx
-convert_to_excel = pdf_processor.convert_to_excel
-convert_to_images = pdf_processor.convert_to_images
\ No newline at end of file
+import os
+import re
+import math
+import json
+import shutil
+import tempfile
+import hashlib
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from datetime import datetime
+import base64
+import metrics
+from lazy_imports import lazy_import
+from render_engines import RenderOptions, create_engine, render_pages_to_files
+from text_index import TextIndex
+from search_index import SearchIndex
+from compression import CompressionEngine
+from ocr import OCREngine
+import table_export
+import image_convert
+from docx_export import iter_page_layouts, write_docx
+from splitting import SPLIT_MODES, parse_ranges, every_n_ranges, bookmark_ranges, size_ranges, write_parts_parallel
+from worker_pool import WorkerPool
+
+fitz = lazy_import('fitz')  # PyMuPDF
+
+class _CachedDocument:
+    __slots__ = ('doc', 'signature', 'page_count', 'size', 'users', 'evicted')
+
+    def __init__(self, doc, signature):
+        self.doc = doc
+        self.signature = signature
+        self.page_count = doc.page_count
+        self.size = signature[1]
+        self.users = 0
+        self.evicted = False
+
+
+class DocumentCache:
+    """LRU cache of parsed fitz documents keyed by file path, mtime and size"""
+
+    def __init__(self, max_entries=32, max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        # fitz documents are not thread-safe, so readers are serialized per file
+        self._doc_locks = {}
+
+    @staticmethod
+    def _key(pdf_path):
+        return os.path.abspath(pdf_path)
+
+    @staticmethod
+    def _signature(pdf_path):
+        stat = os.stat(pdf_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _acquire(self, pdf_path):
+        key = self._key(pdf_path)
+        signature = self._signature(pdf_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                entry.users += 1
+                self.hits += 1
+                return key, entry
+            if entry is not None:
+                # The file was replaced on disk since it was parsed
+                self._drop(key)
+            self.misses += 1
+
+        with metrics.timed('document', 'parse'):
+            entry = _CachedDocument(fitz.open(pdf_path), signature)
+        entry.users = 1
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current.signature == signature:
+                # Another thread parsed the same file meanwhile; keep theirs
+                entry.evicted = True
+                return key, entry
+            if current is not None:
+                self._drop(key)
+            if entry.size > self.max_bytes:
+                entry.evicted = True
+                return key, entry
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+        return key, entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            if entry.evicted and entry.users == 0:
+                entry.doc.close()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        entry.evicted = True
+        if entry.users == 0:
+            entry.doc.close()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+
+    @contextmanager
+    def document(self, pdf_path):
+        """Yield a shared, read-only fitz document for pdf_path"""
+        key, entry = self._acquire(pdf_path)
+        with self._lock:
+            doc_lock = self._doc_locks.setdefault(key, threading.Lock())
+        try:
+            with doc_lock:
+                yield entry.doc
+        finally:
+            self._release(entry)
+
+    def page_count(self, pdf_path):
+        """Get the page count of pdf_path, parsing it only on a cache miss"""
+        key, entry = self._acquire(pdf_path)
+        try:
+            return entry.page_count
+        finally:
+            self._release(entry)
+
+    def checkout(self, pdf_path):
+        """Take ownership of a document that the caller will modify and close"""
+        key = self._key(pdf_path)
+        signature = self._signature(pdf_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature and entry.users == 0:
+                # Hand over the parsed document instead of reopening the file
+                del self._entries[key]
+                self._bytes -= entry.size
+                self.hits += 1
+                return entry.doc
+        return fitz.open(pdf_path)
+
+    def invalidate(self, pdf_path):
+        """Drop any cached document for pdf_path, e.g. after it is rewritten"""
+        key = self._key(pdf_path)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._doc_locks.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+class PageImageCache:
+    """Two-level (memory LRU + disk) cache of rendered page images"""
+
+    def __init__(self, cache_dir, max_bytes=128 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(pdf_path, page_number, dpi, fmt, variant=''):
+        """Build the cache key and ETag for a page rendering of the file's current version"""
+        stat = os.stat(pdf_path)
+        file_id = os.path.splitext(os.path.basename(pdf_path))[0]
+        version = f"{stat.st_mtime_ns}:{stat.st_size}"
+        etag = hashlib.sha1(f"{file_id}:{version}:{page_number}:{dpi}:{fmt}:{variant}".encode()).hexdigest()
+        return (file_id, page_number, dpi, fmt, variant), etag
+
+    def _disk_path(self, key, etag):
+        file_id, page_number, dpi, fmt, _ = key
+        return os.path.join(self.cache_dir, file_id, f"{page_number}-{dpi}-{etag[:16]}.{fmt}")
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        disk_path = self._disk_path(key, etag)
+        try:
+            with open(disk_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+        self._remember(key, etag, data)
+        return data
+
+    def put(self, key, etag, data):
+        disk_path = self._disk_path(key, etag)
+        os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+        tmp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, disk_path)
+        self._remember(key, etag, data)
+
+    def _remember(self, key, etag, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[key] = (etag, data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def invalidate(self, file_id):
+        """Forget every rendering of file_id in memory and on disk"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == file_id]:
+                self._bytes -= len(self._entries.pop(key)[1])
+        file_dir = os.path.join(self.cache_dir, file_id)
+        if os.path.isdir(file_dir):
+            for name in os.listdir(file_dir):
+                try:
+                    os.remove(os.path.join(file_dir, name))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses
+            }
+
+
+# An indirect reference such as "12 0 R" inside an object's source
+_XREF_REF = re.compile(r'\b(\d+) 0 R\b')
+
+
+class SharedResources:
+    """Content keys of the fonts and images already in a merged document.
+
+    An object's key hashes its dictionary and raw stream, with every object it
+    refers to replaced by that object's own key, so an image whose colorspace
+    or soft mask is a separate object still matches its copies. Only the
+    objects of the input just inserted are hashed, which keeps a merge linear
+    in its inputs.
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._first = {}
+
+    @staticmethod
+    def _is_resource(doc, xref):
+        return doc.xref_get_key(xref, 'Type')[1] == '/Font' or doc.xref_get_key(xref, 'Subtype')[1] == '/Image'
+
+    def _key(self, doc, xref, first_xref, visiting):
+        key = self._keys.get(xref)
+        if key is not None or xref < first_xref or xref in visiting:
+            return key
+        visiting.add(xref)
+
+        def reference(match):
+            ref_key = self._key(doc, int(match.group(1)), first_xref, visiting)
+            return f"<{ref_key}>" if ref_key else match.group(0)
+
+        digest = hashlib.sha256(_XREF_REF.sub(reference, doc.xref_object(xref, compressed=True)).encode())
+        if doc.xref_is_stream(xref):
+            digest.update(doc.xref_stream_raw(xref) or b'')
+        visiting.discard(xref)
+        key = self._keys[xref] = digest.hexdigest()
+        return key
+
+    def share(self, doc, first_xref):
+        """Point references among objects first_xref onwards at identical fonts and images already
+        in doc, returning how many copies were dropped. The copies stay until a garbage collecting save."""
+        end = doc.xref_length()
+        for xref in range(first_xref, end):
+            if self._is_resource(doc, xref):
+                self._key(doc, xref, first_xref, set())
+
+        remap = {}
+        for xref in range(first_xref, end):
+            key = self._keys.get(xref)
+            if key is not None:
+                first = self._first.setdefault(key, xref)
+                if first != xref:
+                    remap[xref] = first
+        if not remap:
+            return 0
+
+        def reference(match):
+            return f"{remap.get(int(match.group(1)), match.group(1))} 0 R"
+
+        for xref in range(first_xref, end):
+            if xref not in remap:
+                source = doc.xref_object(xref, compressed=True)
+                rewritten = _XREF_REF.sub(reference, source)
+                if rewritten != source:
+                    doc.update_object(xref, rewritten)
+        return len(remap)
+
+
+IMAGE_MIMETYPES = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp'
+}
+
+
+class PDFProcessor:
+    def __init__(self, doc_cache_entries=32, doc_cache_bytes=512 * 1024 * 1024,
+                 page_cache_bytes=128 * 1024 * 1024, render_engine='pymupdf', fallback_engine='poppler',
+                 render_workers=None):
+        self.temp_dir = "temp"
+        os.makedirs(self.temp_dir, exist_ok=True)
+        # Caches shared across files, which bound or version their own entries
+        self.cache_dir = "cache"
+        self.doc_cache = DocumentCache(doc_cache_entries, doc_cache_bytes)
+        self.page_cache = PageImageCache(os.path.join(self.temp_dir, 'pages'), page_cache_bytes)
+        self.render_engine = create_engine(render_engine, self.doc_cache)
+        self.fallback_engine = create_engine(fallback_engine, self.doc_cache) if fallback_engine else None
+        self.render_workers = render_workers or min(os.cpu_count() or 1, 4)
+        self.compression = CompressionEngine(max_workers=self.render_workers)
+        self.ocr = OCREngine(os.path.join(self.cache_dir, 'ocr'), max_workers=self.render_workers)
+        self._path_locks = {}
+        self._path_locks_guard = threading.Lock()
+        self._text_indexes = OrderedDict()
+        self._text_indexes_lock = threading.Lock()
+        self._search_indexes = OrderedDict()
+        self._search_indexes_lock = threading.Lock()
+    
+    def get_page_count(self, pdf_path):
+        """Get total number of pages in PDF"""
+        return self.doc_cache.page_count(pdf_path)
+    
+    def _render(self, pdf_path, page_number, options):
+        try:
+            return self.render_engine.render(pdf_path, page_number, options)
+        except Exception as e:
+            if self.fallback_engine is None:
+                raise
+            print(f"{self.render_engine.name} render failed, falling back to {self.fallback_engine.name}: {e}")
+            metrics.record_error('render_page', e)
+            return self.fallback_engine.render(pdf_path, page_number, options)
+    
+    def render_page(self, pdf_path, page_number, dpi=150, fmt='png', colorspace='rgb',
+                    alpha=False, clip=None, quality=85):
+        """Render a PDF page to encoded image bytes, returning (data, etag)"""
+        if fmt not in IMAGE_MIMETYPES:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        
+        options = RenderOptions(dpi, fmt, colorspace, alpha, clip, quality)
+        key, etag = self.page_cache.make_key(pdf_path, page_number, dpi, fmt, options.variant())
+        data = self.page_cache.get(key, etag)
+        if data is not None:
+            return data, etag
+        
+        data = self._render(pdf_path, page_number, options)
+        self.page_cache.put(key, etag, data)
+        metrics.record_pages('render_page')
+        metrics.record_bytes('render_page', 'out', len(data))
+        return data, etag
+    
+    def page_etag(self, pdf_path, page_number, dpi=150, fmt='png', colorspace='rgb',
+                  alpha=False, clip=None, quality=85):
+        """The ETag render_page would return, computed without rendering"""
+        options = RenderOptions(dpi, fmt, colorspace, alpha, clip, quality)
+        return self.page_cache.make_key(pdf_path, page_number, dpi, fmt, options.variant())[1]
+    
+    def get_page_as_image(self, pdf_path, page_number, dpi=150, fmt='png'):
+        """Convert PDF page to base64 image for display"""
+        try:
+            data, _ = self.render_page(pdf_path, page_number, dpi, fmt)
+            img_str = base64.b64encode(data).decode()
+            
+            return f"data:{IMAGE_MIMETYPES[fmt]};base64,{img_str}"
+        except Exception as e:
+            print(f"Error converting page to image: {e}")
+            metrics.record_error('render_page', e)
+            return None
+    
+    @staticmethod
+    def _parse_color(color):
+        """Convert '#rrggbb' or a color name to an (r, g, b) tuple in 0..1"""
+        if isinstance(color, str) and color.startswith('#') and len(color) == 7:
+            return tuple(int(color[i:i + 2], 16) / 255 for i in (1, 3, 5))
+        return fitz.utils.getColor(color)
+    
+    @staticmethod
+    def _insert_text(page, text, x=50, y=50):
+        page.insert_text((x, y), text, fontsize=11, color=(0, 0, 0))
+    
+    def _highlight(self, page, text, color="#ffff00"):
+        # Search for text and highlight each occurrence
+        for inst in page.search_for(text):
+            highlight = page.add_highlight_annot(inst)
+            highlight.set_colors(stroke=self._parse_color(color))
+            highlight.update()
+    
+    def _highlight_hits(self, doc, hits, color="#ffff00"):
+        # One annotation per hit, covering every line the hit spans
+        stroke = self._parse_color(color)
+        by_page = {}
+        for hit in hits:
+            by_page.setdefault(hit['page'], []).append(hit)
+        for page_number in sorted(by_page):
+            # Annotations only hold a weak reference to their page, so keep it alive while adding them
+            page = doc[page_number - 1]
+            for hit in by_page[page_number]:
+                highlight = page.add_highlight_annot([fitz.Rect(rect) for rect in hit['rects']])
+                highlight.set_colors(stroke=stroke)
+                highlight.update()
+    
+    @staticmethod
+    def _insert_image(page, image_data, x=50, y=50):
+        # Decode base64 image
+        if image_data.startswith('data:image'):
+            image_data = image_data.split(',')[1]
+        
+        img_bytes = base64.b64decode(image_data)
+        
+        rect = fitz.Rect(x, y, x + 100, y + 100)  # Adjust size as needed
+        page.insert_image(rect, stream=img_bytes)
+    
+    def add_text_to_pdf(self, input_path, output_path, text, page_num=1, x=50, y=50):
+        """Add text to PDF at specified position"""
+        try:
+            # Open PDF
+            doc = self.doc_cache.checkout(input_path)
+            self._insert_text(doc[page_num - 1], text, x, y)
+            
+            # Save
+            doc.save(output_path)
+            doc.close()
+            self.doc_cache.invalidate(output_path)
+            return True
+        except Exception as e:
+            print(f"Error adding text: {e}")
+            metrics.record_error('edit', e)
+            return False
+    
+    def highlight_text(self, input_path, output_path, page_num, text, color="#ffff00"):
+        """Highlight text in PDF"""
+        try:
+            doc = self.doc_cache.checkout(input_path)
+            self._highlight(doc[page_num - 1], text, color)
+            
+            doc.save(output_path)
+            doc.close()
+            self.doc_cache.invalidate(output_path)
+            return True
+        except Exception as e:
+            print(f"Error highlighting text: {e}")
+            metrics.record_error('edit', e)
+            return False
+    
+    def add_image_to_pdf(self, input_path, output_path, image_data, page_num, x=50, y=50):
+        """Add image to PDF"""
+        try:
+            doc = self.doc_cache.checkout(input_path)
+            self._insert_image(doc[page_num - 1], image_data, x, y)
+            
+            doc.save(output_path)
+            doc.close()
+            self.doc_cache.invalidate(output_path)
+            return True
+        except Exception as e:
+            print(f"Error adding image: {e}")
+            metrics.record_error('edit', e)
+            return False
+    
+    @staticmethod
+    def _edit_number(edit, key, default):
+        """A numeric edit field as a float; JSON strings like "2" are accepted, anything else is a ValueError"""
+        value = edit.get(key)
+        if value is None:
+            value = default
+        try:
+            if isinstance(value, bool):
+                raise TypeError
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be a number, got {value!r}")
+        if not math.isfinite(number):
+            raise ValueError(f"{key} must be a finite number, got {value!r}")
+        return number
+    
+    def _apply_edit(self, doc, edit):
+        operation = edit.get('operation')
+        page_num = self._edit_number(edit, 'page', 1)
+        if not page_num.is_integer() or page_num < 1 or page_num > doc.page_count:
+            raise ValueError(f"Page {edit.get('page')} out of range")
+        page = doc[int(page_num) - 1]
+        x, y = self._edit_number(edit, 'x', 50), self._edit_number(edit, 'y', 50)
+        
+        if operation == 'add_text':
+            self._insert_text(page, edit['text'], x, y)
+        elif operation == 'highlight':
+            self._highlight(page, edit['text'], edit.get('color', '#ffff00'))
+        elif operation == 'highlight_all':
+            self._highlight_hits(doc, edit['hits'], edit.get('color', '#ffff00'))
+        elif operation == 'add_image':
+            self._insert_image(page, edit['imageData'], x, y)
+        else:
+            raise ValueError(f"Unsupported edit operation: {operation}")
+    
+    def _path_lock(self, path, kind):
+        with self._path_locks_guard:
+            return self._path_locks.setdefault((kind, os.path.abspath(path)), threading.Lock())
+    
+    @staticmethod
+    def _edit_manifest_path(edited_path):
+        return f"{edited_path}.edits.json"
+    
+    def get_edit_history(self, edited_path):
+        """Get the recorded versions of an edit chain, oldest first"""
+        try:
+            with open(self._edit_manifest_path(edited_path)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+    
+    def _write_edit_history(self, edited_path, history):
+        manifest_path = self._edit_manifest_path(edited_path)
+        with open(f"{manifest_path}.tmp", 'w') as f:
+            json.dump(history, f)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+    
+    def apply_edits(self, source_path, edited_path, edits):
+        """Apply a batch of edits to the edit chain at edited_path and save it once.
+        
+        The chain starts as a byte copy of source_path, and each batch builds on the
+        previous one. PyMuPDF appends the changes as an incremental update whenever
+        possible, so every earlier version remains a prefix of the file.
+        """
+        with self._path_lock(edited_path, 'edit'):
+            history = self.get_edit_history(edited_path)
+            if not history or not os.path.exists(edited_path):
+                shutil.copyfile(source_path, edited_path)
+                history = [{
+                    'version': 0,
+                    'size': os.path.getsize(edited_path),
+                    'operations': [],
+                    'incremental': False,
+                    'savedAt': datetime.now().isoformat()
+                }]
+            
+            # highlight_all resolves its hits from the upload's search index up front, so
+            # the whole document is highlighted in this one save
+            edits = [
+                dict(edit, hits=self.search(source_path, edit.get('text'), edit.get('regex', False),
+                                            edit.get('caseSensitive', False), edit.get('wholeWords', False),
+                                            limit=edit.get('limit', 10000)))
+                if edit.get('operation') == 'highlight_all' else edit
+                for edit in edits
+            ]
+            
+            doc = self.doc_cache.checkout(edited_path)
+            try:
+                # Nothing is written unless every edit in the batch applies
+                for edit in edits:
+                    self._apply_edit(doc, edit)
+                
+                incremental = bool(doc.can_save_incrementally())
+                with metrics.timed('edit', 'save'):
+                    if incremental:
+                        doc.save(edited_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+                    else:
+                        doc.save(f"{edited_path}.tmp", garbage=1, deflate=True)
+            finally:
+                doc.close()
+            
+            if not incremental:
+                os.replace(f"{edited_path}.tmp", edited_path)
+                # A full rewrite breaks the prefix property of older versions
+                for entry in history:
+                    entry['size'] = None
+            self.doc_cache.invalidate(edited_path)
+            
+            history.append({
+                'version': len(history),
+                'size': os.path.getsize(edited_path),
+                'operations': [edit.get('operation') for edit in edits],
+                'incremental': incremental,
+                'savedAt': datetime.now().isoformat()
+            })
+            self._write_edit_history(edited_path, history)
+            return history[-1]
+    
+    def export_edit_version(self, edited_path, version, output_path):
+        """Write an earlier version of an edit chain to output_path"""
+        history = self.get_edit_history(edited_path)
+        if version < 0 or version >= len(history):
+            raise ValueError(f"Unknown version: {version}")
+        size = history[version]['size']
+        if size is None:
+            raise ValueError(f"Version {version} was overwritten by a full rewrite")
+        
+        with self._path_lock(edited_path, 'edit'), open(edited_path, 'rb') as src, open(output_path, 'wb') as dst:
+            remaining = size
+            while remaining:
+                chunk = src.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                remaining -= len(chunk)
+        return output_path
+    
+    def merge_pdfs(self, pdf_paths, output_path, batch_size=50, progress=None):
+        """Merge multiple PDFs, keeping their outlines.
+        
+        Inputs are opened one at a time and the result is flushed to disk with
+        an incremental save every batch_size inputs, so memory stays bounded by
+        a batch rather than the whole job. Fonts and images an input shares
+        with an earlier one are hashed as it is inserted and pointed at the
+        first copy, so the final garbage=3 save drops the duplicates without
+        garbage=4's quadratic search.
+        """
+        tmp_path = output_path + '.part'
+        try:
+            with self._path_lock(output_path, 'write'):
+                merged = fitz.open()
+                resources = SharedResources()
+                toc = []
+                flushed = False
+                
+                for done, pdf_path in enumerate(pdf_paths, 1):
+                    with fitz.open(pdf_path) as src:
+                        offset = merged.page_count
+                        first_xref = merged.xref_length()
+                        merged.insert_pdf(src)
+                        resources.share(merged, first_xref)
+                        toc.extend([level, title, page + offset if page > 0 else page]
+                                   for level, title, page in src.get_toc(simple=True))
+                    
+                    if done % batch_size == 0 and done < len(pdf_paths):
+                        if flushed:
+                            merged.save(tmp_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+                        else:
+                            merged.save(tmp_path)
+                            flushed = True
+                        # Reopening drops the objects MuPDF kept loaded for the batch
+                        merged.close()
+                        merged = fitz.open(tmp_path)
+                    if progress:
+                        progress(done, len(pdf_paths))
+                
+                try:
+                    merged.set_toc(toc)
+                except Exception as e:
+                    print(f"Could not rebuild merged outline: {e}")
+                with metrics.timed('merge', 'save'):
+                    merged.save(output_path + '.tmp', garbage=3, deflate=True)
+                metrics.record_pages('merge', merged.page_count)
+                merged.close()
+                os.replace(output_path + '.tmp', output_path)
+            
+            self.doc_cache.invalidate(output_path)
+            return True
+        except Exception as e:
+            print(f"Error merging PDFs: {e}")
+            metrics.record_error('merge', e)
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def images_to_pdf(self, image_paths, output_path, page_size=None, batch_size=25, progress=None):
+        """Combine images into one PDF, one page each, returning (output_path, report).
+        
+        JPEGs are embedded without re-encoding; other images are normalized in
+        a process pool. Each batch becomes a PDF part on disk and the parts are
+        merged, so memory is bounded by a batch. Raises ValueError for an
+        unknown page_size; returns (None, None) on failure.
+        """
+        if page_size is not None and page_size not in image_convert.PAGE_SIZES:
+            raise ValueError(f"Unsupported page size: {page_size}")
+        
+        scratch_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        try:
+            with metrics.timed('images_to_pdf', 'convert'):
+                part_paths, report = image_convert.write_parts(
+                    image_paths, scratch_dir, self.render_workers, page_size, batch_size, progress
+                )
+            if len(part_paths) == 1:
+                os.replace(part_paths[0], output_path)
+                self.doc_cache.invalidate(output_path)
+            elif not self.merge_pdfs(part_paths, output_path):
+                raise RuntimeError("Merging image parts failed")
+            metrics.record_pages('images_to_pdf', report['images'])
+            return output_path, report
+        except Exception as e:
+            print(f"Error converting images to PDF: {e}")
+            metrics.record_error('images_to_pdf', e)
+            return None, None
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _output_path(input_path, suffix, output_dir=None):
+        """Name a derived file after its source, next to it unless output_dir is given"""
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        return os.path.join(output_dir or os.path.dirname(input_path), f"{stem}{suffix}")
+    
+    def split_pdf(self, input_path, pages=None, output_dir=None, mode='ranges', every=None, max_bytes=None,
+                  bookmark_level=1, progress=None):
+        """Split PDF into multiple files.
+        
+        mode picks how parts are formed: 'ranges' takes entries like "1-3" or
+        2 from pages, 'every' cuts every N pages, 'bookmarks' starts a part at
+        each outline entry of bookmark_level and 'size' packs pages into parts
+        of about max_bytes. Raises ValueError for an invalid request.
+        """
+        if mode not in SPLIT_MODES:
+            raise ValueError(f"Unsupported split mode: {mode}")
+        
+        with self.doc_cache.document(input_path) as doc:
+            page_count = doc.page_count
+            if mode == 'ranges':
+                ranges = parse_ranges(pages or [], page_count)
+            elif mode == 'every':
+                ranges = every_n_ranges(page_count, every or 1)
+            elif mode == 'bookmarks':
+                ranges = bookmark_ranges(doc.get_toc(simple=True), page_count, int(bookmark_level))
+            else:
+                ranges = size_ranges(doc, max_bytes or 0)
+        
+        parts = [(first, last, self._output_path(input_path, f"_part_{i}.pdf", output_dir))
+                 for i, (first, last) in enumerate(ranges, 1)]
+        with metrics.timed('split', 'save'):
+            written = write_parts_parallel(input_path, parts, self.render_workers, progress)
+        metrics.record_pages('split', sum(last - first + 1 for first, last, _ in parts))
+        return written
+    
+    def compress_pdf(self, input_path, quality='medium', output_dir=None, with_report=False):
+        """Compress PDF file size by recompressing images, subsetting fonts and deduplicating objects"""
+        try:
+            output_path = self._output_path(input_path, '_compressed.pdf', output_dir)
+            
+            with self._path_lock(output_path, 'write'):
+                report = self.compression.compress(input_path, output_path + '.tmp', quality)
+                metrics.record_bytes('compress', 'in', report['originalSize'])
+                metrics.record_bytes('compress', 'out', report['compressedSize'])
+                os.replace(output_path + '.tmp', output_path)
+            
+            self.doc_cache.invalidate(output_path)
+            return (output_path, report) if with_report else output_path
+        except Exception as e:
+            print(f"Error compressing PDF: {e}")
+            metrics.record_error('compress', e)
+            return (input_path, None) if with_report else input_path
+    
+    def ocr_pdf(self, input_path, output_path=None, pages=None, language=None, force=False, progress=None):
+        """Add an invisible OCR text layer to scanned pages, returning (output_path, report).
+        
+        Candidates default to the pages the text index found blank, so
+        documents that already have text cost nothing. Returns (None, report)
+        when no text was found, and (None, None) on failure. Raises ValueError
+        for pages outside the document.
+        """
+        page_count = self.get_page_count(input_path)
+        if pages:
+            pages = sorted({int(page) for page in pages})
+            if pages[0] < 1 or pages[-1] > page_count:
+                raise ValueError(f"Pages must be between 1 and {page_count}")
+        
+        try:
+            if not pages and not force:
+                pages = self.get_text_index(input_path).empty_pages()
+                if not pages:
+                    return None, {'ocrPages': [], 'cachedPages': [], 'failedPages': [],
+                                  'skippedPages': page_count, 'words': 0, 'written': False}
+            
+            output_path = output_path or self._output_path(input_path, '_ocr.pdf')
+            with self._path_lock(output_path, 'write'):
+                report = self.ocr.ocr(input_path, output_path + '.tmp', pages, language, force, progress)
+                if not report['written']:
+                    return None, report
+                os.replace(output_path + '.tmp', output_path)
+            
+            self.doc_cache.invalidate(output_path)
+            return output_path, report
+        except Exception as e:
+            print(f"Error running OCR: {e}")
+            metrics.record_error('ocr', e)
+            return None, None
+    
+    def get_text_index(self, pdf_path):
+        """Get the persisted per-page text index of a PDF, building it on first use"""
+        key = os.path.abspath(pdf_path)
+        with self._text_indexes_lock:
+            index = self._text_indexes.get(key)
+            if index is not None and index.is_current():
+                self._text_indexes.move_to_end(key)
+                return index
+        
+        with self._path_lock(pdf_path, 'text-index'):
+            index = TextIndex.load(pdf_path)
+            if index is None:
+                with self.doc_cache.document(pdf_path) as doc, metrics.timed('text_index', 'extract'):
+                    index = TextIndex.build(pdf_path, doc)
+                metrics.record_pages('text_index', index.page_count)
+        
+        with self._text_indexes_lock:
+            self._text_indexes[key] = index
+            while len(self._text_indexes) > 64:
+                self._text_indexes.popitem(last=False)
+        return index
+    
+    def get_search_index(self, pdf_path):
+        """Get the persisted word-position search index of a PDF, building it from the text index if needed"""
+        key = os.path.abspath(pdf_path)
+        with self._search_indexes_lock:
+            index = self._search_indexes.get(key)
+            if index is not None and index.is_current():
+                self._search_indexes.move_to_end(key)
+                return index
+        
+        with self._path_lock(pdf_path, 'search-index'):
+            index = SearchIndex.load(pdf_path)
+            if index is None:
+                index = SearchIndex.build(pdf_path, self.get_text_index(pdf_path))
+        
+        with self._search_indexes_lock:
+            self._search_indexes[key] = index
+            while len(self._search_indexes) > 16:
+                self._search_indexes.popitem(last=False)
+        return index
+    
+    def search(self, pdf_path, query, regex=False, case_sensitive=False, whole_words=False, limit=1000,
+               start_page=1, end_page=None):
+        """Find a phrase or regex across all pages, returning hits with their page and rects"""
+        pattern = SearchIndex.compile(query, regex, case_sensitive, whole_words)
+        index = self.get_search_index(pdf_path)
+        with metrics.timed('search', 'query'):
+            return index.search(pattern, limit, start_page, end_page)
+    
+    def extract_text(self, pdf_path, start_page=1, end_page=None):
+        """Extract all text from PDF"""
+        try:
+            return self.get_text_index(pdf_path).text(start_page, end_page)
+        except Exception as e:
+            print(f"Error extracting text: {e}")
+            metrics.record_error('extract_text', e)
+            return ""
+    
+    def iter_page_text(self, pdf_path, start_page=1, end_page=None):
+        """Yield (page_number, text) one page at a time"""
+        return self.get_text_index(pdf_path).iter_pages(start_page, end_page)
+    
+    def convert_to_docx(self, pdf_path, output_dir=None, max_workers=None, progress=None):
+        """Convert PDF to Word document, keeping paragraphs, fonts, images and tables page by page"""
+        image_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        try:
+            page_count = self.get_page_count(pdf_path)
+            output_path = self._output_path(pdf_path, '.docx', output_dir)
+            layouts = iter_page_layouts(pdf_path, page_count, image_dir, max_workers or self.render_workers)
+            with metrics.timed('docx', 'extract'):
+                write_docx(layouts, output_path, progress, page_count)
+            metrics.record_pages('docx', page_count)
+            return output_path
+        except Exception as e:
+            print(f"Error converting to DOCX: {e}")
+            metrics.record_error('docx', e)
+            return None
+        finally:
+            shutil.rmtree(image_dir, ignore_errors=True)
+    
+    def export_tables(self, pdf_path, fmt='xlsx', layout='table', output_dir=None, max_workers=None, progress=None):
+        """Write every table in a PDF as an xlsx workbook or CSV/Parquet files, returning their paths"""
+        try:
+            page_count = self.get_page_count(pdf_path)
+            with metrics.timed('tables', 'extract'):
+                paths = table_export.export_tables(
+                    pdf_path,
+                    page_count,
+                    self._output_path(pdf_path, '', output_dir),
+                    fmt,
+                    layout,
+                    max_workers or self.render_workers,
+                    progress
+                )
+            metrics.record_pages('tables', page_count)
+            return paths
+        except Exception as e:
+            print(f"Error exporting tables: {e}")
+            metrics.record_error('tables', e)
+            return []
+    
+    def convert_to_excel(self, pdf_path, output_dir=None, layout='table', progress=None):
+        """Convert PDF tables to Excel, one sheet per table or per page"""
+        paths = self.export_tables(pdf_path, 'xlsx', layout, output_dir, progress=progress)
+        return paths[0] if paths else None
+    
+    def iter_page_images(self, pdf_path, dpi=150, fmt='png', output_dir=None, max_workers=None, batch_size=4):
+        """Render every page to its own file, yielding (page_number, path) as pages finish"""
+        options = RenderOptions(dpi, fmt)
+        output_template = self._output_path(pdf_path, f"_page_{{page}}.{fmt}", output_dir)
+        page_count = self.get_page_count(pdf_path)
+        max_workers = max_workers or self.render_workers
+        
+        if max_workers <= 1 or page_count <= batch_size:
+            for page_number in range(1, page_count + 1):
+                output_path = output_template.format(page=page_number)
+                with open(output_path, 'wb') as f:
+                    f.write(self._render(pdf_path, page_number, options))
+                yield page_number, output_path
+            return
+        
+        batches = [list(range(start, min(start + batch_size, page_count + 1)))
+                   for start in range(1, page_count + 1, batch_size)]
+        # Each worker opens its own document; keeping at most two batches per
+        # worker in flight bounds memory regardless of the page count
+        max_in_flight = max_workers * 2
+        with WorkerPool(max_workers=max_workers) as pool:
+            pending = set()
+            next_batch = 0
+            while next_batch < len(batches) or pending:
+                while next_batch < len(batches) and len(pending) < max_in_flight:
+                    pending.add(pool.submit(render_pages_to_files, pdf_path, batches[next_batch],
+                                            options, output_template))
+                    next_batch += 1
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for page_number, output_path in pool.result(future):
+                        yield page_number, output_path
+    
+    def convert_to_images(self, pdf_path, dpi=150, fmt='png', as_zip=False, output_dir=None,
+                          max_workers=None, progress=None):
+        """Convert PDF pages to images, or to a single ZIP of them when as_zip is set"""
+        try:
+            total = self.get_page_count(pdf_path)
+            done = 0
+            output_paths = {}
+            archive = None
+            if as_zip:
+                zip_path = self._output_path(pdf_path, '_pages.zip', output_dir)
+                # Images are already compressed, so store them and append each page as it lands
+                archive = zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED)
+            
+            try:
+                for page_number, output_path in self.iter_page_images(pdf_path, dpi, fmt, output_dir, max_workers):
+                    if archive is not None:
+                        archive.write(output_path, arcname=os.path.basename(output_path))
+                        os.remove(output_path)
+                    else:
+                        output_paths[page_number] = output_path
+                    done += 1
+                    if progress:
+                        progress(done, total)
+            finally:
+                if archive is not None:
+                    archive.close()
+            
+            metrics.record_pages('images', done)
+            if as_zip:
+                return zip_path
+            return [output_paths[page_number] for page_number in sorted(output_paths)]
+        except Exception as e:
+            print(f"Error converting to images: {e}")
+            metrics.record_error('images', e)
+            return None if as_zip else []
+
+# Singleton instance
+pdf_processor = PDFProcessor()
+
+# Convenience functions
+get_page_count = pdf_processor.get_page_count
+get_page_as_image = pdf_processor.get_page_as_image
+render_page = pdf_processor.render_page
+page_etag = pdf_processor.page_etag
+add_text_to_pdf = pdf_processor.add_text_to_pdf
+highlight_text = pdf_processor.highlight_text
+add_image_to_pdf = pdf_processor.add_image_to_pdf
+apply_edits = pdf_processor.apply_edits
+get_edit_history = pdf_processor.get_edit_history
+export_edit_version = pdf_processor.export_edit_version
+merge_pdfs = pdf_processor.merge_pdfs
+images_to_pdf = pdf_processor.images_to_pdf
+split_pdf = pdf_processor.split_pdf
+compress_pdf = pdf_processor.compress_pdf
+ocr_pdf = pdf_processor.ocr_pdf
+extract_text = pdf_processor.extract_text
+get_text_index = pdf_processor.get_text_index
+get_search_index = pdf_processor.get_search_index
+search = pdf_processor.search
+iter_page_text = pdf_processor.iter_page_text
+convert_to_docx = pdf_processor.convert_to_docx
+convert_to_excel = pdf_processor.convert_to_excel
+export_tables = pdf_processor.export_tables
+convert_to_images = pdf_processor.convert_to_images
+iter_page_images = pdf_processor.iter_page_images
+path_lock = pdf_processor._path_lock
\ No newline at end of file
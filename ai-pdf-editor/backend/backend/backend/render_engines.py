@@ -0,0 +1,152 @@
+import io
+import metrics
+from lazy_imports import lazy_import
+
+fitz = lazy_import('fitz')  # PyMuPDF
+Image = lazy_import('PIL.Image')
+pdf2image = lazy_import('pdf2image')
+
+COLORSPACES = ('rgb', 'gray')
+
+
+class RenderOptions:
+    """Options shared by every rendering engine"""
+
+    def __init__(self, dpi=150, fmt='png', colorspace='rgb', alpha=False, clip=None, quality=85):
+        if colorspace not in COLORSPACES:
+            raise ValueError(f"Unsupported colorspace: {colorspace}")
+        if fmt == 'jpeg':
+            # JPEG has no alpha channel
+            alpha = False
+        self.dpi = dpi
+        self.fmt = fmt
+        self.colorspace = colorspace
+        self.alpha = alpha
+        self.clip = tuple(float(v) for v in clip) if clip else None
+        self.quality = quality
+
+    def variant(self):
+        """Describe the options that are not part of the (page, dpi, format) cache key"""
+        parts = []
+        if self.colorspace != 'rgb':
+            parts.append(self.colorspace)
+        if self.alpha:
+            parts.append('alpha')
+        if self.clip:
+            parts.append('clip=' + ','.join(f"{v:g}" for v in self.clip))
+        if self.fmt != 'png':
+            parts.append(f"q={self.quality}")
+        return ';'.join(parts)
+
+
+def encode_image(image, options):
+    """Encode a PIL image according to the render options"""
+    buffered = io.BytesIO()
+    if options.fmt == 'jpeg':
+        image.save(buffered, format='JPEG', quality=options.quality)
+    elif options.fmt == 'webp':
+        image.save(buffered, format='WEBP', quality=options.quality)
+    else:
+        image.save(buffered, format='PNG')
+    return buffered.getvalue()
+
+
+class PyMuPDFEngine:
+    """In-process renderer that rasterizes pages straight to a fitz pixmap"""
+
+    name = 'pymupdf'
+
+    def __init__(self, doc_cache):
+        self.doc_cache = doc_cache
+
+    def render(self, pdf_path, page_number, options):
+        with self.doc_cache.document(pdf_path) as doc:
+            return self.render_page(doc[page_number - 1], options)
+
+    @staticmethod
+    def render_page(page, options):
+        """Render an already opened fitz page"""
+        zoom = options.dpi / 72
+        clip = None
+        if options.clip:
+            clip = fitz.Rect(options.clip) & page.rect
+            if clip.is_empty:
+                raise ValueError("Clip rectangle does not intersect the page")
+
+        colorspace = fitz.csGRAY if options.colorspace == 'gray' else fitz.csRGB
+        with metrics.timed('pymupdf', 'render'):
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace,
+                                  alpha=options.alpha, clip=clip)
+
+        with metrics.timed('pymupdf', 'encode'):
+            if options.fmt == 'png':
+                return pix.tobytes('png')
+            if options.fmt == 'jpeg':
+                return pix.tobytes('jpeg', jpg_quality=options.quality)
+
+            # Pixmaps cannot write WebP, so hand the raw samples to PIL without a PNG round trip
+            mode = {1: 'L', 2: 'LA', 3: 'RGB', 4: 'RGBA'}[pix.n]
+            image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+            return encode_image(image, options)
+
+
+class PopplerEngine:
+    """Renderer that shells out to poppler's pdftoppm through pdf2image"""
+
+    name = 'poppler'
+
+    def render(self, pdf_path, page_number, options):
+        with metrics.timed('poppler', 'render'):
+            images = pdf2image.convert_from_path(
+                pdf_path,
+                first_page=page_number,
+                last_page=page_number,
+                dpi=options.dpi,
+                grayscale=options.colorspace == 'gray',
+                transparent=options.alpha
+            )
+        if not images:
+            raise ValueError(f"Page {page_number} could not be rendered")
+
+        image = images[0]
+        if options.clip:
+            scale = options.dpi / 72
+            box = tuple(int(round(v * scale)) for v in options.clip)
+            image = image.crop(box)
+        if options.fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        with metrics.timed('poppler', 'encode'):
+            return encode_image(image, options)
+
+
+RENDER_ENGINES = {
+    PyMuPDFEngine.name: PyMuPDFEngine,
+    PopplerEngine.name: PopplerEngine
+}
+
+
+def create_engine(name, doc_cache):
+    """Instantiate a rendering engine by name"""
+    if name not in RENDER_ENGINES:
+        raise ValueError(f"Unknown render engine: {name}")
+    if name == PyMuPDFEngine.name:
+        return PyMuPDFEngine(doc_cache)
+    return RENDER_ENGINES[name]()
+
+
+def render_pages_to_files(pdf_path, page_numbers, options, output_template):
+    """Process-pool worker: render pages with a private document handle and write each to disk"""
+    written = []
+    with fitz.open(pdf_path) as doc:
+        for page_number in page_numbers:
+            try:
+                data = PyMuPDFEngine.render_page(doc[page_number - 1], options)
+            except Exception as e:
+                print(f"pymupdf render of page {page_number} failed, falling back to poppler: {e}")
+                data = PopplerEngine().render(pdf_path, page_number, options)
+            output_path = output_template.format(page=page_number)
+            with open(output_path, 'wb') as f:
+                f.write(data)
+            # Only the path travels back to the parent, never the image itself
+            written.append((page_number, output_path))
+    return written
@@ -0,0 +1,190 @@
+import os
+import re
+from lazy_imports import lazy_import
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+np = lazy_import('numpy')
+
+INDEX_VERSION = 1
+
+# Longest pattern accepted from a client, to keep regex compilation and matching bounded
+MAX_QUERY_LENGTH = 200
+
+
+def _signature(pdf_path):
+    stat = os.stat(pdf_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _index_path(pdf_path):
+    return f"{pdf_path}.search.npz"
+
+
+def _subpatterns(value):
+    if isinstance(value, sre_parse.SubPattern):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _subpatterns(item)
+
+
+def _has_nested_quantifier(pattern, inside_repeat=False):
+    """Whether a parsed pattern repeats something that itself repeats a variable number of times.
+
+    Such patterns, e.g. (a+)+ or (\\w+\\s?)*, backtrack exponentially on text that
+    almost matches, and re offers no way to stop a search once it has started.
+    """
+    for op, av in pattern:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, high, body = av
+            repeats = high > 1 and low != high
+            if repeats and inside_repeat:
+                return True
+            if _has_nested_quantifier(body, inside_repeat or repeats):
+                return True
+        elif any(_has_nested_quantifier(sub, inside_repeat) for sub in _subpatterns(av)):
+            return True
+    return False
+
+
+class SearchIndex:
+    """Document-wide word positions for phrase and regex search.
+
+    Every word of the text index is joined into one string (a space between
+    words of a page, a newline between pages) with a parallel array of word
+    start offsets, pages and boxes. A query is a single regex pass over that
+    string, and each match maps back to word boxes with a binary search.
+    """
+
+    def __init__(self, pdf_path, signature, text, word_starts, pages, boxes):
+        self.pdf_path = pdf_path
+        self.signature = signature
+        self.text = text
+        self.word_starts = word_starts
+        self.pages = pages
+        self.boxes = boxes
+
+    @classmethod
+    def build(cls, pdf_path, text_index):
+        """Build from a TextIndex's word boxes and persist the result next to the PDF"""
+        signature = list(text_index.signature)
+        parts = []
+        word_starts = []
+        pages = []
+        boxes = []
+        cursor = 0
+        for page_number, words in text_index.iter_words():
+            for position, (x0, y0, x1, y1, word, _offset) in enumerate(words):
+                if position:
+                    parts.append(' ')
+                    cursor += 1
+                word_starts.append(cursor)
+                pages.append(page_number)
+                boxes.append((x0, y0, x1, y1))
+                parts.append(word)
+                cursor += len(word)
+            parts.append('\n')
+            cursor += 1
+
+        index = cls(
+            pdf_path,
+            signature,
+            ''.join(parts),
+            np.asarray(word_starts, dtype=np.int64),
+            np.asarray(pages, dtype=np.int32),
+            np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        )
+        index.save()
+        return index
+
+    def save(self):
+        path = _index_path(self.pdf_path)
+        with open(f"{path}.tmp", 'wb') as f:
+            np.savez_compressed(
+                f,
+                version=np.int32(INDEX_VERSION),
+                signature=np.asarray(self.signature, dtype=np.int64),
+                text=np.frombuffer(self.text.encode('utf-8'), dtype=np.uint8),
+                word_starts=self.word_starts,
+                pages=self.pages,
+                boxes=self.boxes
+            )
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, pdf_path):
+        """Load a persisted index, or return None if it is missing or stale"""
+        try:
+            with np.load(_index_path(pdf_path)) as arrays:
+                signature = arrays['signature'].tolist()
+                if int(arrays['version']) != INDEX_VERSION or signature != _signature(pdf_path):
+                    return None
+                return cls(pdf_path, signature, arrays['text'].tobytes().decode('utf-8'),
+                           arrays['word_starts'], arrays['pages'], arrays['boxes'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def is_current(self):
+        try:
+            return self.signature == _signature(self.pdf_path)
+        except OSError:
+            return False
+
+    @staticmethod
+    def compile(query, regex=False, case_sensitive=False, whole_words=False):
+        """Turn a client query into a pattern; phrases match their words across any line breaks"""
+        query = (query or '').strip()
+        if not query:
+            raise ValueError("Empty search query")
+        if len(query) > MAX_QUERY_LENGTH:
+            raise ValueError(f"Search query longer than {MAX_QUERY_LENGTH} characters")
+        if regex:
+            pattern = query
+        else:
+            pattern = ' '.join(re.escape(word) for word in query.split())
+        if whole_words:
+            pattern = rf"(?<!\w)(?:{pattern})(?!\w)"
+        try:
+            compiled = re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Invalid search pattern: {e}")
+        if regex and _has_nested_quantifier(sre_parse.parse(pattern)):
+            raise ValueError("Nested quantifiers such as (a+)+ are not supported in search patterns")
+        return compiled
+
+    def search(self, pattern, limit=1000, start_page=1, end_page=None):
+        """Return up to limit hits as dicts with page, matched text and one rect per line"""
+        hits = []
+        if len(self.word_starts) == 0:
+            return hits
+        for match in pattern.finditer(self.text):
+            if match.end() == match.start():
+                continue
+            first = int(np.searchsorted(self.word_starts, match.start(), side='right')) - 1
+            last = int(np.searchsorted(self.word_starts, match.end(), side='left')) - 1
+            first = max(first, 0)
+            page = int(self.pages[first])
+            if page < start_page or (end_page is not None and page > end_page):
+                continue
+            hits.append({'page': page, 'text': match.group(0), 'rects': self._rects(first, last, page)})
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def _rects(self, first, last, page):
+        """Merge the boxes of matched words on the same line; a match never leaves its page"""
+        rects = []
+        for i in range(first, last + 1):
+            if self.pages[i] != page:
+                break
+            x0, y0, x1, y1 = (round(float(v), 2) for v in self.boxes[i])
+            if rects and abs(rects[-1][1] - y0) < 2 and x0 >= rects[-1][0]:
+                rects[-1][2] = max(rects[-1][2], x1)
+                rects[-1][3] = max(rects[-1][3], y1)
+            else:
+                rects.append([x0, y0, x1, y1])
+        return rects
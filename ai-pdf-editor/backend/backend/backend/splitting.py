@@ -0,0 +1,131 @@
+import math
+from concurrent.futures import FIRST_COMPLETED, wait
+from lazy_imports import lazy_import
+from worker_pool import WorkerPool
+
+fitz = lazy_import('fitz')  # PyMuPDF
+
+SPLIT_MODES = ('ranges', 'every', 'bookmarks', 'size')
+
+
+def parse_ranges(pages, page_count):
+    """Turn entries like "1-3" or 2 into inclusive (first, last) page ranges"""
+    ranges = []
+    for entry in pages:
+        text = str(entry).strip()
+        try:
+            if '-' in text:
+                first, last = (int(part) for part in text.split('-', 1))
+            else:
+                first = last = int(text)
+        except ValueError:
+            raise ValueError(f"Invalid page range: {entry!r}")
+        if not 1 <= first <= last <= page_count:
+            raise ValueError(f"Page range {text} is outside 1-{page_count}")
+        ranges.append((first, last))
+    if not ranges:
+        raise ValueError("No page ranges given")
+    return ranges
+
+
+def every_n_ranges(page_count, n):
+    n = int(n)
+    if n < 1:
+        raise ValueError("Pages per part must be at least 1")
+    return [(first, min(first + n - 1, page_count)) for first in range(1, page_count + 1, n)]
+
+
+def bookmark_ranges(toc, page_count, level=1):
+    """Start a new part at every outline entry of the given level; leading pages form their own part"""
+    starts = sorted({page for lvl, _title, page in toc if lvl == level and 1 <= page <= page_count})
+    if not starts:
+        raise ValueError(f"Document has no level {level} bookmarks")
+    if starts[0] != 1:
+        starts.insert(0, 1)
+    return [(first, (starts[i + 1] - 1) if i + 1 < len(starts) else page_count)
+            for i, first in enumerate(starts)]
+
+
+def size_ranges(doc, max_bytes):
+    """Group consecutive pages into parts whose estimated size stays under max_bytes.
+
+    A page costs its content streams plus every image it shows that the part
+    does not already contain, since images shared between pages are written
+    once per part. A single page larger than the target becomes its own part.
+    """
+    max_bytes = int(max_bytes)
+    if max_bytes <= 0:
+        raise ValueError("Target part size must be positive")
+
+    stream_sizes = {}
+
+    def stream_size(xref):
+        if xref not in stream_sizes:
+            try:
+                stream_sizes[xref] = len(doc.xref_stream_raw(xref) or b'')
+            except Exception:
+                stream_sizes[xref] = 0
+        return stream_sizes[xref]
+
+    ranges = []
+    first, size, resources = 1, 0, set()
+    for page in doc:
+        page_resources = {item[0] for item in page.get_images(full=True)}
+        cost = sum(stream_size(xref) for xref in page.get_contents())
+        cost += sum(stream_size(xref) for xref in page_resources - resources)
+        page_number = page.number + 1
+        if page_number > first and size + cost > max_bytes:
+            ranges.append((first, page_number - 1))
+            first, resources = page_number, set()
+            cost = sum(stream_size(xref) for xref in page.get_contents())
+            cost += sum(stream_size(xref) for xref in page_resources)
+            size = 0
+        size += cost
+        resources |= page_resources
+    ranges.append((first, doc.page_count))
+    return ranges
+
+
+def write_parts(pdf_path, parts):
+    """Process-pool worker: write (first, last, output_path) parts from one open source document"""
+    written = []
+    with fitz.open(pdf_path) as src:
+        for first, last, output_path in parts:
+            with fitz.open() as part:
+                part.insert_pdf(src, from_page=first - 1, to_page=last - 1)
+                # garbage=3 keeps one copy of objects the part's pages share
+                part.save(output_path, garbage=3, deflate=True)
+            written.append(output_path)
+    return written
+
+
+def write_parts_parallel(pdf_path, parts, max_workers, progress=None):
+    """Write all parts, spreading contiguous batches of them across worker processes"""
+    if max_workers <= 1 or len(parts) <= 2:
+        written = []
+        for part in parts:
+            written.extend(write_parts(pdf_path, [part]))
+            if progress:
+                progress(len(written), len(parts))
+        return written
+
+    # A few batches per worker balances uneven parts without reopening the source per part
+    batch_size = max(1, math.ceil(len(parts) / (max_workers * 4)))
+    batches = [parts[i:i + batch_size] for i in range(0, len(parts), batch_size)]
+    results = [None] * len(batches)
+    done_parts = 0
+    with WorkerPool(max_workers=max_workers) as pool:
+        pending = {}
+        next_batch = 0
+        while next_batch < len(batches) or pending:
+            while next_batch < len(batches) and len(pending) < max_workers * 2:
+                pending[pool.submit(write_parts, pdf_path, batches[next_batch])] = next_batch
+                next_batch += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                results[index] = pool.result(future)
+                done_parts += len(results[index])
+                if progress:
+                    progress(done_parts, len(parts))
+    return [path for batch in results for path in batch]
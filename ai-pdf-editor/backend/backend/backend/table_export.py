@@ -0,0 +1,284 @@
+import csv
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, wait
+from lazy_imports import lazy_import
+from worker_pool import WorkerPool
+
+pdfplumber = lazy_import('pdfplumber')
+pa = lazy_import('pyarrow')
+pq = lazy_import('pyarrow.parquet')
+
+TABLE_FORMATS = ('xlsx', 'csv', 'parquet')
+TABLE_LAYOUTS = ('table', 'page')
+
+# Parquet rows are buffered up to this many before being written out as one row group
+PARQUET_ROW_GROUP_ROWS = 10000
+
+_NUMBER = re.compile(r'^\(?-?[$€£]?\s?\d[\d,]*(\.\d+)?\)?%?$')
+
+
+def extract_page_tables(pdf_path, page_numbers):
+    """Process-pool worker: extract cleaned tables from a batch of pages with one open document"""
+    results = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_number in page_numbers:
+            page = pdf.pages[page_number - 1]
+            tables = []
+            for table in page.extract_tables():
+                rows = [[_clean(cell) for cell in row] for row in table if row and any(row)]
+                if rows:
+                    tables.append(rows)
+            # pdfplumber caches parsed objects per page; drop them as we go
+            page.flush_cache()
+            results.append((page_number, tables))
+    return results
+
+
+def iter_page_tables(pdf_path, page_count, max_workers=1, batch_size=8):
+    """Yield (page_number, tables) in page order while batches are extracted in parallel"""
+    batches = [list(range(start, min(start + batch_size, page_count + 1)))
+               for start in range(1, page_count + 1, batch_size)]
+    if max_workers <= 1 or len(batches) <= 1:
+        for batch in batches:
+            yield from extract_page_tables(pdf_path, batch)
+        return
+
+    with WorkerPool(max_workers=max_workers) as pool:
+        pending = {}
+        finished = {}
+        next_batch = next_yield = 0
+        while next_yield < len(batches):
+            while next_batch < len(batches) and len(pending) < max_workers * 2:
+                pending[pool.submit(extract_page_tables, pdf_path, batches[next_batch])] = next_batch
+                next_batch += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished[pending.pop(future)] = pool.result(future)
+            # Hold out-of-order batches back so sheets are written front to back
+            while next_yield in finished:
+                yield from finished.pop(next_yield)
+                next_yield += 1
+
+
+def detect_header(rows):
+    """Treat the first row as a header when it is all text and the rows below carry numbers or differ from it"""
+    if len(rows) < 2:
+        return False
+    first = rows[0]
+    if not all(first) or any(_NUMBER.match(cell) for cell in first):
+        return False
+    body_numbers = sum(1 for row in rows[1:] for cell in row if cell and _NUMBER.match(cell))
+    return body_numbers > 0 or len(set(first)) == len(first)
+
+
+def coerce(cell):
+    """Convert ledger-style numbers such as "1,234.50" or "(12.00)" to floats, leaving other text alone"""
+    if not cell or not _NUMBER.match(cell):
+        return cell
+    text = cell.replace(',', '').replace('$', '').replace('€', '').replace('£', '').replace(' ', '')
+    negative = text.startswith('(') and text.endswith(')')
+    percent = text.endswith('%')
+    text = text.strip('()%')
+    try:
+        value = float(text)
+    except ValueError:
+        return cell
+    if percent:
+        value /= 100
+    return -value if negative else value
+
+
+def group_tables(page_tables, layout='table'):
+    """Group extracted tables into sheets, yielding (name, header, rows, continues) with number cells coerced.
+
+    With the 'table' layout a table whose header repeats the previous table's
+    header continues that sheet (continues=True), so ledgers spanning many
+    pages stay one sheet without being held in memory.
+    """
+    previous_header = None
+    for page_number, tables in page_tables:
+        if layout == 'page':
+            if not tables:
+                continue
+            rows = []
+            for table in tables:
+                if rows:
+                    rows.append([])
+                rows.extend(table)
+            yield f"Page {page_number}", None, [[coerce(cell) for cell in row] for row in rows], False
+            continue
+
+        for table in tables:
+            header = table[0] if detect_header(table) else None
+            body = [[coerce(cell) for cell in row] for row in (table[1:] if header else table)]
+            continues = header is not None and header == previous_header
+            previous_header = header
+            yield f"Table {page_number}", header, body, continues
+
+
+class TableWriter:
+    """Streams sheets into one constant-memory xlsx workbook or into one CSV/Parquet file per sheet"""
+
+    def __init__(self, fmt, output_base):
+        if fmt not in TABLE_FORMATS:
+            raise ValueError(f"Unsupported table format: {fmt}")
+        self.fmt = fmt
+        self.output_base = output_base
+        self.paths = []
+        self._sheet_names = set()
+        self._workbook = None
+        self._sheet = None
+        self._file = None
+        self._csv = None
+        self._header = None
+        self._rows = []
+        self._parquet = None
+        self._schema = None
+        self._row_index = 0
+        if fmt == 'xlsx':
+            import xlsxwriter
+            # constant_memory flushes each row as soon as the next one starts
+            self._workbook = xlsxwriter.Workbook(f"{output_base}.xlsx", {'constant_memory': True})
+            self._header_format = self._workbook.add_format({'bold': True})
+
+    def _unique_name(self, name):
+        candidate, n = name[:31], 2
+        while candidate.lower() in self._sheet_names:
+            suffix = f" ({n})"
+            candidate, n = name[:31 - len(suffix)] + suffix, n + 1
+        self._sheet_names.add(candidate.lower())
+        return candidate
+
+    def start(self, name, header):
+        """Begin a new sheet, finishing the current one"""
+        self._finish()
+        name = self._unique_name(name)
+        self._header = header
+        if self.fmt == 'xlsx':
+            self._sheet = self._workbook.add_worksheet(name)
+            self._row_index = 0
+            if header:
+                self._sheet.write_row(0, 0, header, self._header_format)
+                self._sheet.freeze_panes(1, 0)
+                self._row_index = 1
+            return
+
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_').lower()
+        if self.fmt == 'csv':
+            path = f"{self.output_base}_{slug}.csv"
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._csv = csv.writer(self._file)
+            if header:
+                self._csv.writerow(header)
+        else:
+            path = f"{self.output_base}_{slug}.parquet"
+        self.paths.append(path)
+
+    def append(self, rows):
+        if self.fmt == 'xlsx':
+            for row in rows:
+                self._sheet.write_row(self._row_index, 0, row)
+                self._row_index += 1
+        elif self.fmt == 'csv':
+            self._csv.writerows(rows)
+        else:
+            self._rows.extend(rows)
+            if len(self._rows) >= PARQUET_ROW_GROUP_ROWS:
+                self._flush_parquet()
+
+    def _flush_parquet(self):
+        """Write the buffered rows as one row group; the first one fixes the file's columns and types"""
+        if self._parquet is None:
+            self._schema = _parquet_schema(self._header, self._rows)
+            self._parquet = pq.ParquetWriter(self.paths[-1], self._schema)
+        elif not self._rows:
+            return
+        self._parquet.write_table(_parquet_table(self._schema, self._rows))
+        self._rows = []
+
+    def _finish(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = self._csv = None
+        if self.fmt == 'parquet' and self.paths and (self._rows or self._header or self._parquet):
+            self._flush_parquet()
+            self._parquet.close()
+            self._parquet = self._schema = self._header = None
+
+    def close(self):
+        """Finish all output and return the written paths"""
+        self._finish()
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+            if self._sheet_names:
+                self.paths.append(f"{self.output_base}.xlsx")
+            else:
+                # xlsxwriter always writes at least one sheet; no tables means no workbook
+                os.remove(f"{self.output_base}.xlsx")
+        return self.paths
+
+
+def export_tables(pdf_path, page_count, output_base, fmt='xlsx', layout='table', max_workers=1, progress=None):
+    """Extract every table of a PDF and write it out, returning the written paths (empty if there are none)"""
+    if layout not in TABLE_LAYOUTS:
+        raise ValueError(f"Unsupported table layout: {layout}")
+
+    def pages():
+        for page_number, tables in iter_page_tables(pdf_path, page_count, max_workers):
+            yield page_number, tables
+            if progress:
+                progress(page_number, page_count)
+
+    writer = TableWriter(fmt, output_base)
+    try:
+        for name, header, rows, continues in group_tables(pages(), layout):
+            if not continues:
+                writer.start(name, header)
+            writer.append(rows)
+    finally:
+        paths = writer.close()
+    return paths
+
+
+def _parquet_schema(header, rows):
+    """Columns from the header and the first rows; numeric only when every filled cell parsed as a number"""
+    width = max([len(header or [])] + [len(row) for row in rows])
+    fields = []
+    for i, name in enumerate(_column_names(header, width)):
+        values = [row[i] for row in rows if i < len(row) and row[i] not in (None, '')]
+        numeric = values and all(isinstance(v, float) for v in values)
+        fields.append(pa.field(name, pa.float64() if numeric else pa.string()))
+    return pa.schema(fields)
+
+
+def _parquet_table(schema, rows):
+    """Fit rows to a fixed schema: text in a numeric column becomes null and cells past its width are dropped"""
+    columns = []
+    for i, field in enumerate(schema):
+        values = [row[i] if i < len(row) else None for row in rows]
+        if field.type == pa.float64():
+            values = [v if isinstance(v, float) else None for v in values]
+        else:
+            values = ['' if v is None else str(v) for v in values]
+        columns.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _column_names(header, width):
+    names, seen = [], set()
+    for i in range(width):
+        name = (header[i] if header and i < len(header) and header[i] else f"column_{i + 1}")
+        base, n = name, 2
+        while name in seen:
+            name, n = f"{base}_{n}", n + 1
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def _clean(cell):
+    if cell is None:
+        return ''
+    return ' '.join(str(cell).split())
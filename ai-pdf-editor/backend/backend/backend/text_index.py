@@ -0,0 +1,170 @@
+import bisect
+import json
+import os
+
+INDEX_VERSION = 1
+
+
+def _signature(pdf_path):
+    stat = os.stat(pdf_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _index_paths(pdf_path):
+    return f"{pdf_path}.pages.jsonl", f"{pdf_path}.words.jsonl", f"{pdf_path}.pages.idx.json"
+
+
+def _page_words(page, text):
+    """Word boxes for a page, each with the word's character offset into the page text"""
+    words = []
+    cursor = 0
+    for x0, y0, x1, y1, word, *_ in page.get_text("words"):
+        offset = text.find(word, cursor)
+        if offset >= 0:
+            cursor = offset + len(word)
+        words.append([round(x0, 2), round(y0, 2), round(x1, 2), round(y1, 2), word, offset])
+    return words
+
+
+class TextIndex:
+    """Per-page text, word boxes and character offsets persisted next to a PDF.
+
+    Only the small offset table is kept in memory; page text and word boxes
+    live in separate JSON-lines files and are read on demand, so text-only
+    readers never parse the word boxes.
+    """
+
+    def __init__(self, pdf_path, meta):
+        self.pdf_path = pdf_path
+        self.pages_path, self.words_path, self.meta_path = _index_paths(pdf_path)
+        self.signature = meta['signature']
+        self.byte_offsets = meta['byteOffsets']
+        self.word_offsets = meta['wordOffsets']
+        self.char_offsets = meta['charOffsets']
+        self.text_lengths = meta['textLengths']
+        self.blank_pages = meta['blankPages']
+
+    @property
+    def page_count(self):
+        return len(self.byte_offsets)
+
+    @classmethod
+    def build(cls, pdf_path, doc):
+        """Extract every page of an open fitz document and persist the index"""
+        pages_path, words_path, meta_path = _index_paths(pdf_path)
+        byte_offsets = []
+        word_offsets = []
+        char_offsets = []
+        text_lengths = []
+        blank_pages = []
+        char_offset = 0
+
+        with open(f"{pages_path}.tmp", 'wb') as f, open(f"{words_path}.tmp", 'wb') as words_file:
+            for page in doc:
+                text = page.get_text()
+                byte_offsets.append(f.tell())
+                word_offsets.append(words_file.tell())
+                f.write(json.dumps({'page': page.number + 1, 'text': text}, ensure_ascii=False).encode('utf-8') + b'\n')
+                words_file.write(json.dumps(_page_words(page, text), ensure_ascii=False).encode('utf-8') + b'\n')
+                char_offsets.append(char_offset)
+                text_lengths.append(len(text))
+                if not text.strip():
+                    blank_pages.append(page.number + 1)
+                # Pages are joined with a newline in the full document text
+                char_offset += len(text) + 1
+
+        meta = {
+            'version': INDEX_VERSION,
+            'signature': _signature(pdf_path),
+            'byteOffsets': byte_offsets,
+            'wordOffsets': word_offsets,
+            'charOffsets': char_offsets,
+            'textLengths': text_lengths,
+            'blankPages': blank_pages
+        }
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump(meta, f)
+        # The page files land first so a readable meta file always points at complete pages
+        os.replace(f"{pages_path}.tmp", pages_path)
+        os.replace(f"{words_path}.tmp", words_path)
+        os.replace(f"{meta_path}.tmp", meta_path)
+        return cls(pdf_path, meta)
+
+    @classmethod
+    def load(cls, pdf_path):
+        """Load a persisted index, or return None if it is missing or stale"""
+        meta_path = _index_paths(pdf_path)[2]
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != INDEX_VERSION or meta.get('signature') != _signature(pdf_path):
+            return None
+        return cls(pdf_path, meta)
+
+    def is_current(self):
+        try:
+            return self.signature == _signature(self.pdf_path)
+        except OSError:
+            return False
+
+    def _check_page(self, page_number):
+        if page_number < 1 or page_number > self.page_count:
+            raise IndexError(f"Page {page_number} out of range")
+
+    def _read_pages(self, start, end):
+        with open(self.pages_path, 'rb') as f:
+            f.seek(self.byte_offsets[start - 1])
+            for _ in range(start, end + 1):
+                yield json.loads(f.readline())
+
+    def _read_words(self, start, end):
+        with open(self.words_path, 'rb') as f:
+            f.seek(self.word_offsets[start - 1])
+            for _ in range(start, end + 1):
+                yield json.loads(f.readline())
+
+    def page_text(self, page_number):
+        self._check_page(page_number)
+        return next(self._read_pages(page_number, page_number))['text']
+
+    def page_words(self, page_number):
+        """Word boxes as [x0, y0, x1, y1, word, char offset within the page]"""
+        self._check_page(page_number)
+        return next(self._read_words(page_number, page_number))
+
+    def iter_pages(self, start=1, end=None):
+        """Yield (page_number, text) for a page range, reading one page at a time"""
+        end = self.page_count if end is None else min(end, self.page_count)
+        if start > end:
+            return
+        self._check_page(start)
+        for record in self._read_pages(start, end):
+            yield record['page'], record['text']
+
+    def iter_words(self, start=1, end=None):
+        """Yield (page_number, words) for a page range, reading one page at a time"""
+        end = self.page_count if end is None else min(end, self.page_count)
+        if start > end:
+            return
+        self._check_page(start)
+        for page_number, words in enumerate(self._read_words(start, end), start):
+            yield page_number, words
+
+    def text(self, start=1, end=None):
+        """Join the text of a page range, one newline after each page"""
+        return ''.join(text + '\n' for _, text in self.iter_pages(start, end))
+
+    def char_offset(self, page_number):
+        """Offset of a page's first character in the full document text"""
+        self._check_page(page_number)
+        return self.char_offsets[page_number - 1]
+
+    def page_for_offset(self, offset):
+        """Page number containing a character offset of the full document text"""
+        return max(bisect.bisect_right(self.char_offsets, offset), 1)
+
+    def empty_pages(self):
+        """Pages without any extractable text"""
+        return list(self.blank_pages)
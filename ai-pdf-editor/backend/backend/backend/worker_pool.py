@@ -0,0 +1,52 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+
+# Forking this threaded server would copy locks other threads hold at that
+# instant into the child; forkserver children start from a clean process
+START_METHOD = os.getenv('WORKER_START_METHOD', 'forkserver')
+
+
+def _context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(START_METHOD if START_METHOD in methods else 'spawn')
+
+
+def _call(func, args):
+    """Worker side: run func and return its result with the stage timings it recorded"""
+    trace = metrics.begin_request()
+    try:
+        return func(*args), trace.stages
+    finally:
+        metrics.end_request()
+
+
+class WorkerPool:
+    """Process pool for CPU-bound page batches.
+
+    Stage timings recorded inside a worker come back with its result and are
+    recorded by whichever thread collects it, so they reach the histograms
+    and the Server-Timing of the request or job that submitted the work.
+    """
+
+    def __init__(self, max_workers):
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=_context())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown(wait=True)
+        return False
+
+    def submit(self, func, *args):
+        return self._executor.submit(_call, func, args)
+
+    def result(self, future):
+        """The result of a finished future, recording its worker's stage timings"""
+        result, stages = future.result()
+        for operation, stage, elapsed in stages:
+            metrics.record_stage(operation, stage, elapsed)
+        return result
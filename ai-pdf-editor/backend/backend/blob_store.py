@@ -0,0 +1,166 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class BlobStore:
+    """Content-addressed storage for uploads.
+
+    Identical bytes are stored once under their SHA-256; every file id is a
+    reference to a blob and is materialized as a hard link, so the rest of the
+    app keeps reading plain paths.
+    """
+
+    def __init__(self, root, chunk_size=1024 * 1024):
+        self.root = root
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'tmp'), exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(root, 'blobs.db'), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS blobs (
+                    digest TEXT PRIMARY KEY,
+                    extension TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    page_count INTEGER,
+                    text_index TEXT NOT NULL DEFAULT 'pending',
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS refs (
+                    file_id TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL REFERENCES blobs (digest),
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self._db.execute('CREATE INDEX IF NOT EXISTS refs_digest ON refs (digest)')
+
+    def blob_path(self, digest, extension):
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.{extension}")
+
+    def ingest(self, stream, extension, max_bytes=None):
+        """Copy a stream to the store in chunks, hashing it on the way.
+
+        Returns (digest, size, is_new). Content that is already stored is
+        discarded after hashing.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self.root, 'tmp', uuid.uuid4().hex)
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise ValueError('File too large')
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            digest = digest.hexdigest()
+            blob_path = self.blob_path(digest, extension)
+            with self._lock, self._db:
+                row = self._db.execute("SELECT digest FROM blobs WHERE digest = ?", (digest,)).fetchone()
+                if row is not None and os.path.exists(blob_path):
+                    return digest, size, False
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(tmp_path, blob_path)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO blobs (digest, extension, size, created_at) VALUES (?, ?, ?, ?)",
+                    (digest, extension, size, time.time())
+                )
+                return digest, size, True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def add_ref(self, file_id, digest, target_path):
+        """Record file_id as a reference to a blob and link it to target_path"""
+        blob = self.get_blob(digest)
+        _link(self.blob_path(digest, blob['extension']), target_path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO refs (file_id, digest, created_at) VALUES (?, ?, ?)",
+                (file_id, digest, time.time())
+            )
+
+    def link_sidecars(self, digest, target_path, suffixes):
+        """Link derived files (indexes etc.) built for a blob next to one of its references"""
+        blob = self.get_blob(digest)
+        blob_path = self.blob_path(digest, blob['extension'])
+        for suffix in suffixes:
+            if os.path.exists(blob_path + suffix) and not os.path.exists(target_path + suffix):
+                _link(blob_path + suffix, target_path + suffix)
+
+    def get_blob(self, digest):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def lookup(self, file_id):
+        """Get the blob record a file id refers to, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT blobs.* FROM refs JOIN blobs ON blobs.digest = refs.digest WHERE refs.file_id = ?",
+                (file_id,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def update_blob(self, digest, **fields):
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE blobs SET {columns} WHERE digest = ?", (*fields.values(), digest))
+
+    def release(self, file_id, sidecar_suffixes=()):
+        """Drop a reference; the blob and its sidecars are deleted with the last one"""
+        with self._lock, self._db:
+            row = self._db.execute("SELECT digest FROM refs WHERE file_id = ?", (file_id,)).fetchone()
+            if row is None:
+                return False
+            digest = row['digest']
+            self._db.execute("DELETE FROM refs WHERE file_id = ?", (file_id,))
+            remaining = self._db.execute("SELECT COUNT(*) FROM refs WHERE digest = ?", (digest,)).fetchone()[0]
+            if remaining:
+                return False
+            blob = self._db.execute("SELECT extension FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+
+        blob_path = self.blob_path(digest, blob['extension'])
+        for path in [blob_path] + [blob_path + suffix for suffix in sidecar_suffixes]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return True
+
+    def stats(self):
+        with self._lock:
+            blobs, stored = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            refs, logical = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(blobs.size), 0) FROM refs JOIN blobs ON blobs.digest = refs.digest"
+            ).fetchone()
+        return {
+            'blobs': blobs,
+            'references': refs,
+            'storedBytes': stored,
+            'logicalBytes': logical,
+            'savedBytes': logical - stored
+        }
+
+
+def _link(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        # Hard links are unavailable across filesystems; fall back to a copy
+        shutil.copyfile(source, target)
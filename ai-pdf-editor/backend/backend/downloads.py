@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+import zipfile
+from collections import OrderedDict
+from flask import Response, abort, request, send_file, stream_with_context
+from werkzeug.security import safe_join
+
+
+class _ZipSink:
+    """Write-only stream that lets zipfile build an archive while it is being sent"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def iter_zip(files, chunk_size=1024 * 1024):
+    """Yield a ZIP archive of (arcname, path) pairs without building it in memory or on disk.
+
+    zipfile falls back to data descriptors on unseekable output, so each
+    member is emitted as soon as its bytes are read.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, path in files:
+            with open(path, 'rb') as src, archive.open(arcname, 'w', force_zip64=True) as dest:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+class DownloadManager:
+    """Serves processed artifacts with range requests, content-hash ETags and optional proxy offload"""
+
+    def __init__(self, folder, accel_prefix=None, max_etags=4096, sharded=False):
+        self.folder = folder
+        # Sharded folders keep each file under the first two characters of its name
+        self.sharded = sharded
+        # e.g. '/protected/' with an nginx `internal` location aliased to the folder
+        self.accel_prefix = accel_prefix
+        self.max_etags = max_etags
+        self._etags = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _relative(self, filename):
+        return f"{filename[:2]}/{filename}" if self.sharded else filename
+
+    def resolve(self, filename):
+        path = safe_join(self.folder, self._relative(filename))
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+    def etag_for(self, path):
+        """SHA-256 of the file's content, remembered per (path, mtime, size)"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            etag = self._etags.get(key)
+            if etag is not None:
+                self._etags.move_to_end(key)
+                return etag
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        etag = digest.hexdigest()
+
+        with self._lock:
+            self._etags[key] = etag
+            while len(self._etags) > self.max_etags:
+                self._etags.popitem(last=False)
+        return etag
+
+    def send(self, filename, as_attachment=True):
+        """Send an artifact; Range, If-Range and If-None-Match are honoured by send_file"""
+        path = self.resolve(filename)
+        if path is None:
+            abort(404)
+
+        etag = self.etag_for(path)
+        if self.accel_prefix:
+            # Let the reverse proxy stream the bytes instead of tying up a worker
+            response = Response(status=200)
+            response.headers['X-Accel-Redirect'] = self.accel_prefix.rstrip('/') + '/' + self._relative(filename)
+            response.headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(filename)}"'
+            response.set_etag(etag)
+            return response.make_conditional(request)
+
+        # With USE_X_SENDFILE enabled, send_file hands the path to the server instead
+        return send_file(
+            path,
+            as_attachment=as_attachment,
+            download_name=os.path.basename(filename),
+            etag=etag,
+            conditional=True,
+            max_age=0
+        )
+
+    def _bundle_path(self, bundle_id):
+        return safe_join(self.folder, self._relative(f"{bundle_id}.bundle.json"))
+
+    def register_bundle(self, name, filenames):
+        """Record a set of artifacts that can be downloaded as one streamed ZIP"""
+        bundle_id = uuid.uuid4().hex
+        os.makedirs(os.path.dirname(self._bundle_path(bundle_id)), exist_ok=True)
+        with open(self._bundle_path(bundle_id), 'w') as f:
+            json.dump({'name': name, 'files': [os.path.basename(f) for f in filenames]}, f)
+        return bundle_id
+
+    def send_bundle(self, bundle_id):
+        bundle_path = self._bundle_path(bundle_id)
+        if bundle_path is None or not os.path.isfile(bundle_path):
+            abort(404)
+        with open(bundle_path) as f:
+            bundle = json.load(f)
+
+        files = []
+        for filename in bundle['files']:
+            path = self.resolve(filename)
+            if path is None:
+                abort(410)
+            files.append((filename, path))
+
+        response = Response(stream_with_context(iter_zip(files)), mimetype='application/zip')
+        response.headers['Content-Disposition'] = f'attachment; filename="{bundle["name"]}.zip"'
+        return response
+
+    def describe(self, paths, bundle_name=None):
+        """Build the download payload for a list of artifact paths"""
+        files = [{
+            'name': os.path.basename(path),
+            'size': os.path.getsize(path),
+            'downloadUrl': f'/api/download/{os.path.basename(path)}'
+        } for path in paths]
+        payload = {'files': files}
+        if bundle_name and len(paths) > 1:
+            payload['zipUrl'] = f'/api/download/bundle/{self.register_bundle(bundle_name, paths)}.zip'
+        return payload
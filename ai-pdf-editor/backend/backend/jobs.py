@@ -0,0 +1,230 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+# Interactive work (viewer/AI requests) gets its own threads so bulk jobs cannot starve it
+DEFAULT_LANES = {
+    'interactive': 4,
+    'bulk': 2
+}
+
+FINISHED_STATUSES = ('succeeded', 'failed')
+
+
+class JobManager:
+    """Local worker pool backed by a persistent SQLite job table.
+
+    Jobs wait in a per-lane queue and are handed to a lane thread only once
+    both the lane and the job's operation have room, so a job held back by its
+    operation's concurrency limit never occupies a thread other jobs could use.
+    """
+
+    def __init__(self, db_path, lanes=None):
+        self.db_path = db_path
+        self.lanes = dict(lanes or DEFAULT_LANES)
+        self._operations = {}
+        self._executors = {
+            lane: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"jobs-{lane}")
+            for lane, workers in self.lanes.items()
+        }
+        self._events = {}
+        self._contexts = {}
+        self._lock = threading.Lock()
+        self._pending = {lane: deque() for lane in self.lanes}
+        self._running = {lane: 0 for lane in self.lanes}
+        self._running_operations = {}
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    operation TEXT NOT NULL,
+                    lane TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    error_type TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            ''')
+            self._db.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)')
+            # Job tables created before error types were recorded
+            columns = {row['name'] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            if 'error_type' not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN error_type TEXT")
+
+    def register(self, operation, func, lane='bulk', max_concurrency=None):
+        """Register func(params, progress) as a job operation"""
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown lane: {lane}")
+        self._operations[operation] = (func, lane, max_concurrency)
+
+    def resume(self):
+        """Requeue jobs persisted as queued and fail the ones a restart interrupted"""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted by restart', finished_at = ? "
+                "WHERE status = 'running'",
+                (time.time(),)
+            )
+            queued = self._db.execute(
+                "SELECT id, operation, lane FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        for row in queued:
+            if row['operation'] in self._operations:
+                self._enqueue(row['id'], row['operation'], row['lane'])
+
+    def submit(self, operation, params, lane=None, context=None):
+        """Persist a new job and queue it, returning its id.
+
+        context, if given, is called in the worker thread and the job runs
+        inside the context manager it returns.
+        """
+        if operation not in self._operations:
+            raise ValueError(f"Unknown operation: {operation}")
+        lane = lane if lane in self.lanes else self._operations[operation][1]
+        job_id = str(uuid.uuid4())
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (id, operation, lane, status, params, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, operation, lane, json.dumps(params), time.time())
+            )
+        if context is not None:
+            with self._lock:
+                self._contexts[job_id] = context
+        self._enqueue(job_id, operation, lane)
+        return job_id
+
+    def _enqueue(self, job_id, operation, lane):
+        with self._lock:
+            self._events[job_id] = threading.Event()
+            self._pending[lane].append((job_id, operation))
+        self._dispatch()
+
+    def _dispatch(self):
+        """Start the oldest pending jobs each lane has threads for, skipping operations at their limit"""
+        started = []
+        with self._lock:
+            for lane, pending in self._pending.items():
+                for entry in list(pending):
+                    if self._running[lane] >= self.lanes[lane]:
+                        break
+                    job_id, operation = entry
+                    limit = self._operations[operation][2]
+                    if limit and self._running_operations.get(operation, 0) >= limit:
+                        continue
+                    pending.remove(entry)
+                    self._running[lane] += 1
+                    self._running_operations[operation] = self._running_operations.get(operation, 0) + 1
+                    started.append((job_id, operation, lane))
+        for job_id, operation, lane in started:
+            self._executors[lane].submit(self._run, job_id, operation, lane)
+
+    def _update(self, job_id, **fields):
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _run(self, job_id, operation, lane):
+        with self._lock:
+            row = self._db.execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            context = self._contexts.pop(job_id, None)
+        func = self._operations[operation][0]
+        last_report = [0.0]
+
+        def progress(done, total):
+            # Throttle writes; a page-by-page callback would otherwise hammer SQLite
+            now = time.monotonic()
+            if total and (done >= total or now - last_report[0] >= 0.5):
+                last_report[0] = now
+                self._update(job_id, progress=round(done / total, 4))
+
+        try:
+            self._update(job_id, status='running', started_at=time.time())
+            with context() if context else nullcontext():
+                result = func(json.loads(row['params']), progress)
+            self._update(job_id, status='succeeded', progress=1.0, result=json.dumps(result),
+                         finished_at=time.time())
+        except Exception as e:
+            print(f"Job {job_id} ({operation}) failed: {e}")
+            self._update(job_id, status='failed', error=str(e), error_type=type(e).__name__,
+                         finished_at=time.time())
+        finally:
+            with self._lock:
+                self._running[lane] -= 1
+                self._running_operations[operation] -= 1
+                event = self._events.pop(job_id, None)
+            self._dispatch()
+            if event:
+                event.set()
+
+    def get(self, job_id):
+        """Get the public status of a job, or None if it does not exist"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'jobId': row['id'],
+            'operation': row['operation'],
+            'lane': row['lane'],
+            'status': row['status'],
+            'progress': row['progress'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'errorType': row['error_type'],
+            'createdAt': row['created_at'],
+            'startedAt': row['started_at'],
+            'finishedAt': row['finished_at']
+        }
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes or timeout elapses, then return its status"""
+        with self._lock:
+            event = self._events.get(job_id)
+        if event is not None:
+            event.wait(timeout)
+        return self.get(job_id)
+
+    def run_or_defer(self, operation, params, timeout, lane=None, context=None):
+        """Run a job and wait up to timeout seconds; slower jobs are left running in the background"""
+        job_id = self.submit(operation, params, lane, context)
+        job = self.wait(job_id, timeout)
+        return job, job['status'] in FINISHED_STATUSES
+
+    def active_file_ids(self):
+        """File ids referenced by queued or running jobs"""
+        with self._lock:
+            rows = self._db.execute("SELECT params FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        file_ids = set()
+        for row in rows:
+            params = json.loads(row['params'])
+            for key in ('fileId', 'fileIds', 'otherFiles'):
+                value = params.get(key)
+                if isinstance(value, str):
+                    file_ids.add(value)
+                elif isinstance(value, list):
+                    file_ids.update(v for v in value if isinstance(v, str))
+        return file_ids
+
+    def queue_depth(self):
+        """Jobs waiting or running per lane"""
+        with self._lock:
+            return {lane: len(pending) + self._running[lane] for lane, pending in self._pending.items()}
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
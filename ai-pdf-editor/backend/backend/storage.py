@@ -0,0 +1,291 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Upload ids are UUIDs, and every derived file is named after (or filed under) the id it came from
+FILE_ID_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+
+def file_id_of(path):
+    """The upload id an artifact belongs to, from its file name or its parent directory, or None"""
+    for part in (os.path.basename(path), os.path.basename(os.path.dirname(path))):
+        match = FILE_ID_PATTERN.match(part)
+        if match:
+            return match.group(0)
+    return None
+
+
+class StorageManager:
+    """Tracks files on disk per file id and evicts them by TTL and, under a byte quota, by LRU.
+
+    A background thread rescans the tracked folders, so producers never have
+    to register what they write. Access times are kept in memory by touch()
+    and flushed on the next pass, so requests never wait on the database.
+    Files in sharded folders live under the first two characters of their
+    name, keeping directories small.
+    """
+
+    def __init__(self, db_path, quota_bytes=None, interval=300, min_idle=900, low_watermark=0.9,
+                 active_file_ids=None):
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        # Ids used more recently than this are never evicted for the quota
+        self.min_idle = min_idle
+        # A quota eviction frees space down to this share of the quota, so it does not run every pass
+        self.low_watermark = low_watermark
+        # Callable returning ids with queued or running jobs, which are never evicted
+        self.active_file_ids = active_file_ids
+        self.last_run = None
+        self._folders = {}
+        self._evict_callbacks = []
+        self._touched = {}
+        self._touch_lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    path TEXT PRIMARY KEY,
+                    file_id TEXT,
+                    kind TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    scanned_at REAL NOT NULL
+                )
+            ''')
+            self._db.execute('CREATE INDEX IF NOT EXISTS artifacts_file_id ON artifacts (file_id)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS artifacts_kind_access ON artifacts (kind, last_access)')
+
+    def add_folder(self, kind, path, ttl=None, sharded=False, primary=False, keep=()):
+        """Track a folder. Files idle longer than ttl seconds are deleted; when the file is
+        primary (an upload), its whole file id is evicted with it. Files named in keep (and
+        their SQLite journals) bound their own size and are only counted, never expired."""
+        os.makedirs(path, exist_ok=True)
+        self._folders[kind] = {
+            'path': path,
+            'ttl': ttl,
+            'sharded': sharded,
+            'primary': primary,
+            'keep': tuple(os.path.join(path, name) for name in keep)
+        }
+
+    @staticmethod
+    def _kept(path, keep):
+        return any(path == kept or path.startswith(f"{kept}-") for kept in keep)
+
+    def on_evict(self, callback):
+        """Call callback(file_id) after every artifact of a file id has been deleted"""
+        self._evict_callbacks.append(callback)
+
+    def shard_dir(self, kind, name, create=False):
+        folder = self._folders[kind]['path']
+        path = os.path.join(folder, name[:2]) if self._folders[kind]['sharded'] else folder
+        if create:
+            os.makedirs(path, exist_ok=True)
+        return path
+
+    def shard_path(self, kind, name, create=False):
+        return os.path.join(self.shard_dir(kind, name, create), name)
+
+    def migrate(self, kind):
+        """Move files left in the top level of a sharded folder into their shard"""
+        folder = self._folders[kind]['path']
+        moved = 0
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    os.replace(entry.path, self.shard_path(kind, entry.name, create=True))
+                    moved += 1
+        return moved
+
+    def touch(self, file_id):
+        """Record an access; cheap enough to call on every request"""
+        if file_id:
+            with self._touch_lock:
+                self._touched[file_id] = time.time()
+
+    def _walk(self, path):
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._walk(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+    def scan(self):
+        """Sync the artifact table with the folders and apply access times recorded since the last pass"""
+        stamp = time.time()
+        rows = []
+        for kind, folder in self._folders.items():
+            for entry in self._walk(folder['path']):
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                rows.append((entry.path, file_id_of(entry.path), kind, stat.st_size, stat.st_mtime, stamp))
+
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+
+        with self._lock, self._db:
+            self._db.executemany('''
+                INSERT INTO artifacts (path, file_id, kind, size, last_access, scanned_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    size = excluded.size,
+                    last_access = MAX(last_access, excluded.last_access),
+                    scanned_at = excluded.scanned_at
+            ''', rows)
+            # Files deleted by anything else since the last pass
+            self._db.execute("DELETE FROM artifacts WHERE scanned_at < ?", (stamp,))
+            self._db.executemany(
+                "UPDATE artifacts SET last_access = MAX(last_access, ?) WHERE file_id = ?",
+                [(accessed, file_id) for file_id, accessed in touched.items()]
+            )
+        return len(rows)
+
+    def _remove(self, rows):
+        """Delete artifact files and their rows, returning the bytes freed"""
+        freed = 0
+        for row in rows:
+            try:
+                os.remove(row['path'])
+                freed += row['size']
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Could not delete {row['path']}: {e}")
+                continue
+            # Drop directories emptied by the eviction, e.g. a page cache folder
+            parent = os.path.dirname(row['path'])
+            if parent not in (folder['path'] for folder in self._folders.values()):
+                try:
+                    os.rmdir(parent)
+                except OSError:
+                    pass
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM artifacts WHERE path = ?", [(row['path'],) for row in rows])
+        return freed
+
+    def evict(self, file_id):
+        """Delete every tracked artifact of a file id, returning the bytes freed"""
+        with self._lock:
+            rows = self._db.execute("SELECT path, size FROM artifacts WHERE file_id = ?", (file_id,)).fetchall()
+        freed = self._remove(rows)
+        for callback in self._evict_callbacks:
+            try:
+                callback(file_id)
+            except Exception as e:
+                print(f"Eviction callback for {file_id} failed: {e}")
+        return freed
+
+    def run_once(self):
+        """One cleanup pass: rescan, expire by TTL, then evict least recently used ids above the quota"""
+        with self._run_lock:
+            started = time.time()
+            self.scan()
+            active = set(self.active_file_ids()) if self.active_file_ids else set()
+            now = time.time()
+            evicted_ids = set()
+            expired_files = 0
+            freed = 0
+
+            for kind, folder in self._folders.items():
+                if folder['ttl'] is None:
+                    continue
+                with self._lock:
+                    rows = self._db.execute(
+                        "SELECT path, file_id, size FROM artifacts WHERE kind = ? AND last_access < ?",
+                        (kind, now - folder['ttl'])
+                    ).fetchall()
+                if folder['primary']:
+                    for file_id in {row['file_id'] for row in rows if row['file_id']} - active - evicted_ids:
+                        freed += self.evict(file_id)
+                        evicted_ids.add(file_id)
+                else:
+                    rows = [row for row in rows
+                            if row['file_id'] not in active and not self._kept(row['path'], folder['keep'])]
+                    freed += self._remove(rows)
+                    expired_files += len(rows)
+
+            if self.quota_bytes:
+                with self._lock:
+                    total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+                    candidates = self._db.execute(
+                        "SELECT file_id, MAX(last_access) AS last_access FROM artifacts "
+                        "WHERE file_id IS NOT NULL GROUP BY file_id ORDER BY last_access"
+                    ).fetchall() if total > self.quota_bytes else []
+                target = self.quota_bytes * self.low_watermark
+                for row in candidates:
+                    if total <= target:
+                        break
+                    if row['file_id'] in active or now - row['last_access'] < self.min_idle:
+                        continue
+                    released = self.evict(row['file_id'])
+                    total -= released
+                    freed += released
+                    evicted_ids.add(row['file_id'])
+
+            self.last_run = {
+                'finishedAt': time.time(),
+                'seconds': round(time.time() - started, 3),
+                'evictedFileIds': len(evicted_ids),
+                'expiredFiles': expired_files,
+                'freedBytes': freed
+            }
+            return self.last_run
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Storage cleanup failed: {e}")
+
+    def start(self):
+        """Run cleanup passes every interval seconds on a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='storage-cleanup', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def usage(self):
+        """Bytes and file counts per folder kind, as of the last pass"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT kind, COUNT(*) AS files, COALESCE(SUM(size), 0) AS bytes FROM artifacts GROUP BY kind"
+            ).fetchall()
+        usage = {kind: {'files': 0, 'bytes': 0} for kind in self._folders}
+        for row in rows:
+            usage[row['kind']] = {'files': row['files'], 'bytes': row['bytes']}
+        return usage
+
+    def stats(self):
+        usage = self.usage()
+        total = sum(kind['bytes'] for kind in usage.values())
+        with self._lock:
+            file_ids, oldest = self._db.execute(
+                "SELECT COUNT(DISTINCT file_id), MIN(last_access) FROM artifacts WHERE file_id IS NOT NULL"
+            ).fetchone()
+        return {
+            'totalBytes': total,
+            'quotaBytes': self.quota_bytes,
+            'usagePercent': round(total / self.quota_bytes * 100, 2) if self.quota_bytes else None,
+            'fileIds': file_ids,
+            'oldestAccess': oldest,
+            'folders': {
+                kind: dict(usage[kind], ttlSeconds=folder['ttl'], sharded=folder['sharded'])
+                for kind, folder in self._folders.items()
+            },
+            'lastRun': self.last_run
+        }
@@ -0,0 +1,110 @@
+"""Shared helpers for the benchmark scripts"""
+import os
+import sys
+import resource
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The backend modules import each other as top-level modules
+for _subdir in ('backend', 'backend/backend', 'backend/backend/backend'):
+    sys.path.insert(0, os.path.join(BACKEND_DIR, _subdir))
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. "
+)
+
+
+def make_text_pdf(path, pages=50):
+    """Write a synthetic text-heavy PDF with the given number of pages"""
+    import fitz
+
+    doc = fitz.open()
+    for page_number in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((72, 60), f"Section {page_number}", fontsize=16)
+        page.insert_textbox(fitz.Rect(72, 80, 540, 760), LOREM * 12, fontsize=10)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+
+def make_scanned_pdf(path, pages=10, dpi=300):
+    """Write a synthetic scan: each page is a noisy full-page image stored losslessly"""
+    import fitz
+    from io import BytesIO
+    from PIL import Image, ImageDraw
+
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    doc = fitz.open()
+    for page_number in range(1, pages + 1):
+        image = Image.new('L', (width, height), 245)
+        draw = ImageDraw.Draw(image)
+        for line, y in enumerate(range(dpi, height - dpi, dpi // 4)):
+            draw.text((dpi, y), f"{page_number}.{line} {LOREM[:90]}", fill=30)
+        # Sensor noise is what makes real scans expensive to store losslessly
+        image = Image.blend(image, Image.effect_noise((width, height), 24).convert('L'), 0.15)
+        buffered = BytesIO()
+        image.save(buffered, format='PNG')
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=buffered.getvalue())
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+
+def make_table_pdf(path, pages=50, rows=30, columns=6):
+    """Write a synthetic table-heavy PDF: one ruled grid of numbers per page"""
+    import fitz
+
+    doc = fitz.open()
+    left, top, width, row_height = 50, 80, 500, 20
+    column_width = width / columns
+    for page_number in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((left, 60), f"Ledger {page_number}", fontsize=14)
+        bottom = top + (rows + 1) * row_height
+        for row in range(rows + 2):
+            y = top + row * row_height
+            page.draw_line((left, y), (left + width, y), width=0.5)
+        for column in range(columns + 1):
+            x = left + column * column_width
+            page.draw_line((x, top), (x, bottom), width=0.5)
+        for column in range(columns):
+            page.insert_text((left + column * column_width + 4, top + 14), f"Column {column + 1}", fontsize=9)
+        for row in range(1, rows + 1):
+            y = top + row * row_height + 14
+            for column in range(columns):
+                value = (page_number * 7919 + row * 104729 + column * 1299709) % 100000 / 100
+                page.insert_text((left + column * column_width + 4, y), f"{value:.2f}", fontsize=9)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its reaped children, in MiB"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is reported in KiB on Linux and in bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(own / divisor, 1), round(children / divisor, 1)
+
+
+class StubModel:
+    """Stand-in for a remote model whose latency grows with the prompt size"""
+
+    def __init__(self, base_latency=0.05, seconds_per_char=2e-6, reply='stub answer'):
+        self.base_latency = base_latency
+        self.seconds_per_char = seconds_per_char
+        self.reply = reply
+        self.prompt_sizes = []
+
+    def generate_content(self, prompt):
+        import time
+        from types import SimpleNamespace
+
+        self.prompt_sizes.append(len(prompt))
+        time.sleep(self.base_latency + len(prompt) * self.seconds_per_char)
+        return SimpleNamespace(text=self.reply)
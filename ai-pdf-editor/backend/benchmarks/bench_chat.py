@@ -0,0 +1,75 @@
+"""Compare prompt size and latency of retrieval chat against sending the first 50k characters.
+
+The model is a local stub whose latency grows with the prompt, so no network
+access or API key is needed.
+
+    python benchmarks/bench_chat.py --pages 200 --questions 20
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import _common
+
+QUESTIONS = [
+    "What does section {n} say about labore et dolore?",
+    "Summarize the commodo consequat discussion in section {n}.",
+    "Which section mentions exercitation ullamco laboris {n}?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--top-k', type=int, default=6)
+    args = parser.parse_args()
+
+    # The AI client constructors need a key even though the stub replaces them
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    import pdf_processor
+    import ai_services
+
+    stub = _common.StubModel()
+    ai_services.ai_services.gemini_model = stub
+    questions = [QUESTIONS[i % len(QUESTIONS)].format(n=i * 7 % args.pages + 1) for i in range(args.questions)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = _common.make_text_pdf(os.path.join(tmp, 'report.pdf'), args.pages)
+
+        start = time.perf_counter()
+        ai_services.get_chunk_index(pdf_path)
+        index_seconds = time.perf_counter() - start
+
+        results = {}
+        for mode in ('truncate', 'retrieval'):
+            stub.prompt_sizes.clear()
+            timings = []
+            for question in questions:
+                start = time.perf_counter()
+                if mode == 'truncate':
+                    # The previous behaviour: whole text, cut at 50k characters
+                    text = pdf_processor.extract_text(pdf_path)[:50000]
+                    stub.generate_content(f"Based on the following document, answer this question: {question}\n\nDocument:\n{text}")
+                else:
+                    ai_services.chat_with_pdf(pdf_path, question, top_k=args.top_k)
+                timings.append((time.perf_counter() - start) * 1000)
+            results[mode] = {
+                'meanPromptChars': round(statistics.mean(stub.prompt_sizes)),
+                'meanLatencyMs': round(statistics.mean(timings), 2),
+                'p50LatencyMs': round(statistics.median(timings), 2)
+            }
+
+    print(json.dumps({
+        'pages': args.pages,
+        'questions': args.questions,
+        'indexBuildMs': round(index_seconds * 1000, 2),
+        'results': results
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
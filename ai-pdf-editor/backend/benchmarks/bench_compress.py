@@ -0,0 +1,69 @@
+"""Measure size reduction, wall time and peak RSS of each compress_pdf preset.
+
+Each preset runs in a fresh process so peak RSS is not shared between them.
+
+    python benchmarks/bench_compress.py --pages 10 --dpi 300
+    python benchmarks/bench_compress.py --pdf path/to/scan.pdf --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import _common
+
+
+def _run_preset(quality, pdf_path, output_dir, workers, results):
+    from compression import CompressionEngine
+
+    engine = CompressionEngine(max_workers=workers)
+    output_path = os.path.join(output_dir, f"{quality}.pdf")
+    start = time.perf_counter()
+    report = engine.compress(pdf_path, output_path, quality)
+    elapsed = time.perf_counter() - start
+
+    rss, children_rss = _common.peak_rss_mb()
+    actions = {}
+    for image in report['images']:
+        actions[image['action']] = actions.get(image['action'], 0) + 1
+    results.put({
+        'quality': quality,
+        'seconds': round(elapsed, 2),
+        'originalBytes': report['originalSize'],
+        'compressedBytes': report['compressedSize'],
+        'reductionPercent': round(report['savedBytes'] / report['originalSize'] * 100, 2),
+        'images': actions,
+        'fontsSubset': report['fontsSubset'],
+        'peakRssMb': rss,
+        'childPeakRssMb': children_rss
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf', help='PDF to compress (defaults to a synthetic scanned document)')
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--dpi', type=int, default=300, help='resolution of the synthetic scan')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--presets', default='low,medium,high')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or _common.make_scanned_pdf(os.path.join(tmp, 'scan.pdf'), args.pages, args.dpi)
+
+        ctx = multiprocessing.get_context('spawn')
+        report = []
+        for quality in args.presets.split(','):
+            results = ctx.Queue()
+            proc = ctx.Process(target=_run_preset, args=(quality, pdf_path, tmp, args.workers, results))
+            proc.start()
+            report.append(results.get())
+            proc.join()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
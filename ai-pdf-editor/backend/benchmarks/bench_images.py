@@ -0,0 +1,93 @@
+"""Measure wall time, peak RSS and output size of combining many photos into one PDF.
+
+Each worker count runs in a fresh process so peak RSS is not shared between them.
+JPEGs are embedded without re-encoding, so the PDF should be barely larger than
+the photos; a share of PNGs with transparency exercises the normalizing path.
+
+    python benchmarks/bench_images.py --images 150 --workers 1,4
+    python benchmarks/bench_images.py --images 100 --png-share 0.5 --page-size a4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import _common
+
+
+def make_photos(directory, count, png_share, size=(2448, 3264)):
+    """Write synthetic phone-camera scans: noisy JPEGs plus some PNGs with an alpha channel"""
+    from PIL import Image, ImageDraw
+
+    paths = []
+    png_every = round(1 / png_share) if png_share else 0
+    for i in range(count):
+        image = Image.new('RGB', size, (236, 232, 224))
+        draw = ImageDraw.Draw(image)
+        for line, y in enumerate(range(200, size[1] - 200, 60)):
+            draw.text((200, y), f"{i}.{line} {_common.LOREM[:80]}", fill=(40, 40, 40))
+        image = Image.blend(image, Image.effect_noise(size, 20).convert('RGB'), 0.1)
+        if png_every and i % png_every == 0:
+            path = os.path.join(directory, f"photo_{i:04d}.png")
+            image.putalpha(255)
+            image.save(path, format='PNG')
+        else:
+            path = os.path.join(directory, f"photo_{i:04d}.jpg")
+            image.save(path, format='JPEG', quality=85)
+        paths.append(path)
+    return paths
+
+
+def _run_convert(image_paths, output_path, workers, page_size, results):
+    import pdf_processor
+
+    processor = pdf_processor.PDFProcessor(render_workers=workers)
+    start = time.perf_counter()
+    output_path, report = processor.images_to_pdf(image_paths, output_path, page_size)
+    elapsed = time.perf_counter() - start
+
+    rss, children_rss = _common.peak_rss_mb()
+    results.put({
+        'workers': workers,
+        'images': report['images'],
+        'embedded': report['embedded'],
+        'normalized': report['normalized'],
+        'seconds': round(elapsed, 2),
+        'msPerImage': round(elapsed * 1000 / report['images'], 1),
+        'inputBytes': sum(os.path.getsize(path) for path in image_paths),
+        'outputBytes': os.path.getsize(output_path),
+        'peakRssMb': rss,
+        'childPeakRssMb': children_rss
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=150)
+    parser.add_argument('--png-share', type=float, default=0.1, help='fraction of photos saved as PNG with alpha')
+    parser.add_argument('--page-size', default=None, choices=['a4', 'letter', 'legal'])
+    parser.add_argument('--workers', default='1,4')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_paths = make_photos(tmp, args.images, args.png_share)
+
+        ctx = multiprocessing.get_context('spawn')
+        report = []
+        for workers in (int(w) for w in args.workers.split(',')):
+            output_path = os.path.join(tmp, f'photos-{workers}.pdf')
+            results = ctx.Queue()
+            proc = ctx.Process(target=_run_convert,
+                               args=(image_paths, output_path, workers, args.page_size, results))
+            proc.start()
+            report.append(results.get())
+            proc.join()
+            os.remove(output_path)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
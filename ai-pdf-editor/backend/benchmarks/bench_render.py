@@ -0,0 +1,75 @@
+"""Compare per-page latency and peak RSS of the page rendering engines.
+
+Each engine runs in a fresh process so peak RSS is not shared between them.
+
+    python benchmarks/bench_render.py --pages 30 --dpi 150 --format png
+    python benchmarks/bench_render.py --pdf path/to/file.pdf
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+import _common
+
+
+def _run_engine(engine_name, pdf_path, page_count, dpi, fmt, results):
+    import pdf_processor
+    from render_engines import RenderOptions, create_engine
+
+    engine = create_engine(engine_name, pdf_processor.DocumentCache())
+    options = RenderOptions(dpi, fmt)
+    timings = []
+    output_bytes = 0
+    for page_number in range(1, page_count + 1):
+        start = time.perf_counter()
+        output_bytes += len(engine.render(pdf_path, page_number, options))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    rss, children_rss = _common.peak_rss_mb()
+    results.put({
+        'engine': engine_name,
+        'pages': page_count,
+        'meanMs': round(statistics.mean(timings), 2),
+        'p50Ms': round(statistics.median(timings), 2),
+        'maxMs': round(max(timings), 2),
+        'outputBytes': output_bytes,
+        'peakRssMb': rss,
+        'childPeakRssMb': children_rss
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf', help='PDF to render (defaults to a synthetic text document)')
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--format', default='png', choices=['png', 'jpeg', 'webp'])
+    parser.add_argument('--engines', default='pymupdf,poppler')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or _common.make_text_pdf(os.path.join(tmp, 'bench.pdf'), args.pages)
+
+        import fitz
+        with fitz.open(pdf_path) as doc:
+            page_count = min(args.pages, doc.page_count)
+
+        ctx = multiprocessing.get_context('spawn')
+        report = []
+        for engine_name in args.engines.split(','):
+            results = ctx.Queue()
+            proc = ctx.Process(target=_run_engine,
+                               args=(engine_name, pdf_path, page_count, args.dpi, args.format, results))
+            proc.start()
+            report.append(results.get())
+            proc.join()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
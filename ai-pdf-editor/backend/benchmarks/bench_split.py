@@ -0,0 +1,69 @@
+"""Measure wall time and peak RSS of splitting a large PDF into single pages.
+
+Each worker count runs in a fresh process so peak RSS is not shared between them.
+
+    python benchmarks/bench_split.py --pages 2000 --workers 1,4
+    python benchmarks/bench_split.py --pdf path/to/file.pdf --mode every --every 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import _common
+
+
+def _run_split(pdf_path, output_dir, workers, mode, every, results):
+    import pdf_processor
+
+    processor = pdf_processor.PDFProcessor(render_workers=workers)
+    start = time.perf_counter()
+    parts = processor.split_pdf(pdf_path, output_dir=output_dir, mode=mode, every=every)
+    elapsed = time.perf_counter() - start
+
+    rss, children_rss = _common.peak_rss_mb()
+    results.put({
+        'workers': workers,
+        'mode': mode,
+        'parts': len(parts),
+        'seconds': round(elapsed, 2),
+        'msPerPart': round(elapsed * 1000 / len(parts), 3),
+        'outputBytes': sum(os.path.getsize(path) for path in parts),
+        'peakRssMb': rss,
+        'childPeakRssMb': children_rss
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf', help='PDF to split (defaults to a synthetic text document)')
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--mode', default='every', choices=['every', 'bookmarks'])
+    parser.add_argument('--every', type=int, default=1, help='pages per part in "every" mode')
+    parser.add_argument('--workers', default='1,4')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or _common.make_text_pdf(os.path.join(tmp, 'bench.pdf'), args.pages)
+
+        ctx = multiprocessing.get_context('spawn')
+        report = []
+        for workers in (int(w) for w in args.workers.split(',')):
+            output_dir = os.path.join(tmp, f'parts-{workers}')
+            os.makedirs(output_dir)
+            results = ctx.Queue()
+            proc = ctx.Process(target=_run_split,
+                               args=(pdf_path, output_dir, workers, args.mode, args.every, results))
+            proc.start()
+            report.append(results.get())
+            proc.join()
+            shutil.rmtree(output_dir)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
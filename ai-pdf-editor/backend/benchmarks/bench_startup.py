@@ -0,0 +1,99 @@
+"""Measure cold-start cost of the backend: import time, time to first request and baseline RSS.
+
+Each run starts a fresh interpreter in a scratch directory. With --budget the
+script exits non-zero when importing the app takes longer than the budget or
+pulls in a heavy backend eagerly, so it can gate CI.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --budget 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Modules that should only load when a request needs them
+HEAVY_MODULES = ('fitz', 'PIL.Image', 'numpy', 'pandas', 'pdfplumber', 'pdf2image', 'docx', 'img2pdf',
+                 'pytesseract', 'openai', 'google.generativeai', 'httpx')
+
+
+def _child(started_at):
+    import _common
+
+    begin = time.perf_counter()
+    import app
+    import_seconds = time.perf_counter() - begin
+    rss, _ = _common.peak_rss_mb()
+    # Lazy proxies are not registered in sys.modules, so anything listed here was really imported
+    eager = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    client = app.app.test_client()
+    response = client.get('/api/ai/cache/stats')
+    first_request = time.time() - started_at
+
+    pdf_path = _common.make_text_pdf(os.path.abspath('startup.pdf'), 2)
+    file_id = 'startup'
+    os.replace(pdf_path, app._upload_path(file_id, create=True))
+    begin = time.perf_counter()
+    render = client.get(f'/api/pdf/{file_id}/pages?page=1&raw=1')
+    first_render_seconds = time.perf_counter() - begin
+
+    app.job_manager.shutdown()
+    print(json.dumps({
+        'importSeconds': round(import_seconds, 3),
+        'firstRequestSeconds': round(first_request, 3),
+        'firstRequestStatus': response.status_code,
+        'firstRenderSeconds': round(first_render_seconds, 3),
+        'firstRenderStatus': render.status_code,
+        'baselineRssMb': rss,
+        'eagerModules': eager
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=None, help='maximum seconds allowed to import the app')
+    parser.add_argument('--child', type=float, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        _child(args.child)
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', str(time.time())],
+                cwd=tmp, capture_output=True, text=True, check=True
+            ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    report = {
+        'runs': len(runs),
+        'importSeconds': round(statistics.median(r['importSeconds'] for r in runs), 3),
+        'firstRequestSeconds': round(statistics.median(r['firstRequestSeconds'] for r in runs), 3),
+        'firstRenderSeconds': round(statistics.median(r['firstRenderSeconds'] for r in runs), 3),
+        'baselineRssMb': statistics.median(r['baselineRssMb'] for r in runs),
+        'eagerModules': sorted({name for r in runs for name in r['eagerModules']})
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.budget is not None:
+        failures = []
+        if report['importSeconds'] > args.budget:
+            failures.append(f"import took {report['importSeconds']}s, budget is {args.budget}s")
+        if report['eagerModules']:
+            failures.append(f"loaded at import time: {', '.join(report['eagerModules'])}")
+        for failure in failures:
+            print(f"FAIL: {failure}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
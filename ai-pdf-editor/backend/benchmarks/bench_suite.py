@@ -0,0 +1,295 @@
+"""Run every PDFProcessor operation against synthetic corpora and compare with a stored baseline.
+
+Corpora (text-heavy, scanned, table-heavy and a 1,000+ page document) are
+generated with fitz into --corpus-dir and reused while their parameters are
+unchanged. Each operation runs on a private copy of the corpus file in a
+fresh process, so sidecar indexes and caches from one run never warm the
+next and peak RSS is not shared. Wall time is the median over --repeat runs.
+
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_suite.py --baseline benchmarks/baseline.json --tolerance 0.15
+    python benchmarks/bench_suite.py --corpora text,large --ops render,split
+
+With --baseline the script exits non-zero when any operation is slower or
+uses more memory than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import _common
+
+CORPORA = {
+    'text': (_common.make_text_pdf, {'pages': 50}),
+    'scanned': (_common.make_scanned_pdf, {'pages': 10, 'dpi': 200}),
+    'tables': (_common.make_table_pdf, {'pages': 50}),
+    'large': (_common.make_text_pdf, {'pages': 1200})
+}
+
+# Pages rendered one by one by the 'render' operation; whole-document renders are 'images'
+RENDER_PAGES = 50
+
+
+def _output_bytes(paths):
+    if not paths:
+        return 0
+    if isinstance(paths, str):
+        paths = [paths]
+    return sum(os.path.getsize(path) for path in paths if path and os.path.exists(path))
+
+
+def _page_count(processor, pdf_path, output_dir, page_count):
+    processor.get_page_count(pdf_path)
+    return page_count, 0
+
+
+def _render(processor, pdf_path, output_dir, page_count):
+    pages = min(page_count, RENDER_PAGES)
+    output_bytes = 0
+    for page_number in range(1, pages + 1):
+        output_bytes += len(processor.render_page(pdf_path, page_number, dpi=150, fmt='png')[0])
+    return pages, output_bytes
+
+
+def _extract_text(processor, pdf_path, output_dir, page_count):
+    return page_count, len(processor.extract_text(pdf_path).encode('utf-8'))
+
+
+def _highlight(processor, pdf_path, output_dir, page_count):
+    output_path = os.path.join(output_dir, 'highlighted.pdf')
+    if not processor.highlight_text(pdf_path, output_path, 1, 'Lorem'):
+        raise RuntimeError("highlight_text failed")
+    # The whole document is rewritten, so that is the work being measured
+    return page_count, _output_bytes(output_path)
+
+
+def _merge(processor, pdf_path, output_dir, page_count):
+    output_path = os.path.join(output_dir, 'merged.pdf')
+    processor.merge_pdfs([pdf_path, pdf_path], output_path)
+    return page_count * 2, _output_bytes(output_path)
+
+
+def _split(processor, pdf_path, output_dir, page_count):
+    parts = processor.split_pdf(pdf_path, output_dir=output_dir, mode='every', every=10)
+    return page_count, _output_bytes(parts)
+
+
+def _compress(processor, pdf_path, output_dir, page_count):
+    output_path, report = processor.compress_pdf(pdf_path, 'medium', output_dir, with_report=True)
+    if report is None:
+        raise RuntimeError("compress_pdf failed")
+    return page_count, _output_bytes(output_path)
+
+
+def _docx(processor, pdf_path, output_dir, page_count):
+    output_path = processor.convert_to_docx(pdf_path, output_dir)
+    if output_path is None:
+        raise RuntimeError("convert_to_docx failed")
+    return page_count, _output_bytes(output_path)
+
+
+def _excel(processor, pdf_path, output_dir, page_count):
+    return page_count, _output_bytes(processor.convert_to_excel(pdf_path, output_dir))
+
+
+def _images(processor, pdf_path, output_dir, page_count):
+    output_path = processor.convert_to_images(pdf_path, dpi=100, fmt='jpeg', as_zip=True, output_dir=output_dir)
+    if output_path is None:
+        raise RuntimeError("convert_to_images failed")
+    return page_count, _output_bytes(output_path)
+
+
+OPERATIONS = {
+    'page_count': _page_count,
+    'render': _render,
+    'extract_text': _extract_text,
+    'highlight': _highlight,
+    'merge': _merge,
+    'split': _split,
+    'compress': _compress,
+    'docx': _docx,
+    'excel': _excel,
+    'images': _images
+}
+
+
+def build_corpus(corpus_dir, names):
+    """Generate missing corpus files; a manifest of parameters decides when one is stale"""
+    corpus_dir = os.path.abspath(corpus_dir)
+    os.makedirs(corpus_dir, exist_ok=True)
+    manifest_path = os.path.join(corpus_dir, 'manifest.json')
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    paths = {}
+    for name in names:
+        make, params = CORPORA[name]
+        path = os.path.join(corpus_dir, f"{name}.pdf")
+        if manifest.get(name) != params or not os.path.exists(path):
+            start = time.perf_counter()
+            make(path, **params)
+            print(f"Generated {name} corpus in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+            manifest[name] = params
+        paths[name] = path
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return paths
+
+
+def _run_operation(operation, corpus_path, work_dir, workers, results):
+    # Run from the scratch directory so the processor's temp and cache folders land there too
+    os.chdir(work_dir)
+    pdf_path = os.path.join(work_dir, os.path.basename(corpus_path))
+    shutil.copyfile(corpus_path, pdf_path)
+    output_dir = os.path.join(work_dir, 'out')
+    os.makedirs(output_dir)
+
+    try:
+        import fitz
+        import pdf_processor
+
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+        processor = pdf_processor.PDFProcessor(render_workers=workers)
+        start = time.perf_counter()
+        pages, output_bytes = OPERATIONS[operation](processor, pdf_path, output_dir, page_count)
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        results.put({'error': f"{type(e).__name__}: {e}"})
+        return
+
+    rss, children_rss = _common.peak_rss_mb()
+    results.put({
+        'seconds': elapsed,
+        'pages': pages,
+        'outputBytes': output_bytes,
+        'peakRssMb': rss,
+        'childPeakRssMb': children_rss
+    })
+
+
+def run_suite(corpus_paths, operations, repeat, workers):
+    ctx = multiprocessing.get_context('spawn')
+    report = {}
+    for corpus, corpus_path in corpus_paths.items():
+        for operation in operations:
+            runs = []
+            error = None
+            for _ in range(repeat):
+                with tempfile.TemporaryDirectory() as work_dir:
+                    results = ctx.Queue()
+                    proc = ctx.Process(target=_run_operation,
+                                       args=(operation, corpus_path, work_dir, workers, results))
+                    proc.start()
+                    result = results.get()
+                    proc.join()
+                if 'error' in result:
+                    error = result['error']
+                    break
+                runs.append(result)
+
+            key = f"{corpus}/{operation}"
+            if error:
+                report[key] = {'error': error}
+                print(f"{key}: {error}", file=sys.stderr)
+                continue
+            seconds = statistics.median(run['seconds'] for run in runs)
+            pages = runs[0]['pages']
+            report[key] = {
+                'seconds': round(seconds, 3),
+                'pages': pages,
+                'pagesPerSecond': round(pages / seconds, 2) if seconds else None,
+                'outputBytes': runs[0]['outputBytes'],
+                'peakRssMb': max(run['peakRssMb'] for run in runs),
+                'childPeakRssMb': max(run['childPeakRssMb'] for run in runs)
+            }
+            print(f"{key}: {report[key]['seconds']}s, {report[key]['pagesPerSecond']} pages/s, "
+                  f"{report[key]['peakRssMb']} MiB", file=sys.stderr)
+    return report
+
+
+def compare(results, baseline, tolerance):
+    """Return one message per operation that regressed in wall time or peak memory"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base or 'error' in base:
+            continue
+        if 'error' in result:
+            regressions.append(f"{key}: failed ({result['error']}), baseline passed")
+            continue
+        for metric in ('seconds', 'peakRssMb', 'childPeakRssMb'):
+            # Ignore noise on operations too quick or too small to measure reliably
+            if not base[metric] or (metric == 'seconds' and base[metric] < 0.05):
+                continue
+            change = result[metric] / base[metric] - 1
+            if change > tolerance:
+                regressions.append(f"{key}: {metric} {base[metric]} -> {result[metric]} (+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpora', default=','.join(CORPORA))
+    parser.add_argument('--ops', default=','.join(OPERATIONS))
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'pdf-bench-corpus'))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--save-baseline', help='write the results as a new baseline to this file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown or growth, as a fraction')
+    args = parser.parse_args()
+
+    corpora = args.corpora.split(',')
+    operations = args.ops.split(',')
+    unknown = [name for name in corpora if name not in CORPORA] + [op for op in operations if op not in OPERATIONS]
+    if unknown:
+        parser.error(f"unknown corpus or operation: {', '.join(unknown)}")
+
+    import fitz
+    corpus_paths = build_corpus(args.corpus_dir, corpora)
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'pymupdf': fitz.VersionBind,
+            'workers': args.workers
+        },
+        'results': run_suite(corpus_paths, operations, args.repeat, args.workers)
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report['results'], baseline['results'], args.tolerance)
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                f.write(output + '\n')
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Measure map-reduce summarization against a fake model that injects latency.
+
+Runs three passes over a synthetic document: sequential (one worker), concurrent,
+and a re-run after editing a single page, which should only recompute that
+page's chunk plus the reduce steps.
+
+    python benchmarks/bench_summarize.py --pages 300 --workers 8 --latency 0.2
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import _common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.2, help='fake model latency per call, in seconds')
+    parser.add_argument('--chunk-tokens', type=int, default=3000)
+    args = parser.parse_args()
+
+    import pdf_processor
+    from summarizer import MapReduceSummarizer
+
+    model = _common.StubModel(base_latency=args.latency, seconds_per_char=0, reply='partial summary ' * 20)
+
+    def complete(prompt):
+        return model.generate_content(prompt).text
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = _common.make_text_pdf(os.path.join(tmp, 'report.pdf'), args.pages)
+        pages = list(pdf_processor.iter_page_text(pdf_path))
+        report = {'pages': args.pages}
+
+        for label, workers in (('sequential', 1), ('concurrent', args.workers)):
+            summarizer = MapReduceSummarizer(complete, args.chunk_tokens, workers, namespace=label)
+            model.prompt_sizes.clear()
+            start = time.perf_counter()
+            summarizer.summarize(pages)
+            report[label] = {
+                'seconds': round(time.perf_counter() - start, 3),
+                'modelCalls': len(model.prompt_sizes)
+            }
+
+        # Same summarizer, one page changed: cached chunk summaries are reused
+        pages[len(pages) // 2] = (pages[len(pages) // 2][0], pages[len(pages) // 2][1] + ' amended clause')
+        model.prompt_sizes.clear()
+        start = time.perf_counter()
+        summarizer.summarize(pages)
+        report['afterSmallEdit'] = {
+            'seconds': round(time.perf_counter() - start, 3),
+            'modelCalls': len(model.prompt_sizes),
+            'cacheHits': summarizer.cache_hits
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Shared fixtures for the backend tests"""
+import io
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The backend modules import each other as top-level modules
+for _subdir in ('backend', 'backend/backend', 'backend/backend/backend'):
+    sys.path.insert(0, os.path.join(BACKEND_DIR, _subdir))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The Flask app, imported from a scratch directory since its folders are relative to the cwd"""
+    os.chdir(tmp_path_factory.mktemp('app'))
+    import app
+    app.app.config['TESTING'] = True
+    # send_file resolves the app's relative folders against root_path, which is the cwd in production
+    app.app.root_path = os.getcwd()
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def upload(app_module, client):
+    """Upload PDF bytes and return the new file id once its text index is built"""
+    def upload(data, filename='test.pdf'):
+        response = client.post('/api/upload', data={'file': (io.BytesIO(data), filename)},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200, response.get_json()
+        payload = response.get_json()
+        if payload['textIndexJobId']:
+            app_module.job_manager.wait(payload['textIndexJobId'])
+        return payload['fileId']
+    return upload
+
+
+def make_pdf(pages=3, text='Lorem ipsum dolor sit amet'):
+    """A small text PDF, one line of text per page"""
+    import fitz
+
+    doc = fitz.open()
+    for page_number in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"{text} {page_number}", fontsize=12)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def make_table_pdf(pages=2, rows=4, columns=3):
+    """A PDF with one ruled table per page"""
+    import fitz
+
+    doc = fitz.open()
+    left, top, column_width, row_height = 72, 100, 120, 20
+    for page_number in range(1, pages + 1):
+        page = doc.new_page()
+        bottom = top + (rows + 1) * row_height
+        for row in range(rows + 2):
+            page.draw_line((left, top + row * row_height), (left + columns * column_width, top + row * row_height))
+        for column in range(columns + 1):
+            page.draw_line((left + column * column_width, top), (left + column * column_width, bottom))
+        for column in range(columns):
+            page.insert_text((left + column * column_width + 4, top + 14), f"Column {column + 1}", fontsize=9)
+        for row in range(1, rows + 1):
+            for column in range(columns):
+                page.insert_text((left + column * column_width + 4, top + row * row_height + 14),
+                                 f"{page_number}.{row}.{column}", fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
@@ -0,0 +1,93 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import make_pdf
+
+
+def test_chunk_index_is_built_once_under_concurrent_requests(app_module, tmp_path, monkeypatch):
+    ai_services = app_module.ai_services
+    retrieval = ai_services.ChunkIndex
+    pdf_path = tmp_path / 'doc.pdf'
+    pdf_path.write_bytes(make_pdf(pages=3, text='Quarterly revenue'))
+
+    builds = []
+    build = retrieval.build.__func__
+
+    def counting_build(cls, *args, **kwargs):
+        builds.append(threading.get_ident())
+        return build(cls, *args, **kwargs)
+    monkeypatch.setattr(retrieval, 'build', classmethod(counting_build))
+
+    barrier = threading.Barrier(4)
+    indexes = []
+
+    def ask():
+        barrier.wait()
+        indexes.append(ai_services.ai_services.get_chunk_index(str(pdf_path)))
+    threads = [threading.Thread(target=ask) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert len(indexes) == 4
+    assert indexes[0].search('revenue', 3)
+
+
+class FakeGemini:
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(text=f'gemini answer {len(self.prompts)}')
+
+
+class FakeOpenAI:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, max_tokens):
+        self.prompts.append(messages[-1]['content'])
+        if self.fail:
+            raise ConnectionError('OpenAI is down')
+        message = SimpleNamespace(content=f'openai answer {len(self.prompts)}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def services(app_module, monkeypatch):
+    services = app_module.ai_services.ai_services
+    services.response_cache.clear()
+    monkeypatch.setattr(services, '_gemini_model', FakeGemini())
+    monkeypatch.setattr(services, '_openai_client', FakeOpenAI())
+    return services
+
+
+def test_cached_response_skips_the_model(services):
+    first = services.grammar_check('teh text')
+    second = services.grammar_check('teh text')
+
+    assert first == second == 'gemini answer 1'
+    assert len(services.gemini_model.prompts) == 1
+    assert services.response_cache.stats()['hits'] >= 1
+
+
+def test_fallback_summary_is_not_cached_under_the_primary_model(services, monkeypatch):
+    monkeypatch.setattr(services, '_openai_client', FakeOpenAI(fail=True))
+    assert services._cached_summary('Summarize this') == 'gemini answer 1'
+
+    cache = services.response_cache
+    assert cache.get(cache.make_key('summarize', 'gpt-3.5-turbo', 'Summarize this'), record=False) is None
+    assert cache.get(cache.make_key('summarize', 'gemini-pro', 'Summarize this'), record=False) == 'gemini answer 1'
+
+    # Once OpenAI recovers it answers again instead of the cached fallback
+    monkeypatch.setattr(services, '_openai_client', FakeOpenAI())
+    assert services._cached_summary('Summarize this') == 'openai answer 1'
+    assert services._cached_summary('Summarize this') == 'openai answer 1'
+    assert len(services.openai_client.prompts) == 1
@@ -0,0 +1,54 @@
+import io
+import os
+
+import fitz
+import pytest
+from PIL import Image
+
+from compression import CompressionEngine
+
+
+def _noise_png(size):
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (size, size), os.urandom(size * size * 3)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def image_pdf(tmp_path):
+    """Three distinct 600px images, each shown two inches wide (300 DPI)"""
+    path = str(tmp_path / 'images.pdf')
+    with fitz.open() as doc:
+        for _ in range(3):
+            doc.new_page().insert_image(fitz.Rect(72, 72, 216, 216), stream=_noise_png(600))
+        doc.save(path)
+    return path
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_images_are_downsampled_and_reencoded(image_pdf, tmp_path, max_workers):
+    output_path = str(tmp_path / 'out.pdf')
+    engine = CompressionEngine(max_workers=max_workers, batch_size=1)
+    report = engine.compress(image_pdf, output_path, 'high')
+
+    assert [image['action'] for image in report['images']] == ['recompressed'] * 3
+    assert report['compressedSize'] < report['originalSize']
+    with fitz.open(output_path) as doc:
+        for page in doc:
+            # replace_image leaves a second resource name, pointing at the same stream once saved
+            images = {(xref, width, height) for xref, _, width, height, *_ in page.get_images(full=True)}
+            assert len(images) == 1
+            xref, width, height = images.pop()
+            # 'high' targets 96 DPI over two inches
+            assert (width, height) == (192, 192)
+            assert doc.xref_get_key(xref, 'Filter')[1] == '/DCTDecode'
+
+
+def test_compress_route_reports_savings(client, upload, image_pdf):
+    with open(image_pdf, 'rb') as f:
+        file_id = upload(f.read())
+    response = client.post(f'/api/pdf/{file_id}/compress', json={'quality': 'medium'})
+    assert response.status_code == 200, response.get_json()
+    payload = response.get_json()
+    assert payload['reductionPercent'] > 0
+    assert payload['report']['targetDpi'] == 150
@@ -0,0 +1,78 @@
+import csv
+import io
+
+import pytest
+
+from conftest import make_pdf, make_table_pdf
+
+
+def _download(client, payload):
+    response = client.get(payload['downloadUrl'])
+    assert response.status_code == 200
+    return response.data
+
+
+def test_convert_csv(client, upload):
+    file_id = upload(make_table_pdf(pages=2))
+    response = client.post(f'/api/pdf/{file_id}/convert', json={'format': 'csv'})
+    assert response.status_code == 200, response.get_json()
+    files = response.get_json()['files']
+    assert files and all(f['name'].endswith('.csv') for f in files)
+
+    rows = list(csv.reader(io.StringIO(_download(client, files[0]).decode('utf-8-sig'))))
+    assert any('1.1.0' in row for row in rows)
+
+
+def test_convert_parquet(client, upload):
+    pq = pytest.importorskip('pyarrow.parquet')
+    file_id = upload(make_table_pdf(pages=2))
+    response = client.post(f'/api/pdf/{file_id}/convert', json={'format': 'parquet'})
+    assert response.status_code == 200, response.get_json()
+    files = response.get_json()['files']
+    assert files and all(f['name'].endswith('.parquet') for f in files)
+
+    table = pq.read_table(io.BytesIO(_download(client, files[0])))
+    assert table.num_rows >= 4
+
+
+def test_convert_unsupported_format(client, upload):
+    file_id = upload(make_table_pdf(pages=1))
+    response = client.post(f'/api/pdf/{file_id}/convert', json={'format': 'odt'})
+    assert response.status_code == 400
+
+
+def test_convert_docx_keeps_each_page_table(client, upload):
+    docx = pytest.importorskip('docx')
+    file_id = upload(make_table_pdf(pages=2))
+    response = client.post(f'/api/pdf/{file_id}/convert', json={'format': 'docx'})
+    assert response.status_code == 200, response.get_json()
+
+    document = docx.Document(io.BytesIO(_download(client, response.get_json())))
+    assert len(document.tables) == 2
+    assert [table.rows[1].cells[0].text for table in document.tables] == ['1.1.0', '2.1.0']
+
+
+def test_docx_layouts_arrive_in_page_order_from_workers(tmp_path):
+    from docx_export import iter_page_layouts
+
+    pdf_path = tmp_path / 'doc.pdf'
+    pdf_path.write_bytes(make_pdf(pages=5, text='Paragraph on page'))
+    layouts = list(iter_page_layouts(str(pdf_path), 5, str(tmp_path), max_workers=2, batch_size=1))
+
+    assert [page for page, _ in layouts] == [1, 2, 3, 4, 5]
+    for page, elements in layouts:
+        assert [run['text'] for run in elements[0]['runs']] == [f'Paragraph on page {page}']
+
+
+def test_wrapped_lines_join_into_one_paragraph():
+    from docx_export import _block_runs
+
+    def span(text, flags=0):
+        return {'text': text, 'font': 'Helvetica', 'size': 11, 'flags': flags, 'color': 0}
+    block = {'lines': [
+        {'spans': [span('A hyphen-')]},
+        {'spans': [span('ated line and '), span('bold', flags=16)]},
+        {'spans': [span('text')]},
+    ]}
+
+    assert [run['text'] for run in _block_runs(block)] == ['A hyphenated line and ', 'bold ', 'text']
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from conftest import make_pdf
+
+
+@pytest.fixture
+def cache(app_module):
+    cache = app_module.pdf_processor.DocumentCache(max_entries=2)
+    yield cache
+    cache.clear()
+
+
+def _write(path, pages):
+    path.write_bytes(make_pdf(pages=pages))
+    return str(path)
+
+
+def test_documents_are_parsed_once(cache, tmp_path):
+    pdf_path = _write(tmp_path / 'doc.pdf', 3)
+
+    assert cache.page_count(pdf_path) == 3
+    with cache.document(pdf_path) as doc:
+        assert doc.page_count == 3
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_rewritten_files_are_reparsed(cache, tmp_path):
+    pdf_path = _write(tmp_path / 'doc.pdf', 3)
+    assert cache.page_count(pdf_path) == 3
+
+    _write(tmp_path / 'doc.pdf', 5)
+    stat = os.stat(pdf_path)
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert cache.page_count(pdf_path) == 5
+    assert cache.stats()['misses'] == 2
+
+
+def test_least_recently_used_documents_are_evicted(cache, tmp_path):
+    paths = [_write(tmp_path / f'doc{i}.pdf', i + 1) for i in range(3)]
+    for path in paths:
+        cache.page_count(path)
+    cache.page_count(paths[2])
+
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['hits'] == 1
+    cache.page_count(paths[0])
+    assert cache.stats()['misses'] == 4
+
+
+def test_checkout_hands_over_the_cached_document(cache, tmp_path):
+    pdf_path = _write(tmp_path / 'doc.pdf', 2)
+    cache.page_count(pdf_path)
+
+    doc = cache.checkout(pdf_path)
+    try:
+        assert doc.page_count == 2
+        assert cache.stats()['entries'] == 0
+    finally:
+        doc.close()
@@ -0,0 +1,52 @@
+import io
+import zipfile
+
+from conftest import make_pdf
+from downloads import iter_zip
+
+
+def _split(client, upload):
+    file_id = upload(make_pdf(pages=4))
+    response = client.post(f'/api/pdf/{file_id}/edit', json={'operation': 'split', 'pages': ['1-2', '3-4']})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_download_supports_ranges_and_etags(client, upload):
+    file = _split(client, upload)['files'][0]
+    full = client.get(file['downloadUrl'])
+    assert full.status_code == 200
+    assert len(full.data) == file['size']
+    etag = full.headers['ETag']
+
+    partial = client.get(file['downloadUrl'], headers={'Range': 'bytes=0-9'})
+    assert partial.status_code == 206
+    assert partial.data == full.data[:10]
+
+    assert client.get(file['downloadUrl'], headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_bundle_streams_every_part(client, upload):
+    payload = _split(client, upload)
+    response = client.get(payload['zipUrl'])
+    assert response.status_code == 200
+    assert response.is_streamed
+
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert sorted(archive.namelist()) == sorted(file['name'] for file in payload['files'])
+    for file in payload['files']:
+        assert archive.read(file['name']) == client.get(file['downloadUrl']).data
+
+
+def test_iter_zip_emits_members_as_they_are_read(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f'{i}.bin'
+        path.write_bytes(bytes([i]) * 10000)
+        paths.append((path.name, str(path)))
+
+    chunks = [chunk for chunk in iter_zip(paths, chunk_size=4096) if chunk]
+    assert len(chunks) > len(paths)
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.read('2.bin') == b'\x02' * 10000
@@ -0,0 +1,56 @@
+import fitz
+import pytest
+
+from conftest import make_pdf
+
+
+def _edited_annotations(client, payload):
+    response = client.get(payload['downloadUrl'])
+    assert response.status_code == 200
+    with fitz.open(stream=response.data, filetype='pdf') as doc:
+        return {page.number + 1: [annot.type[1] for annot in page.annots()] for page in doc}
+
+
+def test_batch_highlight_all(client, upload):
+    file_id = upload(make_pdf(pages=4, text='Quarterly revenue'))
+    response = client.post(f'/api/pdf/{file_id}/edit/batch', json={'operations': [
+        {'operation': 'highlight_all', 'text': 'revenue', 'color': '#00ff00'}
+    ]})
+    assert response.status_code == 200, response.get_json()
+    payload = response.get_json()
+    assert payload['success'] is True
+    assert payload['incremental'] is True
+
+    annotations = _edited_annotations(client, payload)
+    assert annotations == {page: ['Highlight'] for page in range(1, 5)}
+
+
+def test_batch_rejects_unknown_operation(client, upload):
+    file_id = upload(make_pdf(pages=1))
+    response = client.post(f'/api/pdf/{file_id}/edit/batch', json={'operations': [{'operation': 'rotate'}]})
+    assert response.status_code == 400
+
+
+def test_edit_versions_record_incremental_saves(client, upload):
+    file_id = upload(make_pdf(pages=2))
+    for page in (1, 2):
+        response = client.post(f'/api/pdf/{file_id}/edit', json={'operation': 'add_text', 'text': 'Note', 'page': page})
+        assert response.status_code == 200, response.get_json()
+
+    versions = client.get(f'/api/pdf/{file_id}/edit/versions').get_json()['versions']
+    assert [version['incremental'] for version in versions] == [False, True, True]
+
+
+def test_edit_accepts_numeric_strings(client, upload):
+    file_id = upload(make_pdf(pages=2))
+    response = client.post(f'/api/pdf/{file_id}/edit', json={'operation': 'add_text', 'text': 'Note',
+                                                             'page': '2', 'x': '72', 'y': None})
+    assert response.status_code == 200, response.get_json()
+
+
+@pytest.mark.parametrize('fields', [{'page': 'two'}, {'page': 1.5}, {'page': 9}, {'x': 'left'},
+                                    {'y': [1]}, {'x': True}, {'x': 'nan'}])
+def test_edit_rejects_invalid_positions(client, upload, fields):
+    file_id = upload(make_pdf(pages=2))
+    response = client.post(f'/api/pdf/{file_id}/edit', json=dict({'operation': 'add_text', 'text': 'Note'}, **fields))
+    assert response.status_code == 400, response.get_json()
@@ -0,0 +1,37 @@
+import io
+
+
+def _png(color):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _upload_images(upload, count):
+    return [upload(_png((40 * i, 80, 120)), filename=f'image_{i}.png') for i in range(count)]
+
+
+def test_images_to_pdf(client, upload):
+    file_ids = _upload_images(upload, 3)
+    response = client.post('/api/images/to-pdf', json={'fileIds': file_ids, 'pageSize': 'a4'})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['pageCount'] == 3
+
+
+def test_images_to_pdf_as_queued_job(app_module, client, upload):
+    file_ids = _upload_images(upload, 2)
+    response = client.post('/api/jobs', json={'operation': 'images_to_pdf', 'fileIds': file_ids})
+    assert response.status_code == 202, response.get_json()
+
+    job = app_module.job_manager.wait(response.get_json()['jobId'])
+    assert job['status'] == 'succeeded', job
+    assert job['result']['pageCount'] == 2
+
+
+def test_images_to_pdf_job_rejects_missing_images(client, upload):
+    file_ids = _upload_images(upload, 1)
+    response = client.post('/api/jobs', json={'operation': 'images_to_pdf', 'fileIds': file_ids + ['missing']})
+    assert response.status_code == 404
+    assert response.get_json()['fileIds'] == ['missing']
@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+from jobs import JobManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = JobManager(str(tmp_path / 'jobs.db'), lanes={'bulk': 2})
+    yield manager
+    manager.shutdown()
+
+
+def test_limited_operation_does_not_hold_lane_threads(manager):
+    release = threading.Event()
+    manager.register('merge', lambda params, progress: release.wait(5), 'bulk', 1)
+    manager.register('index', lambda params, progress: {'indexed': params['fileId']}, 'bulk', 2)
+
+    first = manager.submit('merge', {})
+    second = manager.submit('merge', {})
+    index = manager.submit('index', {'fileId': 'a'})
+    try:
+        # The second merge waits for the first, leaving the other thread to the index job
+        assert manager.wait(index, 5)['status'] == 'succeeded'
+        assert manager.get(second)['status'] == 'queued'
+        assert manager.queue_depth() == {'bulk': 2}
+    finally:
+        release.set()
+    assert manager.wait(first, 5)['status'] == 'succeeded'
+    assert manager.wait(second, 5)['status'] == 'succeeded'
+    assert manager.queue_depth() == {'bulk': 0}
+
+
+
+def test_failed_job_records_its_error_type(manager):
+    def fail(params, progress):
+        raise ValueError('Page range 9-12 is outside 1-6')
+
+    manager.register('split', fail, 'bulk', 2)
+    job = manager.wait(manager.submit('split', {}), 5)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Page range 9-12 is outside 1-6'
+    assert job['errorType'] == 'ValueError'
@@ -0,0 +1,58 @@
+import fitz
+
+import pdf_processor
+
+
+def test_merge_keeps_pages_and_outlines_across_batches(tmp_path):
+    paths = []
+    for i in range(5):
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), f"Document {i}")
+        doc.set_toc([[1, f"Document {i}", 1]])
+        doc.save(tmp_path / f"in{i}.pdf")
+        doc.close()
+        paths.append(str(tmp_path / f"in{i}.pdf"))
+
+    output_path = str(tmp_path / 'merged.pdf')
+    assert pdf_processor.merge_pdfs(paths, output_path, batch_size=2)
+    with fitz.open(output_path) as merged:
+        assert merged.page_count == 5
+        assert merged.get_toc() == [[1, f"Document {i}", i + 1] for i in range(5)]
+
+
+def _image_pdf(path, color, text):
+    from io import BytesIO
+    from PIL import Image
+
+    buffered = BytesIO()
+    Image.new('RGB', (64, 64), color).save(buffered, format='PNG')
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(fitz.Rect(72, 72, 272, 272), stream=buffered.getvalue())
+    page.insert_text((72, 300), text)
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def _image_xrefs(doc):
+    return [xref for xref in range(1, doc.xref_length()) if doc.xref_get_key(xref, 'Subtype')[1] == '/Image']
+
+
+def test_merge_stores_identical_images_once(tmp_path):
+    paths = [
+        _image_pdf(tmp_path / 'a.pdf', (200, 30, 30), 'First'),
+        _image_pdf(tmp_path / 'b.pdf', (200, 30, 30), 'Second'),
+        _image_pdf(tmp_path / 'c.pdf', (30, 30, 200), 'Third'),
+        _image_pdf(tmp_path / 'd.pdf', (200, 30, 30), 'Fourth')
+    ]
+    output_path = str(tmp_path / 'merged.pdf')
+    # A batch flush in the middle must not lose track of images already merged
+    assert pdf_processor.merge_pdfs(paths, output_path, batch_size=2)
+
+    with fitz.open(output_path) as merged:
+        assert merged.page_count == 4
+        assert len(_image_xrefs(merged)) == 2
+        page_images = [[item[0] for item in page.get_images(full=True)] for page in merged]
+        assert page_images[0] == page_images[1] == page_images[3] != page_images[2]
+        assert [page.get_text().strip() for page in merged] == ['First', 'Second', 'Third', 'Fourth']
@@ -0,0 +1,36 @@
+import threading
+import time
+
+import metrics
+from conftest import make_pdf
+
+
+def _job_work():
+    time.sleep(0.1)
+
+
+def test_carried_context_profiles_and_times_other_threads():
+    profiler = metrics.SamplingProfiler(interval=0.001).start()
+    metrics.begin_request(profiler)
+    attached = metrics.carry()
+
+    def work():
+        with attached(), metrics.timed('test', 'work'):
+            _job_work()
+
+    worker = threading.Thread(target=work, name='job-worker')
+    worker.start()
+    worker.join()
+
+    assert [stage for stage, _ in metrics.end_request()] == ['work']
+    assert metrics.carry() is None
+    folded = profiler.stop().folded()
+    assert any(line.startswith('job-worker;') and '_job_work' in line for line in folded.splitlines())
+
+
+def test_server_timing_includes_job_stages(client, upload):
+    file_id = upload(make_pdf(pages=2))
+    response = client.post(f'/api/pdf/{file_id}/compress', json={})
+    assert response.status_code == 200, response.get_json()
+    stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert 'save' in stages and stages[-1] == 'total'
@@ -0,0 +1,23 @@
+import fitz
+
+import ocr
+
+
+def _blank_pdf(pages=2):
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_ocr_fails_when_every_page_fails(client, upload, monkeypatch):
+    def image_to_data(*args, **kwargs):
+        raise OSError('tesseract is not installed or it is not in your PATH')
+
+    monkeypatch.setattr(ocr.pytesseract, 'image_to_data', image_to_data)
+    file_id = upload(_blank_pdf())
+    response = client.post(f'/api/pdf/{file_id}/ocr', json={})
+    assert response.status_code == 500
+    assert 'tesseract is not installed' in response.get_json()['error']
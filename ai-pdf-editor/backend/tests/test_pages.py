@@ -0,0 +1,44 @@
+from conftest import make_pdf
+
+
+def _count_renders(app_module, monkeypatch):
+    processor = app_module.pdf_processor.pdf_processor
+    renders = []
+    render = processor._render
+
+    def counting_render(*args):
+        renders.append(args[1])
+        return render(*args)
+    monkeypatch.setattr(processor, '_render', counting_render)
+    return renders
+
+
+def test_repeated_etag_is_answered_without_rendering(app_module, client, upload, monkeypatch):
+    file_id = upload(make_pdf(pages=2))
+    url = f'/api/pdf/{file_id}/pages?page=2&raw=1&dpi=72'
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers['ETag'] and first.mimetype == 'image/png'
+
+    def no_render(*args, **kwargs):
+        raise AssertionError('a revalidated page was rendered')
+    monkeypatch.setattr(app_module.pdf_processor, 'render_page', no_render)
+    repeat = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert repeat.status_code == 304
+    assert repeat.headers['ETag'] == first.headers['ETag']
+    assert repeat.data == b''
+
+
+def test_page_cache_serves_repeat_renders(app_module, client, upload, monkeypatch):
+    file_id = upload(make_pdf(pages=2))
+    renders = _count_renders(app_module, monkeypatch)
+    url = f'/api/pdf/{file_id}/pages?page=1&raw=1&dpi=72'
+
+    first = client.get(url)
+    second = client.get(url)
+    other_dpi = client.get(f'/api/pdf/{file_id}/pages?page=1&raw=1&dpi=96')
+
+    assert second.data == first.data
+    assert other_dpi.headers['ETag'] != first.headers['ETag']
+    assert renders == [1, 1]
@@ -0,0 +1,62 @@
+import io
+
+import pytest
+from PIL import Image
+
+from conftest import make_pdf
+from render_engines import PyMuPDFEngine, RenderOptions
+
+
+@pytest.fixture
+def engine(app_module):
+    return PyMuPDFEngine(app_module.pdf_processor.pdf_processor.doc_cache)
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(make_pdf(pages=2))
+    return str(path)
+
+
+def _image(data):
+    return Image.open(io.BytesIO(data))
+
+
+@pytest.mark.parametrize('fmt, pil_format', [('png', 'PNG'), ('jpeg', 'JPEG'), ('webp', 'WEBP')])
+def test_formats(engine, pdf_path, fmt, pil_format):
+    image = _image(engine.render(pdf_path, 2, RenderOptions(dpi=72, fmt=fmt)))
+    assert image.format == pil_format
+    # make_pdf pages are A4, 595 x 842 points
+    assert image.size == (595, 842)
+
+
+def test_gray_clip_at_double_resolution(engine, pdf_path):
+    image = _image(engine.render(pdf_path, 1, RenderOptions(dpi=144, colorspace='gray', clip=(0, 0, 100, 50))))
+    assert image.mode == 'L'
+    assert image.size == (200, 100)
+
+
+def test_clip_outside_the_page_is_rejected(engine, pdf_path):
+    with pytest.raises(ValueError, match='does not intersect'):
+        engine.render(pdf_path, 1, RenderOptions(clip=(1000, 1000, 1100, 1100)))
+
+
+def test_failed_render_falls_back(app_module, pdf_path, monkeypatch):
+    processor = app_module.pdf_processor.pdf_processor
+
+    class Broken:
+        name = 'broken'
+
+        def render(self, pdf_path, page_number, options):
+            raise RuntimeError('engine crashed')
+
+    class Fallback:
+        name = 'fallback'
+
+        def render(self, pdf_path, page_number, options):
+            return b'fallback image'
+
+    monkeypatch.setattr(processor, 'render_engine', Broken())
+    monkeypatch.setattr(processor, 'fallback_engine', Fallback())
+    assert processor._render(pdf_path, 1, RenderOptions()) == b'fallback image'
@@ -0,0 +1,42 @@
+from retrieval import ChunkIndex, chunk_pages
+
+PAGES = [
+    (1, 'The annual report covers revenue, costs and the outlook for the coming year.'),
+    (2, 'Revenue grew twelve percent, driven by subscriptions in Europe.'),
+    (3, 'Headcount stayed flat while office costs fell after the move.'),
+]
+
+
+def test_search_ranks_the_matching_page_first(tmp_path):
+    pdf_path = tmp_path / 'doc.pdf'
+    pdf_path.write_bytes(b'%PDF-1.7')
+    index = ChunkIndex.build(str(pdf_path), PAGES)
+
+    hits = index.search('How much did revenue grow in Europe?', top_k=2)
+    assert [hit['page'] for hit in hits] == [2, 1]
+    assert hits[0]['score'] > hits[1]['score']
+    assert index.search('unrelated words only') == []
+    assert [chunk['page'] for chunk in index.leading_chunks(2)] == [1, 2]
+
+
+def test_index_is_persisted_until_the_pdf_changes(tmp_path):
+    pdf_path = tmp_path / 'doc.pdf'
+    pdf_path.write_bytes(b'%PDF-1.7')
+    ChunkIndex.build(str(pdf_path), PAGES)
+
+    loaded = ChunkIndex.load(str(pdf_path))
+    assert loaded.search('office costs')[0]['page'] == 3
+
+    pdf_path.write_bytes(b'%PDF-1.7 changed')
+    assert not loaded.is_current()
+    assert ChunkIndex.load(str(pdf_path)) is None
+
+
+def test_chunks_overlap_but_never_span_pages():
+    text = ' '.join(f'word{i}' for i in range(400))
+    chunks = list(chunk_pages([(1, text), (2, 'short page')], chunk_chars=500, overlap=100))
+
+    assert [page for page, _ in chunks].count(2) == 1
+    first, second = chunks[0][1], chunks[1][1]
+    assert len(first) <= 500
+    assert second[:100] == first[-100:]
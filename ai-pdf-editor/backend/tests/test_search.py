@@ -0,0 +1,29 @@
+import pytest
+
+from conftest import make_pdf
+from search_index import SearchIndex
+
+
+@pytest.mark.parametrize('query', [r'(a+)+$', r'(\w+\s?)*x', r'(?:a|b*)+c', r'((ab)*)+', r'(x{1,5}){2,}'])
+def test_compile_rejects_nested_quantifiers(query):
+    with pytest.raises(ValueError, match='Nested quantifiers'):
+        SearchIndex.compile(query, regex=True)
+
+
+@pytest.mark.parametrize('query', [r'rev\w+', r'(ab?)+', r'(\d{4})+', r'(?:foo|bar)+', r'a+b*c?'])
+def test_compile_accepts_linear_patterns(query):
+    assert SearchIndex.compile(query, regex=True).pattern == query
+
+
+def test_phrase_is_not_parsed_as_regex():
+    assert SearchIndex.compile('(a+)+').pattern == r'\(a\+\)\+'
+
+
+def test_search_route(client, upload):
+    file_id = upload(make_pdf(pages=3, text='Quarterly revenue'))
+    response = client.get(f'/api/pdf/{file_id}/search', query_string={'q': 'revenue 2'})
+    assert response.status_code == 200
+    assert [hit['page'] for hit in response.get_json()['hits']] == [2]
+
+    response = client.get(f'/api/pdf/{file_id}/search', query_string={'q': '(e+)+$', 'regex': 'true'})
+    assert response.status_code == 400
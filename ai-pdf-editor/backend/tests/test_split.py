@@ -0,0 +1,82 @@
+import io
+import os
+
+import fitz
+import pytest
+from PIL import Image
+
+from conftest import make_pdf
+
+
+def test_split_ranges(client, upload):
+    file_id = upload(make_pdf(pages=6))
+    response = client.post(f'/api/pdf/{file_id}/edit', json={'operation': 'split', 'pages': ['1-2', '3-6']})
+    assert response.status_code == 200, response.get_json()
+    assert len(response.get_json()['files']) == 2
+
+
+def test_split_range_outside_document_is_a_client_error(client, upload):
+    file_id = upload(make_pdf(pages=6))
+    response = client.post(f'/api/pdf/{file_id}/edit', json={'operation': 'split', 'pages': ['9-12']})
+    assert response.status_code == 400
+    assert 'outside' in response.get_json()['error']
+
+
+def _noise_png(size):
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (size, size), os.urandom(size * size * 3)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _image_pdf(path, pages=6, shared=True):
+    """Pages each showing an image, the same one when shared, with a level-1 bookmark every two pages"""
+    with fitz.open() as doc:
+        xref = 0
+        for number in range(1, pages + 1):
+            page = doc.new_page()
+            rect = fitz.Rect(72, 72, 144, 144)
+            if shared and xref:
+                page.insert_image(rect, xref=xref)
+            else:
+                xref = page.insert_image(rect, stream=_noise_png(100))
+            page.insert_text((72, 200), f'Section page {number}')
+        doc.set_toc([[1, f'Chapter {i}', i * 2 - 1] for i in range(1, pages // 2 + 1)])
+        doc.save(str(path))
+    return str(path)
+
+
+def _image_streams(path):
+    with fitz.open(path) as doc:
+        return sum(1 for xref in range(1, doc.xref_length()) if doc.xref_get_key(xref, 'Subtype')[1] == '/Image')
+
+
+@pytest.mark.parametrize('options, expected', [
+    ({'mode': 'every', 'every': 4}, [4, 2]),
+    ({'mode': 'bookmarks'}, [2, 2, 2]),
+    ({'mode': 'ranges', 'pages': ['1', '2-6']}, [1, 5]),
+])
+def test_split_modes_share_resources_within_a_part(app_module, tmp_path, options, expected):
+    pdf_path = _image_pdf(tmp_path / 'shared.pdf')
+    parts = app_module.pdf_processor.split_pdf(pdf_path, output_dir=str(tmp_path), **options)
+
+    page_counts = []
+    for part in parts:
+        with fitz.open(part) as doc:
+            page_counts.append(doc.page_count)
+        # The image every page shows is written once per part, not once per page
+        assert _image_streams(part) == 1
+    assert page_counts == expected
+
+
+def test_split_by_size_packs_pages_under_the_target(app_module, tmp_path):
+    pdf_path = _image_pdf(tmp_path / 'distinct.pdf', pages=8, shared=False)
+    # Each page carries a ~30 KB image, so about two pages fit in a part
+    parts = app_module.pdf_processor.split_pdf(pdf_path, output_dir=str(tmp_path), mode='size', max_bytes=70000)
+
+    page_counts = []
+    for part in parts:
+        with fitz.open(part) as doc:
+            page_counts.append(doc.page_count)
+        assert os.path.getsize(part) < 70000 * 1.25
+    assert sum(page_counts) == 8
+    assert max(page_counts) == 2
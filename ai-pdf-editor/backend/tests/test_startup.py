@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+from bench_startup import HEAVY_MODULES  # noqa: E402
+
+# Seconds; generous next to the ~0.25s a warm machine takes, so only a regression trips it
+IMPORT_BUDGET = float(os.getenv('STARTUP_IMPORT_BUDGET', 2.0))
+
+CHILD = '''
+import json, os, sys, time
+for subdir in ('backend', 'backend/backend', 'backend/backend/backend'):
+    sys.path.insert(0, os.path.join(sys.argv[1], subdir))
+begin = time.perf_counter()
+import app
+seconds = time.perf_counter() - begin
+app.job_manager.shutdown()
+print(json.dumps({'importSeconds': seconds, 'modules': sorted(sys.modules)}))
+'''
+
+
+def test_app_import_stays_within_budget(tmp_path):
+    output = subprocess.run([sys.executable, '-c', CHILD, BACKEND_DIR], cwd=tmp_path,
+                            capture_output=True, text=True, check=True, timeout=120).stdout
+    report = json.loads(output.strip().splitlines()[-1])
+
+    # Lazy proxies are not registered in sys.modules, so anything listed here was really imported
+    assert [name for name in HEAVY_MODULES if name in report['modules']] == []
+    assert report['importSeconds'] < IMPORT_BUDGET
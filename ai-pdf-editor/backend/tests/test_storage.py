@@ -0,0 +1,69 @@
+import os
+import time
+
+from storage import StorageManager
+
+
+def _age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_ttl_expires_scratch_files_but_not_untimed_folders(tmp_path):
+    storage = StorageManager(str(tmp_path / 'storage.db'))
+    storage.add_folder('temp', str(tmp_path / 'temp'), ttl=60)
+    storage.add_folder('cache', str(tmp_path / 'cache'))
+    scratch = tmp_path / 'temp' / 'tmp1234' / 'part.pdf'
+    cached = tmp_path / 'cache' / 'entry.json'
+    for path in (scratch, cached):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('x')
+        _age(path, 3600)
+
+    report = storage.run_once()
+    assert report['expiredFiles'] == 1
+    assert not scratch.exists() and not scratch.parent.exists()
+    assert cached.exists()
+
+
+def test_keep_spares_named_files_and_their_journals(tmp_path):
+    storage = StorageManager(str(tmp_path / 'storage.db'))
+    storage.add_folder('cache', str(tmp_path / 'cache'), ttl=60, keep=('responses.db',))
+    kept = [tmp_path / 'cache' / 'responses.db', tmp_path / 'cache' / 'responses.db-journal']
+    expired = tmp_path / 'cache' / 'responses.db.bak'
+    for path in kept + [expired]:
+        path.write_text('x')
+        _age(path, 3600)
+
+    storage.run_once()
+    assert all(path.exists() for path in kept)
+    assert not expired.exists()
+    assert storage.usage()['cache']['files'] == 2
+
+
+def test_cleanup_expires_idle_ocr_entries_but_keeps_the_ai_cache(app_module):
+    import ai_services
+    import pdf_processor
+
+    ocr_cache = pdf_processor.pdf_processor.ocr.cache
+    idle, used = 'ab' * 32, 'cd' * 32
+    for key in (idle, used):
+        ocr_cache.put(key, [[0, 0, 10, 10, 'word']])
+    ai_cache = ai_services.ai_services.response_cache.db_path
+    scratch = os.path.join(pdf_processor.pdf_processor.temp_dir, 'tmp_orphan', 'part.pdf')
+    os.makedirs(os.path.dirname(scratch), exist_ok=True)
+    with open(scratch, 'w') as f:
+        f.write('x')
+    ttl = max(app_module.app.config['CACHE_TTL'], app_module.app.config['TEMP_TTL'])
+    for path in (ocr_cache._path(idle), ocr_cache._path(used), ai_cache, scratch):
+        _age(path, ttl * 2)
+    # A hit counts as use, so the entry is no longer idle
+    assert ocr_cache.get(used) == [[0, 0, 10, 10, 'word']]
+
+    app_module.storage.run_once()
+    assert not os.path.exists(ocr_cache._path(idle))
+    assert ocr_cache.get(idle) is None
+    assert os.path.exists(ocr_cache._path(used))
+    assert os.path.exists(ai_cache)
+    assert ai_services.ai_services.response_cache.stats() is not None
+    assert not os.path.exists(scratch)
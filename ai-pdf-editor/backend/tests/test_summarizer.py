@@ -0,0 +1,48 @@
+from summarizer import CHARS_PER_TOKEN, MapReduceSummarizer
+
+
+def _pages(count, edited=None):
+    pages = []
+    for number in range(1, count + 1):
+        text = ' '.join(f'page{number}-word{i}' for i in range(40))
+        if number == edited:
+            text += ' plus one added sentence.'
+        pages.append((number, text))
+    return pages
+
+
+class FakeModel:
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return f'summary {len(self.prompts)}'
+
+    def chunk_prompts(self):
+        return [prompt for prompt in self.prompts if prompt.startswith('Summarize this excerpt')]
+
+
+def test_chunks_stay_within_budget_and_cover_every_page():
+    summarizer = MapReduceSummarizer(FakeModel(), chunk_tokens=1000)
+    chunks = summarizer.split(_pages(60))
+
+    assert len(chunks) > 5
+    assert all(len(chunk['text']) <= 1000 * CHARS_PER_TOKEN for chunk in chunks)
+    assert [chunk['first'] for chunk in chunks[1:]] == [chunk['last'] + 1 for chunk in chunks[:-1]]
+    assert (chunks[0]['first'], chunks[-1]['last']) == (1, 60)
+
+
+def test_editing_one_page_resummarizes_only_its_chunk():
+    model = FakeModel()
+    summarizer = MapReduceSummarizer(model, chunk_tokens=1000)
+    summarizer.summarize(_pages(60))
+    first_run = len(model.chunk_prompts())
+
+    model.prompts.clear()
+    summarizer.summarize(_pages(60, edited=30))
+
+    assert first_run > 5
+    recomputed = model.chunk_prompts()
+    assert len(recomputed) == 1
+    assert 'plus one added sentence' in recomputed[0]
@@ -0,0 +1,37 @@
+import pytest
+
+import table_export
+
+
+def test_parquet_is_written_in_row_groups(tmp_path, monkeypatch):
+    pq = pytest.importorskip('pyarrow.parquet')
+    monkeypatch.setattr(table_export, 'PARQUET_ROW_GROUP_ROWS', 2)
+
+    writer = table_export.TableWriter('parquet', str(tmp_path / 'out'))
+    writer.start('Table 1', ['Item', 'Amount'])
+    writer.append([['a', 1.0], ['b', 2.0]])
+    # The first row group fixed Amount as numeric, so later text in it becomes null
+    writer.append([['c', 'n/a'], ['d', 4.0], ['e']])
+    paths = writer.close()
+
+    assert len(paths) == 1
+    parquet = pq.ParquetFile(paths[0])
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.schema.field('Amount').type == 'double'
+    assert table.column('Item').to_pylist() == ['a', 'b', 'c', 'd', 'e']
+    assert table.column('Amount').to_pylist() == [1.0, 2.0, None, 4.0, None]
+
+
+def test_parquet_header_only_sheet(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    writer = table_export.TableWriter('parquet', str(tmp_path / 'out'))
+    writer.start('Table 1', ['Item', 'Amount'])
+    writer.append([])
+    writer.start('Table 2', None)
+    writer.append([['x', 'y']])
+    first, second = writer.close()
+
+    assert pq.read_table(first).column_names == ['Item', 'Amount']
+    assert pq.read_table(first).num_rows == 0
+    assert pq.read_table(second).to_pylist() == [{'column_1': 'x', 'column_2': 'y'}]
@@ -0,0 +1,61 @@
+import fitz
+import pytest
+
+from conftest import make_pdf
+from text_index import TextIndex
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    with fitz.open(stream=make_pdf(pages=3, text='Quarterly revenue'), filetype='pdf') as doc:
+        doc.new_page()
+        path = str(tmp_path / 'doc.pdf')
+        doc.save(path)
+    return path
+
+
+def _build(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return TextIndex.build(pdf_path, doc)
+
+
+def test_pages_are_read_on_demand(pdf_path):
+    _build(pdf_path)
+    index = TextIndex.load(pdf_path)
+
+    assert index.page_count == 4
+    assert index.page_text(2).strip() == 'Quarterly revenue 2'
+    assert [page for page, _ in index.iter_pages(2, 3)] == [2, 3]
+    assert index.empty_pages() == [4]
+    assert [word[4] for word in index.page_words(3)] == ['Quarterly', 'revenue', '3']
+    with pytest.raises(IndexError):
+        index.page_text(5)
+
+
+def test_offsets_map_back_to_pages(pdf_path):
+    index = _build(pdf_path)
+    text = index.text()
+    offset = text.index('revenue 3')
+
+    assert index.page_for_offset(offset) == 3
+    assert text[index.char_offset(3):].startswith('Quarterly revenue 3')
+
+
+def test_index_of_a_rewritten_file_is_stale(pdf_path):
+    index = _build(pdf_path)
+    with open(pdf_path, 'ab') as f:
+        f.write(b'\n')
+
+    assert not index.is_current()
+    assert TextIndex.load(pdf_path) is None
+
+
+def test_processor_reuses_a_current_index(app_module, pdf_path):
+    processor = app_module.pdf_processor.pdf_processor
+    index = processor.get_text_index(pdf_path)
+    assert processor.get_text_index(pdf_path) is index
+
+    with open(pdf_path, 'ab') as f:
+        f.write(b'\n')
+    rebuilt = processor.get_text_index(pdf_path)
+    assert rebuilt is not index and rebuilt.is_current()
@@ -0,0 +1,47 @@
+import io
+import os
+
+import pytest
+
+from blob_store import BlobStore
+from conftest import make_pdf
+
+
+def test_identical_uploads_share_one_blob(app_module, client, upload):
+    data = make_pdf(pages=2, text='Shared content')
+    first = upload(data)
+    stored = app_module.blob_store.stats()['storedBytes']
+
+    response = client.post('/api/upload', data=data, content_type='application/pdf',
+                           headers={'X-Filename': 'copy.pdf'})
+    assert response.status_code == 200, response.get_json()
+    payload = response.get_json()
+
+    assert payload['fileId'] != first
+    assert payload['deduplicated'] is True
+    assert payload['textIndex'] == 'ready' and payload['textIndexJobId'] is None
+    assert payload['sha256'] == app_module.blob_store.lookup(first)['digest']
+    assert app_module.blob_store.stats()['storedBytes'] == stored
+    # The second reference reads the index built for the first
+    assert os.path.exists(app_module._upload_path(payload['fileId']) + '.pages.jsonl')
+
+
+def test_oversized_stream_is_rejected_without_leftovers(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'), chunk_size=4)
+    with pytest.raises(ValueError, match='too large'):
+        store.ingest(io.BytesIO(b'x' * 64), 'pdf', max_bytes=16)
+    assert os.listdir(tmp_path / 'blobs' / 'tmp') == []
+
+
+def test_blob_is_deleted_with_its_last_reference(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'))
+    digest, size, is_new = store.ingest(io.BytesIO(b'%PDF-1.7 body'), 'pdf')
+    assert is_new and size == 13
+    store.add_ref('a', digest, str(tmp_path / 'a.pdf'))
+    store.add_ref('b', digest, str(tmp_path / 'b.pdf'))
+
+    assert store.release('a') is False
+    assert os.path.exists(store.blob_path(digest, 'pdf'))
+    assert store.release('b') is True
+    assert not os.path.exists(store.blob_path(digest, 'pdf'))
+    assert (tmp_path / 'b.pdf').read_bytes() == b'%PDF-1.7 body'
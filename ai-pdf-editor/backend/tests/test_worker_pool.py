@@ -0,0 +1,39 @@
+import os
+
+import metrics
+import worker_pool
+from conftest import make_pdf
+
+
+def test_pool_workers_are_not_forked_from_the_server():
+    assert worker_pool._context().get_start_method() != 'fork'
+
+
+def test_worker_stage_timings_reach_the_collecting_thread(app_module, tmp_path):
+    pdf_path = tmp_path / 'doc.pdf'
+    pdf_path.write_bytes(make_pdf(pages=6))
+
+    metrics.begin_request()
+    pages = list(app_module.pdf_processor.iter_page_images(str(pdf_path), dpi=36, output_dir=str(tmp_path),
+                                                            max_workers=2, batch_size=2))
+    stages = dict(metrics.end_request())
+
+    assert sorted(page for page, _ in pages) == list(range(1, 7))
+    assert all(os.path.exists(path) for _, path in pages)
+    assert stages.get('render', 0) > 0
+
+
+def test_split_parts_are_written_across_workers(tmp_path):
+    import fitz
+    import splitting
+
+    pdf_path = tmp_path / 'doc.pdf'
+    pdf_path.write_bytes(make_pdf(pages=8))
+    parts = [(first, first + 1, str(tmp_path / f'part_{first}.pdf')) for first in range(1, 9, 2)]
+
+    written = splitting.write_parts_parallel(str(pdf_path), parts, max_workers=2)
+
+    assert written == [path for _, _, path in parts]
+    for path in written:
+        with fitz.open(path) as part:
+            assert part.page_count == 2